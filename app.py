@@ -24,17 +24,20 @@ logger = logging.getLogger(__name__)
 
 try:
     from document_processor import DocumentProcessor
-    from claude_integration import ClaudeAnalyzer
+    from claude_integration import ClaudeAnalyzer, shared_resources
     from package_generator import PackageGenerator
     from form_filler import FormFiller
     from command_executor import CommandExecutor
-    from config import DOCUMENT_CATEGORIES, BASE_DIR
+    from config import DOCUMENT_CATEGORIES, BASE_DIR, WARM_UP_RESOURCES
     logger.info("All modules imported successfully")
 except ImportError as e:
     logger.error(f"Import error: {e}")
     st.error(f"Import error: {e}")
     st.stop()
 
+# Document metadata used by the visualization tab
+VISUALIZATION_COLUMNS = ['category', 'file_type', 'modified_time', 'file_size']
+
 # Page configuration
 st.set_page_config(
     page_title="ChittyTrace",
@@ -184,6 +187,11 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Start loading the shared model and vector store while the page renders;
+# runs once per process, however many sessions and reruns follow
+if WARM_UP_RESOURCES:
+    shared_resources().warm_up(background=True)
+
 # Initialize session state with error handling
 try:
     if 'documents' not in st.session_state:
@@ -228,7 +236,8 @@ with st.sidebar:
 
     if api_key and not st.session_state.analyzer:
         try:
-            st.session_state.analyzer = ClaudeAnalyzer(api_key)
+            # The model and vector store are shared by every session
+            st.session_state.analyzer = ClaudeAnalyzer(api_key, resources=shared_resources())
             st.session_state.package_generator = PackageGenerator(st.session_state.analyzer)
             st.session_state.form_filler = FormFiller(st.session_state.analyzer)
             st.session_state.command_executor = CommandExecutor(st.session_state.analyzer)
@@ -248,7 +257,8 @@ with st.sidebar:
             "Documents loaded": len(st.session_state.documents),
             "Analyzer initialized": st.session_state.analyzer is not None,
             "Indexed": st.session_state.indexed,
-            "Session state keys": list(st.session_state.keys())
+            "Session state keys": list(st.session_state.keys()),
+            "Shared resources": shared_resources().status()
         })
         
         # Import and call debug functions
@@ -319,7 +329,7 @@ with st.sidebar:
     if st.session_state.documents and st.session_state.analyzer:
         if st.button("📇 Index Documents", use_container_width=True):
             with st.spinner("Indexing documents for search..."):
-                st.session_state.analyzer.index_documents(st.session_state.documents)
+                st.session_state.analyzer.index_documents(st.session_state.documents, prune=True)
                 st.session_state.indexed = True
                 st.success("Documents indexed successfully")
     
@@ -700,7 +710,11 @@ with tab5:
     st.header("Data Visualizations")
 
     if st.session_state.documents:
-        df = pd.DataFrame(st.session_state.documents)
+        # Build the frame from the metadata columns only; never touch content
+        df = pd.DataFrame.from_records(
+            [{col: doc.get(col) for col in VISUALIZATION_COLUMNS} for doc in st.session_state.documents],
+            columns=VISUALIZATION_COLUMNS
+        )
 
         # Document distribution
         col1, col2 = st.columns(2)
@@ -806,9 +820,11 @@ with tab6:
 
                 with col2:
                     if st.button("View Content", key=f"view_{doc['file_name']}"):
+                        # Content is loaded lazily, so read it once
+                        content = doc['content']
                         st.text_area(
                             "Content Preview",
-                            doc['content'][:2000] + "..." if len(doc['content']) > 2000 else doc['content'],
+                            content[:2000] + "..." if len(content) > 2000 else content,
                             height=300
                         )
     else:
@@ -0,0 +1,98 @@
+"""
+Streaming traversal of zip, tar and gzip archives
+Members are read into memory one at a time and never extracted to disk;
+nested archives are returned as members for the caller to open recursively
+"""
+
+import gzip
+import tarfile
+import zipfile
+from datetime import datetime
+from pathlib import PurePosixPath
+from typing import BinaryIO, Callable, Iterator, NamedTuple, Optional
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tgz', '.gz')
+_TAR_SUFFIXES = ('.tar', '.tgz', '.tar.gz')
+
+
+class MemberTooLarge(ValueError):
+    """A member's uncompressed size is over the caller's limit"""
+
+
+class ArchiveMember(NamedTuple):
+    path: str
+    size: int
+    # Identity of the member's bytes taken from the archive's own records
+    # (zip CRC-32, tar header checksum), so unchanged members can be
+    # recognised without decompressing them
+    fingerprint: str
+    modified: Optional[datetime]
+    # Only valid until the next member is yielded (tar is read as a stream)
+    read: Callable[[], bytes]
+
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _read_limited(stream: BinaryIO, limit: Optional[int]) -> bytes:
+    # Don't trust recorded sizes; a crafted member can decompress far beyond them
+    if not limit:
+        return stream.read()
+    data = stream.read(limit + 1)
+    if len(data) > limit:
+        raise MemberTooLarge(f"member exceeds {limit} bytes")
+    return data
+
+
+def iter_members(fileobj: BinaryIO, name: str,
+                 max_member_bytes: Optional[int] = None) -> Iterator[ArchiveMember]:
+    """Yield the file members of an archive, read from an open binary file"""
+    lower = name.lower()
+    if lower.endswith('.zip'):
+        yield from _iter_zip(fileobj, max_member_bytes)
+    elif lower.endswith(_TAR_SUFFIXES):
+        yield from _iter_tar(fileobj, max_member_bytes)
+    elif lower.endswith('.gz'):
+        yield from _iter_gzip(fileobj, name, max_member_bytes)
+    else:
+        raise ValueError(f"Unsupported archive type: {name}")
+
+
+def _iter_zip(fileobj: BinaryIO, limit: Optional[int]) -> Iterator[ArchiveMember]:
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            try:
+                modified = datetime(*info.date_time)
+            except ValueError:
+                modified = None
+
+            def read(info=info):
+                with archive.open(info) as member:
+                    return _read_limited(member, limit)
+
+            yield ArchiveMember(info.filename, info.file_size, f"crc32:{info.CRC:08x}", modified, read)
+
+
+def _iter_tar(fileobj: BinaryIO, limit: Optional[int]) -> Iterator[ArchiveMember]:
+    # "r|*" reads sequentially with transparent decompression; no seeking
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+
+            def read(info=info):
+                return _read_limited(archive.extractfile(info), limit)
+
+            yield ArchiveMember(info.name, info.size,
+                                f"tar:{info.chksum:x}:{info.size}:{int(info.mtime)}",
+                                datetime.fromtimestamp(info.mtime), read)
+
+
+def _iter_gzip(fileobj: BinaryIO, name: str, limit: Optional[int]) -> Iterator[ArchiveMember]:
+    # A bare .gz holds one file; its identity is that of the archive itself
+    with gzip.GzipFile(fileobj=fileobj) as stream:
+        yield ArchiveMember(PurePosixPath(name).stem, -1, "gzip", None,
+                            lambda: _read_limited(stream, limit))
@@ -0,0 +1,107 @@
+"""
+Persistent stat-keyed manifest mapping files to their content hash
+Lets unchanged files hit the document cache from a single stat() call
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CacheManifest:
+    """Maps (path, size, mtime_ns, inode) to the file's content hash
+
+    Backed by SQLite so the scan workers of a process pool can share one
+    manifest file. Connections are opened lazily per process.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited through fork must not be reused
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS manifest (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    file_hash TEXT NOT NULL
+                )
+            """)
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _key(file_path: Path) -> str:
+        return os.path.abspath(file_path)
+
+    def lookup(self, file_path: Path, stat: os.stat_result) -> Optional[str]:
+        """Return the recorded hash if the file's metadata is unchanged"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT size, mtime_ns, inode, file_hash FROM manifest WHERE path = ?",
+                    (self._key(file_path),)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache manifest lookup failed for {file_path}: {e}")
+            return None
+
+        if row and row[:3] == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return row[3]
+        return None
+
+    def record(self, file_path: Path, stat: os.stat_result, file_hash: str):
+        """Record the content hash for the file's current metadata"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, inode, file_hash) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self._key(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino, file_hash)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to update cache manifest for {file_path}: {e}")
+
+    def forget(self, file_path: Path) -> Optional[str]:
+        """Drop the manifest entry for a file; returns the hash it recorded"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT file_hash FROM manifest WHERE path = ?", (self._key(file_path),)
+                ).fetchone()
+                conn.execute("DELETE FROM manifest WHERE path = ?", (self._key(file_path),))
+                conn.commit()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to update cache manifest for {file_path}: {e}")
+            return None
+
+    def references(self, file_hash: str) -> bool:
+        """Whether any recorded file has this content hash"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT 1 FROM manifest WHERE file_hash = ? LIMIT 1", (file_hash,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache manifest lookup failed for {file_hash}: {e}")
+            return True
+        return row is not None
@@ -3,6 +3,9 @@ import asyncio
 from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime
 import json
+import hashlib
+import threading
+from functools import partial
 import logging
 
 from anthropic import Anthropic
@@ -14,68 +17,242 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-from config import VECTOR_DB_PATH
+from config import VECTOR_DB_PATH, CACHE_DIR, EMBEDDING_MAX_BATCH, EMBEDDING_BACKEND
+from embedding_cache import CachedEmbeddings
+from embedding_workers import BulkEmbedder
+from onnx_embeddings import OnnxEmbeddings
+from index_manifest import IndexManifest, IndexedDocument, chunk_ids
+from shared_resources import ResourceRegistry, SharedResource
 
 logger = logging.getLogger(__name__)
 
 
+def _create_embeddings() -> CachedEmbeddings:
+    # Each distinct chunk or query is encoded once and then served from the
+    # embedding cache, and bulk encoding runs on a pool of worker processes
+    model_name = "sentence-transformers/all-MiniLM-L6-v2"
+    if EMBEDDING_BACKEND == "onnx":
+        embedding_factory = partial(OnnxEmbeddings, model_name=model_name)
+    else:
+        embedding_factory = partial(
+            HuggingFaceEmbeddings,
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            # Batches are already sized by BulkEmbedder
+            encode_kwargs={'batch_size': EMBEDDING_MAX_BATCH}
+        )
+    return CachedEmbeddings(
+        BulkEmbedder(embedding_factory, model_name, local=embedding_factory()),
+        CACHE_DIR / "embeddings"
+    )
+
+
+def create_resources() -> ResourceRegistry:
+    """Registry of the heavy objects ClaudeAnalyzer uses, none built yet"""
+    resources = ResourceRegistry()
+    resources.register("embeddings", _create_embeddings)
+    resources.register("vector_store", lambda: Chroma(
+        persist_directory=str(VECTOR_DB_PATH),
+        embedding_function=resources.get("embeddings")
+    ))
+    # What the vector store holds per file, so re-indexing is incremental
+    resources.register("index_manifest", lambda: IndexManifest(VECTOR_DB_PATH / "index_manifest.sqlite3"))
+    resources.register("client", lambda api_key: Anthropic(api_key=api_key), preload=False)
+    resources.register("chat_model", lambda api_key: ChatAnthropic(
+        api_key=api_key,
+        model="claude-3-5-sonnet-20241022",
+        temperature=0.0,
+        max_tokens=4096
+    ), preload=False)
+    return resources
+
+
+_shared_resources: Optional[ResourceRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def shared_resources() -> ResourceRegistry:
+    """The process-wide registry, shared by all sessions and requests"""
+    global _shared_resources
+    with _shared_lock:
+        if _shared_resources is None:
+            _shared_resources = create_resources()
+        return _shared_resources
+
+
 class ClaudeAnalyzer:
-    def __init__(self, api_key: Optional[str] = None):
+    # Built on first use through self.resources, not per instance
+    client = SharedResource("client", keyed_by="api_key")
+    chat_model = SharedResource("chat_model", keyed_by="api_key")
+    embeddings = SharedResource("embeddings")
+    vector_store = SharedResource("vector_store")
+    index_manifest = SharedResource("index_manifest")
+    
+    def __init__(self, api_key: Optional[str] = None,
+                 resources: Optional[ResourceRegistry] = None):
+        """resources defaults to a private registry; pass shared_resources()
+        to share the model and vector store with the rest of the process"""
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-        
-        # Initialize Claude
-        self.client = Anthropic(api_key=self.api_key)
-        self.chat_model = ChatAnthropic(
-            api_key=self.api_key,
-            model="claude-3-5-sonnet-20241022",
-            temperature=0.0,
-            max_tokens=4096
-        )
-        
-        # Initialize embeddings and vector store
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
-        
-        self.vector_store = Chroma(
-            persist_directory=str(VECTOR_DB_PATH),
-            embedding_function=self.embeddings
-        )
+        self.resources = resources if resources is not None else create_resources()
         
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=2000,
             chunk_overlap=200
         )
     
-    def index_documents(self, documents: List[Dict[str, Any]]):
-        """Index documents into vector store for semantic search"""
+    @property
+    def index_fingerprint(self) -> str:
+        """Splitter and embedding settings the chunk IDs are derived from"""
+        model = getattr(self.embeddings, "model_name", type(self.embeddings).__name__)
+        return f"{self.text_splitter._chunk_size}:{self.text_splitter._chunk_overlap}:{model}"
+    
+    def index_documents(self, documents: List[Dict[str, Any]], prune: bool = False):
+        """Index documents into vector store for semantic search
+        
+        Incremental and idempotent: chunk IDs derive from the document hash,
+        chunk index and index_fingerprint, documents whose hash and settings
+        match the index manifest are skipped without loading their content,
+        and a changed document's old chunks are deleted once the new ones are
+        stored. With prune=True, documents is taken as the whole corpus and
+        indexed files missing from it are removed.
+        
+        Near-duplicate copies (marked "duplicate_of") are not embedded; their
+        paths stay reachable through the canonical document's chunks.
+        """
         logger.info(f"Indexing {len(documents)} documents...")
+        fingerprint = self.index_fingerprint
+        indexed = self.index_manifest.get_all()
+        # Chunk counts of every (hash, settings) already in the store
+        stored = {(entry.file_hash, entry.fingerprint): entry.chunk_count for entry in indexed.values()}
         
         # Convert to LangChain documents
         langchain_docs = []
+        ids = []
+        entries: Dict[str, IndexedDocument] = {}
+        dropped = set()
         for doc in documents:
-            if doc.get("content"):
-                # Split large documents
-                chunks = self.text_splitter.split_text(doc["content"])
-                for i, chunk in enumerate(chunks):
-                    metadata = {
-                        "file_path": doc["file_path"],
-                        "file_name": doc["file_name"],
-                        "category": doc["category"],
-                        "chunk_index": i,
-                        "total_chunks": len(chunks)
-                    }
-                    langchain_docs.append(
-                        Document(page_content=chunk, metadata=metadata)
-                    )
-        
-        # Add to vector store
+            file_path = doc["file_path"]
+            if doc.get("duplicate_of"):
+                dropped.add(file_path)
+                continue
+            
+            file_hash = doc.get("file_hash")
+            previous = indexed.get(file_path)
+            if previous and previous.file_hash == file_hash and previous.fingerprint == fingerprint:
+                continue
+            
+            # Read content once; document records load it lazily
+            content = doc.get("content")
+            if not content:
+                dropped.add(file_path)
+                continue
+            file_hash = file_hash or hashlib.md5(content.encode("utf-8")).hexdigest()
+            
+            if (file_hash, fingerprint) in stored:
+                # An identical file is already embedded; share its chunks
+                entries[file_path] = IndexedDocument(file_hash, fingerprint, stored[(file_hash, fingerprint)])
+                continue
+            
+            # Split large documents
+            chunks = self.text_splitter.split_text(content)
+            for i, chunk in enumerate(chunks):
+                metadata = {
+                    "file_path": file_path,
+                    "file_name": doc["file_name"],
+                    "category": doc["category"],
+                    "chunk_index": i,
+                    "total_chunks": len(chunks)
+                }
+                if doc.get("duplicates"):
+                    # Vector store metadata must be scalar
+                    metadata["duplicates"] = json.dumps(doc["duplicates"])
+                langchain_docs.append(
+                    Document(page_content=chunk, metadata=metadata)
+                )
+            ids.extend(chunk_ids(file_hash, fingerprint, len(chunks)))
+            entries[file_path] = IndexedDocument(file_hash, fingerprint, len(chunks))
+            stored[(file_hash, fingerprint)] = len(chunks)
+        
+        if prune:
+            current = {doc["file_path"] for doc in documents}
+            dropped.update(path for path in indexed if path not in current)
+        
+        if not indexed and entries:
+            # Chunks stored before the manifest existed have random IDs
+            self.vector_store.delete(where={"file_path": {"$in": list(entries)}})
+        
+        # Add to vector store; deterministic IDs make this an upsert
         if langchain_docs:
-            self.vector_store.add_documents(langchain_docs)
+            self.vector_store.add_documents(langchain_docs, ids=ids)
             logger.info(f"Indexed {len(langchain_docs)} document chunks")
+        
+        replaced = [path for path in entries if path in indexed]
+        forgotten = replaced + [path for path in dropped if path in indexed]
+        stale = self.index_manifest.forget(forgotten)
+        self.index_manifest.record(entries)
+        # Chunks that a recorded entry uses are not stale, even if the path
+        # that first stored them is gone (a renamed or moved file)
+        kept = {chunk_id for entry in entries.values() for chunk_id in entry.ids}
+        stale = [chunk_id for chunk_id in stale if chunk_id not in kept]
+        if stale:
+            self.vector_store.delete(ids=stale)
+            logger.info(f"Removed {len(stale)} stale document chunks")
+        self._repoint_chunks(
+            [indexed[path] for path in forgotten],
+            {doc["file_path"]: doc.get("file_name") for doc in documents}
+        )
+        
+        skipped = len(documents) - len(entries) - len(dropped)
+        if skipped:
+            logger.info(f"Skipped {skipped} unchanged documents")
+    
+    def remove_documents(self, file_paths: List[str]):
+        """Remove all indexed chunks belonging to the given files"""
+        if file_paths:
+            indexed = self.index_manifest.get_all()
+            stale = self.index_manifest.forget(file_paths)
+            if stale:
+                self.vector_store.delete(ids=stale)
+            self._repoint_chunks([indexed[path] for path in file_paths if path in indexed])
+            if not indexed:
+                # Chunks stored before the manifest existed are found by path
+                self.vector_store.delete(where={"file_path": {"$in": list(file_paths)}})
+            logger.info(f"Removed indexed chunks for {len(file_paths)} documents")
+    
+    def _repoint_chunks(self, released: List[IndexedDocument],
+                        file_names: Optional[Dict[str, str]] = None):
+        """Move the file_path metadata of chunks still shared by another path
+        off the paths that were just forgotten"""
+        if not released:
+            return
+        current = self.index_manifest.get_all()
+        holders: Dict[tuple, str] = {}
+        for path, entry in current.items():
+            holders.setdefault((entry.file_hash, entry.fingerprint), path)
+        file_names = file_names or {}
+        
+        for entry in {(e.file_hash, e.fingerprint): e for e in released}.values():
+            holder = holders.get((entry.file_hash, entry.fingerprint))
+            if holder is None:
+                continue
+            stored = self.vector_store.get(ids=entry.ids, include=["documents", "metadatas"])
+            moved_ids, moved_docs = [], []
+            for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                if metadata.get("file_path") in current:
+                    continue
+                metadata = {
+                    **metadata,
+                    "file_path": holder,
+                    "file_name": file_names.get(holder) or holder.rsplit("/", 1)[-1]
+                }
+                moved_ids.append(chunk_id)
+                moved_docs.append(Document(page_content=text, metadata=metadata))
+            if moved_ids:
+                # Re-embedding is served from the embedding cache
+                self.vector_store.update_documents(ids=moved_ids, documents=moved_docs)
+                logger.info(f"Moved {len(moved_ids)} shared chunks to {holder}")
     
     def search_documents(self, query: str, k: int = 10) -> List[Document]:
         """Search for relevant documents using semantic search"""
@@ -17,10 +17,11 @@ from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
 
 from document_processor import DocumentProcessor
-from claude_integration import ClaudeAnalyzer
+from claude_integration import ClaudeAnalyzer, shared_resources
 from package_generator import PackageGenerator
 from interactive_timeline import InteractiveTimeline
 from database_handler import DatabaseHandler
+from config import WARM_UP_RESOURCES
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -88,7 +89,11 @@ async def lifespan(app: FastAPI):
         if not api_key:
             logger.warning("ANTHROPIC_API_KEY not set")
         else:
-            analyzer = ClaudeAnalyzer(api_key)
+            analyzer = ClaudeAnalyzer(api_key, resources=shared_resources())
+            # Load the model while the server starts accepting requests;
+            # the first request that needs it waits for it instead
+            if WARM_UP_RESOURCES:
+                shared_resources().warm_up(background=True)
             processor = DocumentProcessor()
             package_generator = PackageGenerator(analyzer)
             timeline_generator = InteractiveTimeline(analyzer)
@@ -106,6 +111,7 @@ async def lifespan(app: FastAPI):
         # Cleanup
         if db_handler:
             await db_handler.close()
+        shared_resources().close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -130,7 +136,8 @@ async def health_check():
             "analyzer": analyzer is not None,
             "processor": processor is not None,
             "database": db_handler is not None
-        }
+        },
+        "resources": shared_resources().status()
     }
 
 @app.post("/documents/scan")
@@ -142,7 +149,7 @@ async def scan_documents(token: str = Depends(verify_token)):
     documents = processor.scan_documents()
     
     if analyzer and documents:
-        analyzer.index_documents(documents)
+        analyzer.index_documents(documents, prune=True)
         
     if db_handler:
         await db_handler.store_documents(documents)
@@ -64,6 +64,106 @@ SUPPORTED_FILE_TYPES = {
     ".jpeg": "JPEG images"
 }
 
+# Number of worker processes used by DocumentProcessor.scan_documents;
+# 1 keeps the original single-process scan
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "1"))
+
+# RecursiveScanner: files processed concurrently, and how far the directory
+# walk may run ahead of processing (bounds memory on very large trees)
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "16"))
+SCAN_QUEUE_SIZE = int(os.getenv("SCAN_QUEUE_SIZE", "1000"))
+
+# Per-file budget for pooled extraction; workers exceeding it are killed and
+# the file is quarantined
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "300"))
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", "2048"))
+
+# Files above LARGE_FILE_THRESHOLD_MB are streamed page by page / chunk by
+# chunk in an isolated worker capped at LARGE_FILE_MEMORY_LIMIT_MB; files above
+# MAX_FILE_SIZE_MB are skipped (0 = no limit)
+LARGE_FILE_THRESHOLD_MB = int(os.getenv("LARGE_FILE_THRESHOLD_MB", "100"))
+LARGE_FILE_MEMORY_LIMIT_MB = int(os.getenv("LARGE_FILE_MEMORY_LIMIT_MB", "1024"))
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "0"))
+
+# Archive expansion: nesting depth followed into archives within archives, and
+# the largest member read into memory
+ARCHIVE_MAX_DEPTH = int(os.getenv("ARCHIVE_MAX_DEPTH", "3"))
+ARCHIVE_MEMBER_MAX_MB = int(os.getenv("ARCHIVE_MEMBER_MAX_MB", "512"))
+
+# Mailbox parsing: worker processes, and messages parsed per worker task
+MBOX_WORKERS = int(os.getenv("MBOX_WORKERS", str(os.cpu_count() or 1)))
+MBOX_BATCH_MESSAGES = int(os.getenv("MBOX_BATCH_MESSAGES", "500"))
+
+# Cloudflare Worker email sync: mailbox synced, emails per page, pages in
+# flight, retry budget and base backoff, per-request timeout, how far back
+# the first sync (with no saved cursor) reaches, and the most pages one sync
+# may request
+EMAIL_SYNC_ADDRESS = os.getenv("EMAIL_SYNC_ADDRESS", "nick@chitty.cc")
+EMAIL_SYNC_PAGE_SIZE = int(os.getenv("EMAIL_SYNC_PAGE_SIZE", "100"))
+EMAIL_SYNC_CONCURRENCY = int(os.getenv("EMAIL_SYNC_CONCURRENCY", "4"))
+EMAIL_SYNC_MAX_RETRIES = int(os.getenv("EMAIL_SYNC_MAX_RETRIES", "5"))
+EMAIL_SYNC_BACKOFF_SECONDS = float(os.getenv("EMAIL_SYNC_BACKOFF_SECONDS", "0.5"))
+EMAIL_SYNC_TIMEOUT_SECONDS = float(os.getenv("EMAIL_SYNC_TIMEOUT_SECONDS", "30"))
+EMAIL_SYNC_LOOKBACK_DAYS = int(os.getenv("EMAIL_SYNC_LOOKBACK_DAYS", "365"))
+EMAIL_SYNC_MAX_PAGES = int(os.getenv("EMAIL_SYNC_MAX_PAGES", "1000"))
+
+# Near-duplicate detection after extraction: estimated Jaccard similarity of
+# word shingles above which documents are treated as copies (0 disables), and
+# the shortest text considered
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+NEAR_DUPLICATE_MIN_WORDS = int(os.getenv("NEAR_DUPLICATE_MIN_WORDS", "50"))
+
+# Embedding cache: storage precision of cached vectors ("float16" or "int8"),
+# and the most texts sent to the model in one encode call
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_ENCODE_BATCH = int(os.getenv("EMBEDDING_ENCODE_BATCH", "1024"))
+
+# Bulk embedding: worker processes (each loads the model), largest batch,
+# model truncation length, share of available memory the workers may use and
+# the assumed activation memory per padded token, and the smallest input
+# worth sending to the pool
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))
+EMBEDDING_MEMORY_FRACTION = float(os.getenv("EMBEDDING_MEMORY_FRACTION", "0.5"))
+EMBEDDING_BYTES_PER_TOKEN = int(os.getenv("EMBEDDING_BYTES_PER_TOKEN", str(64 * 1024)))
+EMBEDDING_POOL_MIN_TEXTS = int(os.getenv("EMBEDDING_POOL_MIN_TEXTS", "64"))
+
+# Embedding backend: "huggingface" (PyTorch) or "onnx" (ONNX Runtime, int8),
+# and the ONNX file within the model repository. Both produce interchangeable
+# vectors, so switching keeps the existing index and embedding cache
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Build the embedding model and vector store on a background thread at
+# startup (Streamlit and the API server) instead of on first use; "0" disables
+WARM_UP_RESOURCES = os.getenv("WARM_UP_RESOURCES", "1") != "0"
+
+# Digests computed alongside any other on a file's first read. Creating a
+# DigitalEvidenceAuthenticator adds the digests it records, so processes that
+# authenticate read each file once; otherwise only requested digests are computed
+HASH_PREFETCH_ALGORITHMS = tuple(
+    name for name in os.getenv("HASH_PREFETCH_ALGORITHMS", "").split(",") if name
+)
+
+# Quiet period before watch mode processes a burst of filesystem events
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+
+# Size cap for the document cache; least recently used documents are evicted
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+
+# CSV/Excel ingestion: rows per streamed chunk, and the cap on the text
+# rendering kept for search (all rows go to the transaction store)
+TABULAR_CHUNK_ROWS = int(os.getenv("TABULAR_CHUNK_ROWS", "50000"))
+TABULAR_TEXT_MAX_CHARS = int(os.getenv("TABULAR_TEXT_MAX_CHARS", "2000000"))
+
+# OCR for images and PDF pages without a text layer: render/downscale target
+# DPI, Tesseract language, pool size and pages handed to the pool at a time
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+
 VECTOR_DB_PATH = FLOW_ANALYZER_DIR / "chroma_db"
 CACHE_DIR = FLOW_ANALYZER_DIR / ".cache"
 LOGS_DIR = FLOW_ANALYZER_DIR / "logs"
@@ -0,0 +1,348 @@
+"""
+Compact document cache: zstd-compressed msgpack metadata records stored apart
+from compressed content, in a sharded layout with size-bounded LRU eviction
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+import logging
+
+import msgpack
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+ZSTD_LEVEL = 3
+
+# Access times are buffered and written in one transaction once this many
+# are pending or this many seconds have passed; LRU order only needs to be
+# roughly right, and reads then stay read-only
+TOUCH_BATCH = 256
+TOUCH_INTERVAL = 30.0
+
+
+class DocumentCache:
+    """Cache of processed documents keyed by content hash
+
+    Layout under ``<cache_dir>/v2``::
+
+        meta/ab/cd/<hash>.mpk.zst     metadata record (everything but content)
+        content/ab/cd/<hash>.txt.zst  extracted text
+        extra/ab/cd/<hash>/           auxiliary records such as per-page PDF text
+        index.sqlite3                 sizes and last access for LRU eviction
+
+    Metadata records are small, so listing the cache never decompresses text.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.root = cache_dir / "v2"
+        self.root.mkdir(exist_ok=True, parents=True)
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._touch_flushed = time.monotonic()
+
+    # Paths
+
+    @staticmethod
+    def _shard(file_hash: str) -> Path:
+        return Path(file_hash[:2]) / file_hash[2:4]
+
+    def meta_path(self, file_hash: str) -> Path:
+        return self.root / "meta" / self._shard(file_hash) / f"{file_hash}.mpk.zst"
+
+    def content_path(self, file_hash: str) -> Path:
+        return self.root / "content" / self._shard(file_hash) / f"{file_hash}.txt.zst"
+
+    def extra_dir(self, file_hash: str) -> Path:
+        return self.root / "extra" / self._shard(file_hash) / file_hash
+
+    # Index
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited through fork must not be reused
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), timeout=30,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    file_hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+            if "extra_size" not in columns:
+                self._conn.execute("ALTER TABLE entries ADD COLUMN extra_size INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _touch(self, file_hash: str):
+        with self._lock:
+            self._touched[file_hash] = time.time()
+            due = (len(self._touched) >= TOUCH_BATCH
+                   or time.monotonic() - self._touch_flushed >= TOUCH_INTERVAL)
+        if due:
+            self.flush_touches()
+
+    def flush_touches(self):
+        """Write buffered access times to the index"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touch_flushed = time.monotonic()
+            if not touched:
+                return
+            try:
+                conn = self._connect()
+                conn.executemany("UPDATE entries SET last_access = ? WHERE file_hash = ?",
+                                 [(at, file_hash) for file_hash, at in touched.items()])
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"Failed to update cache access times: {e}")
+
+    def total_size(self) -> int:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COALESCE(SUM(size + extra_size), 0) FROM entries"
+            ).fetchone()
+        return row[0]
+
+    # Records
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, file_hash: str, document: Dict[str, Any]):
+        """Store a document, splitting its content from its metadata"""
+        metadata = {k: v for k, v in document.items() if k != "content"}
+        content_bytes = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(
+            document.get("content", "").encode("utf-8")
+        )
+        self._write_atomic(self.content_path(file_hash), content_bytes)
+        self.put_metadata(file_hash, metadata)
+
+    def content_writer(self, file_hash: str) -> "ContentWriter":
+        """Stream a document's text into the cache; follow with put_metadata()"""
+        return ContentWriter(self.content_path(file_hash))
+
+    def put_metadata(self, file_hash: str, metadata: Dict[str, Any]):
+        """Store a metadata record for content that is already in the cache"""
+        meta_bytes = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(
+            msgpack.packb(metadata, default=str, use_bin_type=True)
+        )
+        self._write_atomic(self.meta_path(file_hash), meta_bytes)
+        content_size = self.content_path(file_hash).stat().st_size
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO entries (file_hash, size, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(file_hash) DO UPDATE SET size = excluded.size, "
+                "last_access = excluded.last_access",
+                (file_hash, len(meta_bytes) + content_size, time.time())
+            )
+            conn.commit()
+
+        self.evict()
+
+    def put_extra(self, file_hash: str, name: str, data: bytes):
+        """Store an auxiliary record for a document; it is evicted with the document"""
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        path = self.extra_dir(file_hash) / f"{name}.zst"
+        # An overwrite only adds the difference to the accounted size
+        try:
+            previous = path.stat().st_size
+        except FileNotFoundError:
+            previous = 0
+        self._write_atomic(path, payload)
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO entries (file_hash, size, extra_size, last_access) VALUES (?, 0, ?, ?) "
+                "ON CONFLICT(file_hash) DO UPDATE SET extra_size = MAX(0, extra_size + excluded.extra_size), "
+                "last_access = excluded.last_access",
+                (file_hash, len(payload) - previous, time.time())
+            )
+            conn.commit()
+
+        self.evict()
+
+    def get_extra(self, file_hash: str, name: str) -> Optional[bytes]:
+        """Load an auxiliary record, or None if it was never stored"""
+        path = self.extra_dir(file_hash) / f"{name}.zst"
+        if not path.exists():
+            return None
+        return zstandard.ZstdDecompressor().decompress(path.read_bytes())
+
+    def put_page(self, file_hash: str, page_index: int, text: str, kind: str = "page"):
+        """Store the extracted text of one PDF page
+
+        kind separates text-layer pages ("page") from OCR output ("ocr").
+        """
+        self.put_extra(file_hash, f"{kind}-{page_index:05d}", text.encode("utf-8"))
+
+    def get_pages(self, file_hash: str, kind: str = "page") -> Dict[int, str]:
+        """Load every cached page of a PDF, keyed by zero-based page index"""
+        pages = {}
+        decompressor = zstandard.ZstdDecompressor()
+        for path in self.extra_dir(file_hash).glob(f"{kind}-*.zst"):
+            index = int(path.name[len(kind) + 1:-len(".zst")])
+            pages[index] = decompressor.decompress(path.read_bytes()).decode("utf-8")
+        return pages
+
+    def put_page_count(self, file_hash: str, page_count: int):
+        self.put_extra(file_hash, "pdf-page-count", str(page_count).encode())
+
+    def get_page_count(self, file_hash: str) -> Optional[int]:
+        data = self.get_extra(file_hash, "pdf-page-count")
+        return int(data) if data is not None else None
+
+    @staticmethod
+    def _read_metadata(path: Path) -> Dict[str, Any]:
+        raw = zstandard.ZstdDecompressor().decompress(path.read_bytes())
+        return msgpack.unpackb(raw, raw=False)
+
+    def get_metadata(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Load a document's metadata record without its content"""
+        path = self.meta_path(file_hash)
+        if not path.exists():
+            return None
+        metadata = self._read_metadata(path)
+        self._touch(file_hash)
+        return metadata
+
+    def get_content(self, file_hash: str) -> Optional[str]:
+        """Load a document's extracted text"""
+        path = self.content_path(file_hash)
+        if not path.exists():
+            return None
+        # Streamed content has no size in its frame header, so read it as a stream
+        with open(path, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            return reader.read().decode("utf-8")
+
+    def get(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Load a full document (metadata and content)"""
+        metadata = self.get_metadata(file_hash)
+        if metadata is None:
+            return None
+        content = self.get_content(file_hash)
+        if content is None:
+            return None
+        metadata["content"] = content
+        return metadata
+
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        """Yield every cached metadata record"""
+        for path in sorted((self.root / "meta").glob("*/*/*.mpk.zst")):
+            try:
+                yield self._read_metadata(path)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable cache record {path}: {e}")
+
+    def remove(self, file_hash: str):
+        """Delete a document and all its records"""
+        for path in (self.meta_path(file_hash), self.content_path(file_hash)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(self.extra_dir(file_hash), ignore_errors=True)
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries WHERE file_hash = ?", (file_hash,))
+            conn.commit()
+
+    def evict(self):
+        """Remove least recently used documents until the cache fits max_bytes"""
+        if not self.max_bytes:
+            return
+
+        try:
+            total = self.total_size()
+            if total <= self.max_bytes:
+                return
+            # Evict by up-to-date access order
+            self.flush_touches()
+
+            # Evict down to 90% so every put near the cap doesn't trigger another pass
+            target = int(self.max_bytes * 0.9)
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT file_hash, size + extra_size FROM entries ORDER BY last_access"
+                ).fetchall()
+
+            evicted = 0
+            for file_hash, size in rows:
+                if total <= target:
+                    break
+                self.remove(file_hash)
+                total -= size
+                evicted += 1
+
+            logger.info(f"Evicted {evicted} documents from cache ({total} bytes remain)")
+        except sqlite3.Error as e:
+            logger.warning(f"Cache eviction failed: {e}")
+
+
+class ContentWriter:
+    """Compresses text into a content record as it is produced
+
+    The record is written to a temporary file and only replaces the cached
+    content on commit, so a failed extraction leaves no partial document.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.chars = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        self._file = os.fdopen(fd, 'wb')
+        self._stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self._file, closefd=False)
+
+    def write(self, text: str):
+        self._stream.write(text.encode("utf-8"))
+        self.chars += len(text)
+
+    def commit(self):
+        self._stream.close()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        try:
+            self._stream.close()
+            self._file.close()
+        finally:
+            os.unlink(self._tmp_path)
+
+    def __enter__(self) -> "ContentWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
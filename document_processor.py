@@ -1,164 +1,808 @@
 import os
-import hashlib
+import time
+import io
 import json
+import codecs
+import hashlib
+import mmap
+import contextlib
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional, Any, Tuple, Union
 from datetime import datetime
 import logging
+from email import policy
+from email.parser import BytesParser
 
 import pypdf2
 import pdfplumber
 import pandas as pd
+import openpyxl
 import chardet
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich import filesize
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn
 
-from config import BASE_DIR, SUPPORTED_FILE_TYPES, CACHE_DIR
+from config import (
+    BASE_DIR, SUPPORTED_FILE_TYPES, CACHE_DIR, CACHE_MAX_BYTES, SCAN_WORKERS,
+    EXTRACTION_TIMEOUT, EXTRACTION_MEMORY_LIMIT_MB,
+    TABULAR_CHUNK_ROWS, TABULAR_TEXT_MAX_CHARS, OCR_DPI,
+    LARGE_FILE_THRESHOLD_MB, LARGE_FILE_MEMORY_LIMIT_MB,
+    ARCHIVE_MAX_DEPTH, ARCHIVE_MEMBER_MAX_MB
+)
+from file_walker import walk_files
+from near_duplicates import mark_near_duplicates
+from cache_manifest import CacheManifest
+from document_cache import DocumentCache
+from document_record import DocumentRecord
+from transaction_store import TransactionStore
+from extraction_supervisor import ExtractionSupervisor
+from file_hashing import get_hash_registry
+from ocr import ocr_images, ocr_job
+from archive_reader import ArchiveMember, MemberTooLarge, is_archive, iter_members
+from mbox_reader import MboxIndex, parse_ranges
+from email_parsing import Attachment, iter_attachments, iter_decoded, message_body, message_metadata
 
 console = Console()
 logger = logging.getLogger(__name__)
 
+# A file on disk, or an in-memory file such as an archive member
+Source = Union[Path, BinaryIO]
+
 
 class DocumentProcessor:
     def __init__(self):
         self.cache_dir = CACHE_DIR
         self.cache_dir.mkdir(exist_ok=True, parents=True)
+        self.manifest = CacheManifest(self.cache_dir / "manifest.sqlite3")
+        self.cache = DocumentCache(self.cache_dir, CACHE_MAX_BYTES)
+        self.transactions = TransactionStore(self.cache_dir / "transactions")
+        self.quarantine_path = self.cache_dir / "quarantine.json"
+        self.quarantine = self._load_quarantine()
         
-    def get_file_hash(self, file_path: Path) -> str:
+    def get_file_hash(self, file_path: Path, stat: Optional[os.stat_result] = None) -> str:
         """Generate hash of file for caching"""
-        hasher = hashlib.md5()
-        with open(file_path, 'rb') as f:
-            buf = f.read()
-            hasher.update(buf)
-        return hasher.hexdigest()
+        return get_hash_registry().get(file_path, ("md5",), stat)["md5"]
     
-    def get_cache_path(self, file_path: Path) -> Path:
-        """Get cache file path for a document"""
-        file_hash = self.get_file_hash(file_path)
-        return self.cache_dir / f"{file_hash}.json"
+    def get_content_hash(self, file_path: Path, stat: Optional[os.stat_result] = None) -> str:
+        """Get the file hash, rehashing only when size, mtime or inode changed"""
+        stat = stat or file_path.stat()
+        file_hash = self.manifest.lookup(file_path, stat)
+        if file_hash is None:
+            file_hash = self.get_file_hash(file_path, stat)
+            self.manifest.record(file_path, stat, file_hash)
+        return file_hash
     
-    def load_from_cache(self, file_path: Path) -> Optional[Dict]:
+    def get_cache_path(self, file_path: Path, file_hash: Optional[str] = None) -> Path:
+        """Get cache metadata record path for a document"""
+        file_hash = file_hash or self.get_content_hash(file_path)
+        return self.cache.meta_path(file_hash)
+    
+    def load_from_cache(self, file_path: Path, file_hash: Optional[str] = None) -> Optional[Dict]:
         """Load processed document from cache"""
-        cache_path = self.get_cache_path(file_path)
-        if cache_path.exists():
-            try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load cache for {file_path}: {e}")
+        try:
+            file_hash = file_hash or self.get_content_hash(file_path)
+            return self.cache.get(file_hash)
+        except Exception as e:
+            logger.warning(f"Failed to load cache for {file_path}: {e}")
         return None
     
-    def save_to_cache(self, file_path: Path, data: Dict):
+    def save_to_cache(self, file_path: Path, data: Dict, file_hash: Optional[str] = None):
         """Save processed document to cache"""
-        cache_path = self.get_cache_path(file_path)
         try:
-            with open(cache_path, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
+            file_hash = file_hash or self.get_content_hash(file_path)
+            self.cache.put(file_hash, data)
         except Exception as e:
             logger.warning(f"Failed to save cache for {file_path}: {e}")
     
-    def extract_text_from_pdf(self, file_path: Path) -> str:
+    def extract_text_from_pdf(self, file_path: Path, file_hash: Optional[str] = None) -> str:
         """Extract text from PDF file"""
-        text = ""
+        text, _ = self._join_pages(self.extract_pdf_pages(file_path, file_hash))
+        return text
+    
+    def extract_pdf_pages(self, file_path: Source, file_hash: Optional[str] = None) -> List[str]:
+        """Extract text page by page, caching each page under the document hash
+        
+        Pages already cached are never re-extracted, so an interrupted run
+        resumes where it stopped. PyPDF2 is only used for pages pdfplumber
+        could not extract, and OCR only for pages with no text layer.
+        """
+        file_hash = file_hash or self.get_content_hash(file_path)
+        pages = self.cache.get_pages(file_hash)
+        page_count = self.cache.get_page_count(file_hash)
+        
+        if page_count is not None and len(pages) >= page_count:
+            return self._ocr_empty_pages(file_path, file_hash,
+                                         [pages[i] for i in range(page_count)])
         
         # Try pdfplumber first (better for tables)
         try:
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+                if page_count is None:
+                    page_count = len(pdf.pages)
+                    self.cache.put_page_count(file_hash, page_count)
+                
+                for index, page in enumerate(pdf.pages):
+                    if index in pages:
+                        continue
+                    try:
+                        page_text = (page.extract_text() or "").strip()
+                    except Exception as e:
+                        logger.warning(f"pdfplumber failed on page {index + 1} of {file_path}: {e}")
+                        continue
+                    pages[index] = page_text
+                    self.cache.put_page(file_hash, index, page_text)
         except Exception as e:
             logger.warning(f"pdfplumber failed for {file_path}: {e}")
-            
-            # Fallback to PyPDF2
+        
+        # Fallback to PyPDF2 for whatever is still missing
+        if page_count is None or len(pages) < page_count:
             try:
-                with open(file_path, 'rb') as f:
+                with _open_binary(file_path) as f:
                     reader = pypdf2.PdfReader(f)
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n"
+                    if page_count is None:
+                        page_count = len(reader.pages)
+                        self.cache.put_page_count(file_hash, page_count)
+                    
+                    for index in range(page_count):
+                        if index in pages:
+                            continue
+                        page_text = (reader.pages[index].extract_text() or "").strip()
+                        pages[index] = page_text
+                        self.cache.put_page(file_hash, index, page_text)
             except Exception as e:
                 logger.error(f"Failed to extract text from PDF {file_path}: {e}")
         
-        return text.strip()
+        return self._ocr_empty_pages(file_path, file_hash,
+                                     [pages.get(i, "") for i in range(page_count or 0)])
+    
+    def _ocr_empty_pages(self, file_path: Source, file_hash: str, pages: List[str]) -> List[str]:
+        """Fill pages that have no text layer with OCR output
+        
+        Only those pages are rendered; results are cached per page so each
+        scanned page is recognised once.
+        """
+        empty = [index for index, page_text in enumerate(pages) if not page_text]
+        if not empty:
+            return pages
+        
+        ocr_pages = self.cache.get_pages(file_hash, kind="ocr")
+        missing = [index for index in empty if index not in ocr_pages]
+        if missing:
+            try:
+                with pdfplumber.open(file_path) as pdf:
+                    jobs = ((pdf.pages[index].to_image(resolution=OCR_DPI).original, OCR_DPI)
+                            for index in missing)
+                    for index, page_text in zip(missing, ocr_images(jobs)):
+                        ocr_pages[index] = page_text
+                        self.cache.put_page(file_hash, index, page_text, kind="ocr")
+            except Exception as e:
+                logger.warning(f"OCR failed for {file_path}: {e}")
+        
+        return [page_text or ocr_pages.get(index, "") for index, page_text in enumerate(pages)]
     
-    def extract_text_from_excel(self, file_path: Path) -> str:
+    @staticmethod
+    def _join_pages(pages: List[str]) -> Tuple[str, List[Dict[str, int]]]:
+        """Join page texts, recording each page's character span in the result"""
+        parts = []
+        offsets = []
+        position = 0
+        
+        for index, page_text in enumerate(pages):
+            if parts and page_text:
+                position += 1  # Newline separator
+            offsets.append({"page": index + 1, "start": position, "end": position + len(page_text)})
+            if page_text:
+                parts.append(page_text)
+                position += len(page_text)
+        
+        return "\n".join(parts), offsets
+    
+    def extract_text_from_excel(self, file_path: Path, file_hash: Optional[str] = None) -> str:
         """Extract text from Excel file"""
+        text, _ = self.ingest_excel(file_path, file_hash)
+        return text
+    
+    def extract_text_from_csv(self, file_path: Path, file_hash: Optional[str] = None) -> str:
+        """Extract text from CSV file"""
+        text, _ = self.ingest_csv(file_path, file_hash)
+        return text
+    
+    def ingest_excel(self, file_path: Source, file_hash: Optional[str] = None,
+                     file_ext: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """Stream workbook rows into the transaction store, returning bounded text and table info"""
         try:
-            dfs = pd.read_excel(file_path, sheet_name=None)
-            text = ""
-            for sheet_name, df in dfs.items():
-                text += f"\n--- Sheet: {sheet_name} ---\n"
-                text += df.to_string() + "\n"
-            return text.strip()
+            file_hash = file_hash or self.get_content_hash(file_path)
+            return self._ingest_tables(file_hash, self._iter_excel_sheets(file_path, file_ext))
         except Exception as e:
             logger.error(f"Failed to extract text from Excel {file_path}: {e}")
-            return ""
+            return "", []
     
-    def extract_text_from_csv(self, file_path: Path) -> str:
-        """Extract text from CSV file"""
+    def ingest_csv(self, file_path: Source, file_hash: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """Stream CSV rows into the transaction store, returning bounded text and table info"""
         try:
-            df = pd.read_csv(file_path)
-            return df.to_string()
+            file_hash = file_hash or self.get_content_hash(file_path)
+            chunks = pd.read_csv(file_path, chunksize=TABULAR_CHUNK_ROWS, dtype=str, keep_default_na=False)
+            return self._ingest_tables(file_hash, [(None, chunks)])
         except Exception as e:
             logger.error(f"Failed to extract text from CSV {file_path}: {e}")
-            return ""
+            return "", []
     
-    def extract_text_from_txt(self, file_path: Path) -> str:
-        """Extract text from text file with encoding detection"""
+    def _iter_excel_sheets(self, file_path: Source,
+                           file_ext: Optional[str] = None) -> Iterator[Tuple[str, Iterable[pd.DataFrame]]]:
+        """Yield (sheet name, DataFrame chunks) without loading whole sheets"""
+        if (file_ext or file_path.suffix.lower()) == '.xls':
+            # The legacy format has no streaming reader
+            for sheet_name, df in pd.read_excel(file_path, sheet_name=None, dtype=str).items():
+                yield sheet_name, [df.fillna("")]
+            return
+        
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
         try:
-            # Detect encoding
-            with open(file_path, 'rb') as f:
-                raw_data = f.read()
-                result = chardet.detect(raw_data)
-                encoding = result['encoding'] or 'utf-8'
-            
-            with open(file_path, 'r', encoding=encoding) as f:
-                return f.read()
+            for worksheet in workbook.worksheets:
+                yield worksheet.title, self._iter_sheet_chunks(worksheet)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _iter_sheet_chunks(worksheet) -> Iterator[pd.DataFrame]:
+        rows = worksheet.iter_rows(values_only=True)
+        
+        # First non-empty row is the header
+        header = None
+        for row in rows:
+            if any(value is not None for value in row):
+                header = row
+                break
+        if header is None:
+            return
+        
+        columns = []
+        for i, value in enumerate(header):
+            name = str(value) if value is not None else f"Unnamed: {i}"
+            while name in columns:
+                name += f".{i}"
+            columns.append(name)
+        width = len(columns)
+        
+        start = 0
+        batch = []
+        for row in rows:
+            batch.append(["" if v is None else str(v) for v in row[:width]] + [""] * (width - len(row)))
+            if len(batch) >= TABULAR_CHUNK_ROWS:
+                yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+    
+    def _ingest_tables(self, file_hash: str,
+                       sheets: Iterable[Tuple[Optional[str], Iterable[pd.DataFrame]]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Write each sheet's chunks to the transaction store while rendering bounded text"""
+        text = _BoundedText(TABULAR_TEXT_MAX_CHARS)
+        tables = []
+        
+        with self.transactions.begin(file_hash) as batch:
+            for sheet_name, chunks in sheets:
+                if sheet_name is not None:
+                    text.add_heading(f"--- Sheet: {sheet_name} ---")
+                writer = batch.table(sheet_name or "")
+                for chunk in chunks:
+                    text.add_rows(chunk, header=writer.rows == 0)
+                    writer.write(chunk)
+                if writer.rows:
+                    tables.append({
+                        "sheet": sheet_name,
+                        "sheet_index": len(batch.writers) - 1,
+                        "rows": writer.rows,
+                        "columns": writer.columns
+                    })
+        
+        return text.render(), tables
+    
+    def extract_text_from_txt(self, file_path: Source, file_hash: Optional[str] = None) -> str:
+        """Extract text from text file with encoding detection
+        
+        The encoding is detected from a bounded sample (remembered per file
+        hash) and the file is decoded in one streaming pass.
+        """
+        try:
+            return "".join(self._iter_text(file_path, file_hash or self.get_content_hash(file_path)))
         except Exception as e:
             logger.error(f"Failed to extract text from {file_path}: {e}")
             return ""
     
+    def _iter_text(self, file_path: Source, file_hash: str) -> Iterator[str]:
+        """Decode a text file chunk by chunk"""
+        cached = self.cache.get_extra(file_hash, "encoding")
+        encoding = cached.decode("ascii") if cached else None
+        
+        with _open_binary(file_path) as f:
+            sample = b""
+            if encoding is None:
+                sample, encoding = self._detect_encoding(f)
+                self.cache.put_extra(file_hash, "encoding", encoding.encode("ascii"))
+            
+            decoder = io.IncrementalNewlineDecoder(
+                codecs.getincrementaldecoder(encoding)(errors="replace"), translate=True
+            )
+            yield decoder.decode(sample)
+            while True:
+                chunk = f.read(DECODE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield decoder.decode(chunk)
+            yield decoder.decode(b"", final=True)
+    
+    @staticmethod
+    def _detect_encoding(f) -> Tuple[bytes, str]:
+        """Detect encoding from the start of an open binary file
+        
+        Reads progressively larger samples, only escalating while chardet is
+        unsure. Returns the bytes consumed so the caller can decode them.
+        """
+        sample = b""
+        result: Dict[str, Any] = {}
+        
+        for size in ENCODING_SAMPLE_SIZES:
+            more = f.read(size - len(sample))
+            sample += more
+            at_eof = len(sample) < size
+            
+            for bom, encoding in _BOMS:
+                if sample.startswith(bom):
+                    return sample, encoding
+            
+            # Cheap check first: most statements and logs are ASCII/UTF-8
+            try:
+                sample.decode("utf-8")
+                return sample, "utf-8"
+            except UnicodeDecodeError as e:
+                # A multi-byte character cut off by the sample boundary
+                if not at_eof and e.reason == "unexpected end of data":
+                    return sample, "utf-8"
+            
+            result = chardet.detect(sample)
+            if result.get("encoding") and (result.get("confidence", 0) >= ENCODING_CONFIDENCE or at_eof):
+                break
+            if at_eof:
+                break
+        
+        return sample, result.get("encoding") or "utf-8"
+    
+    def extract_text_from_image(self, file_path: Source, file_hash: Optional[str] = None) -> str:
+        """Extract text from a scanned image with OCR, cached by content hash"""
+        file_hash = file_hash or self.get_content_hash(file_path)
+        cached = self.cache.get_extra(file_hash, "ocr")
+        if cached is not None:
+            return cached.decode("utf-8")
+        
+        try:
+            text = ocr_job((file_path, None))
+        except Exception as e:
+            logger.error(f"Failed to OCR image {file_path}: {e}")
+            return ""
+        
+        self.cache.put_extra(file_hash, "ocr", text.encode("utf-8"))
+        return text
+    
+    def ocr_image_batch(self, file_paths: List[Path]):
+        """OCR uncached images together in the OCR process pool
+        
+        Results land in the cache, where extract_text_from_image picks them
+        up; images that fail here are retried individually later.
+        """
+        pending = []
+        for file_path in file_paths:
+            try:
+                file_hash = self.get_content_hash(file_path)
+            except OSError:
+                continue
+            if self.cache.get_extra(file_hash, "ocr") is None and \
+                    not self.cache.meta_path(file_hash).exists():
+                pending.append((file_path, file_hash))
+        
+        if not pending:
+            return
+        
+        try:
+            results = ocr_images((file_path, None) for file_path, _ in pending)
+            for (_, file_hash), text in zip(pending, results):
+                self.cache.put_extra(file_hash, "ocr", text.encode("utf-8"))
+        except Exception as e:
+            logger.warning(f"Batched OCR stopped early: {e}")
+    
     def process_document(self, file_path: Path) -> Dict[str, Any]:
         """Process a single document and extract metadata and content"""
-        # Check cache first
-        cached_data = self.load_from_cache(file_path)
+        # Check cache first; unchanged files resolve their hash from one stat()
+        stat = file_path.stat()
+        file_hash = self.get_content_hash(file_path, stat)
+        file_ext = file_path.suffix.lower()
+        
+        if stat.st_size > LARGE_FILE_BYTES and file_ext in STREAMED_TYPES:
+            return self.process_large_document(file_path, stat, file_hash)
+        
+        cached_data = self.load_from_cache(file_path, file_hash)
         if cached_data:
             return cached_data
         
-        file_ext = file_path.suffix.lower()
+        text, extracted = self._extract_content(file_path, file_ext, file_hash)
         
-        # Extract text based on file type
+        document_data = self._document_metadata(file_path, stat, file_hash, len(text))
+        document_data["content"] = text
+        document_data.update(extracted)
+        
+        # Save to cache
+        self.save_to_cache(file_path, document_data, file_hash)
+        
+        return document_data
+    
+    def _extract_content(self, source: Source, file_ext: str,
+                         file_hash: str) -> Tuple[str, Dict[str, Any]]:
+        """Extract text based on file type, with any per-type document fields"""
         text = ""
+        extracted: Dict[str, Any] = {}
         if file_ext == '.pdf':
-            text = self.extract_text_from_pdf(file_path)
+            text, extracted["page_offsets"] = self._join_pages(self.extract_pdf_pages(source, file_hash))
         elif file_ext in ['.xlsx', '.xls']:
-            text = self.extract_text_from_excel(file_path)
+            text, tables = self.ingest_excel(source, file_hash, file_ext)
+            if tables:
+                extracted["tables"] = tables
         elif file_ext == '.csv':
-            text = self.extract_text_from_csv(file_path)
+            text, tables = self.ingest_csv(source, file_hash)
+            if tables:
+                extracted["tables"] = tables
         elif file_ext in ['.txt', '.md']:
-            text = self.extract_text_from_txt(file_path)
+            text = self.extract_text_from_txt(source, file_hash)
+        elif file_ext in IMAGE_TYPES:
+            text = self.extract_text_from_image(source, file_hash)
+        return text, extracted
+    
+    def process_archive(self, archive_path: Path) -> List[DocumentRecord]:
+        """Extract every supported document inside a zip, tar or gzip archive
         
-        # Get file metadata
-        stat = file_path.stat()
-        relative_path = file_path.relative_to(BASE_DIR)
+        Members are read in memory, never written to disk, and nested
+        archives are expanded up to ARCHIVE_MAX_DEPTH levels. Each member is
+        cached under a key derived from (archive hash, member path, member
+        CRC), and the member list under the archive's own key, so an
+        unchanged archive is not reopened on the next scan and an interrupted
+        expansion skips the members it already extracted.
+        """
+        archive_hash = self.get_content_hash(archive_path)
+        documents = self._cached_archive(archive_hash)
+        if documents is not None:
+            return documents
+        
+        with open(archive_path, 'rb') as f:
+            documents = self._expand_archive(f, archive_path.name, archive_hash, archive_path, "", 0)
+        return documents
+    
+    def _cached_archive(self, archive_hash: str) -> Optional[List[DocumentRecord]]:
+        listing = self.cache.get_extra(archive_hash, "archive-members")
+        if listing is None:
+            return None
+        documents = []
+        for member_hash in json.loads(listing):
+            metadata = self.cache.get_metadata(member_hash)
+            if metadata is None:
+                return None
+            documents.append(DocumentRecord.from_document(metadata, self.load_content))
+        return documents
+    
+    def _expand_archive(self, fileobj: BinaryIO, name: str, archive_hash: str,
+                        archive_path: Path, prefix: str, depth: int) -> List[DocumentRecord]:
+        documents = []
+        try:
+            for member in iter_members(fileobj, name, ARCHIVE_MEMBER_MAX_MB * 1024 * 1024):
+                member_path = prefix + member.path
+                member_hash = hashlib.md5(
+                    f"{archive_hash}\0{member.path}\0{member.fingerprint}".encode("utf-8")
+                ).hexdigest()
+                try:
+                    if is_archive(member.path):
+                        if depth + 1 > ARCHIVE_MAX_DEPTH:
+                            logger.warning(f"Not expanding {archive_path}!/{member_path}: "
+                                           f"nested deeper than {ARCHIVE_MAX_DEPTH} archives")
+                            continue
+                        nested = self._cached_archive(member_hash)
+                        if nested is None:
+                            nested = self._expand_archive(io.BytesIO(member.read()), member.path, member_hash,
+                                                          archive_path, member_path + "!/", depth + 1)
+                        documents.extend(nested)
+                    elif Path(member.path).suffix.lower() in SUPPORTED_FILE_TYPES:
+                        metadata = self.cache.get_metadata(member_hash)
+                        if metadata is None:
+                            metadata = self._process_member(member, member_path, member_hash, archive_path)
+                        documents.append(DocumentRecord.from_document(metadata, self.load_content))
+                except MemberTooLarge as e:
+                    logger.warning(f"Skipping {archive_path}!/{member_path}: {e}")
+                except Exception as e:
+                    logger.error(f"Failed to process {archive_path}!/{member_path}: {e}")
+        except Exception as e:
+            # A truncated or corrupt archive keeps the members read so far,
+            # but is not recorded as complete
+            logger.error(f"Failed to read archive {archive_path}!/{prefix}{name}: {e}")
+            return documents
         
+        self.cache.put_extra(archive_hash, "archive-members",
+                             json.dumps([doc["file_hash"] for doc in documents]).encode("utf-8"))
+        return documents
+    
+    def process_mbox(self, mbox_path: Path) -> List[DocumentRecord]:
+        """Extract every message of an mbox file as its own document
+        
+        Message boundaries come from a memory-mapped pass and are kept in an
+        offset index under the cache directory. Only messages that are new,
+        changed or evicted are parsed, in parallel by offset range, so a
+        mailbox that was appended to costs a scan of the new tail.
+        """
+        index = MboxIndex(self.cache_dir / "mbox" / f"{hashlib.md5(str(mbox_path).encode()).hexdigest()}.mpk")
+        with open(mbox_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index.refresh(mm, stat)
+        
+        ranges = index.ranges()
+        pending = [i for i, key in enumerate(index.keys)
+                   if key is None or not self.cache.meta_path(key).exists()]
+        if pending:
+            logger.info(f"Parsing {len(pending)} of {len(ranges)} messages in {mbox_path}")
+            positions = {ranges[i][0]: i for i in pending}
+            try:
+                for start, key, message in parse_ranges(mbox_path, [ranges[i] for i in pending]):
+                    i = positions[start]
+                    index.keys[i] = key
+                    self.cache.put(key, self._message_document(mbox_path, stat, i, ranges[i], key, message))
+            finally:
+                # Keep what was parsed, so an interrupted run resumes
+                index.save()
+        
+        documents = []
+        for key in index.keys:
+            metadata = self.cache.get_metadata(key) if key else None
+            if metadata is not None:
+                documents.append(DocumentRecord.from_document(metadata, self.load_content))
+        return documents
+    
+    def _message_document(self, mbox_path: Path, stat: os.stat_result, number: int,
+                          byte_range: Tuple[int, int], key: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        relative_path = mbox_path.relative_to(BASE_DIR)
+        name = f"message-{number:06d}.eml"
+        body = message["body"]
+        return {
+            "file_path": f"{mbox_path}!/{name}",
+            "relative_path": f"{relative_path}!/{name}",
+            "file_name": name,
+            "file_type": ".eml",
+            "file_size": byte_range[1] - byte_range[0],
+            "file_hash": key,
+            "modified_time": message["sent"] or datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "content": body,
+            "content_length": len(body),
+            "category": "communications",
+            "email_metadata": message["email_metadata"],
+            "mbox_path": str(mbox_path),
+            "mbox_offset": byte_range[0]
+        }
+    
+    def parse_email(self, file_path: Path) -> Dict[str, Any]:
+        """Parse an .eml file and run its attachments through extraction
+        
+        Returns email_metadata, body and an attachments list of metadata
+        records (content stays in the cache). Attachments are keyed by the
+        hash of their decoded bytes, so a statement attached to many emails
+        is extracted once.
+        """
+        with open(file_path, 'rb') as f:
+            msg = BytesParser(policy=policy.default).parse(f)
+        
+        attachments = []
+        for attachment in iter_attachments(msg):
+            try:
+                attachments.append(self._process_attachment(file_path, attachment))
+            except Exception as e:
+                logger.error(f"Failed to process attachment {attachment.filename} of {file_path}: {e}")
+        
+        return {
+            "email_metadata": message_metadata(msg),
+            "body": message_body(msg),
+            "attachments": attachments
+        }
+    
+    def _process_attachment(self, email_path: Path, attachment: Attachment) -> Dict[str, Any]:
+        # Hash first, decoding chunk by chunk; a known attachment is never buffered
+        hasher = hashlib.md5(b"attachment\0")
+        size = 0
+        for chunk in iter_decoded(attachment.part):
+            hasher.update(chunk)
+            size += len(chunk)
+        key = hasher.hexdigest()
+        
+        metadata = self.cache.get_metadata(key)
+        if metadata is not None:
+            return metadata
+        
+        file_name = Path(attachment.filename).name
+        file_ext = Path(file_name).suffix.lower()
+        text, extracted = "", {}
+        if file_ext in SUPPORTED_FILE_TYPES:
+            buffer = io.BytesIO()
+            for chunk in iter_decoded(attachment.part):
+                buffer.write(chunk)
+            text, extracted = self._extract_content(buffer, file_ext, key)
+        
+        relative_path = email_path.relative_to(BASE_DIR)
+        document_data = {
+            "file_path": f"{email_path}!/{file_name}",
+            "relative_path": f"{relative_path}!/{file_name}",
+            "file_name": file_name,
+            "file_type": file_ext,
+            "file_size": size,
+            "file_hash": key,
+            "modified_time": datetime.fromtimestamp(email_path.stat().st_mtime).isoformat(),
+            "content": text,
+            "content_length": len(text),
+            "category": self._determine_category(relative_path),
+            "content_type": attachment.content_type,
+            "attachment_of": str(email_path),
+            **extracted
+        }
+        self.cache.put(key, document_data)
+        return {k: v for k, v in document_data.items() if k != "content"}
+    
+    def _process_member(self, member: ArchiveMember, member_path: str,
+                        member_hash: str, archive_path: Path) -> Dict[str, Any]:
+        """Run one archive member through the normal extraction pipeline"""
+        data = member.read()
+        file_ext = Path(member.path).suffix.lower()
+        text, extracted = self._extract_content(io.BytesIO(data), file_ext, member_hash)
+        
+        relative_path = archive_path.relative_to(BASE_DIR)
+        modified = member.modified or datetime.fromtimestamp(archive_path.stat().st_mtime)
         document_data = {
+            "file_path": f"{archive_path}!/{member_path}",
+            "relative_path": f"{relative_path}!/{member_path}",
+            "file_name": Path(member.path).name,
+            "file_type": file_ext,
+            "file_size": len(data),
+            "file_hash": member_hash,
+            "modified_time": modified.isoformat(),
+            "content": text,
+            "content_length": len(text),
+            "category": self._determine_category(relative_path),
+            "archive_path": str(archive_path),
+            "archive_member": member_path,
+            **extracted
+        }
+        self.cache.put(member_hash, document_data)
+        return document_data
+    
+    def _document_metadata(self, file_path: Path, stat: os.stat_result,
+                           file_hash: str, content_length: int) -> Dict[str, Any]:
+        relative_path = file_path.relative_to(BASE_DIR)
+        return {
             "file_path": str(file_path),
             "relative_path": str(relative_path),
             "file_name": file_path.name,
-            "file_type": file_ext,
+            "file_type": file_path.suffix.lower(),
             "file_size": stat.st_size,
+            "file_hash": file_hash,
             "modified_time": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            "content": text,
-            "content_length": len(text),
+            "content_length": content_length,
             "category": self._determine_category(relative_path)
         }
+    
+    def process_large_document(self, file_path: Path, stat: Optional[os.stat_result] = None,
+                               file_hash: Optional[str] = None) -> DocumentRecord:
+        """Stream a large PDF or text file into the content store
         
-        # Save to cache
-        self.save_to_cache(file_path, document_data)
+        Text is written to the cache as it is extracted, a page (PDF) or a
+        decoded chunk (text) at a time, so memory use does not grow with the
+        file. The returned record loads its content from the cache on demand.
+        """
+        stat = stat or file_path.stat()
+        file_hash = file_hash or self.get_content_hash(file_path, stat)
         
-        return document_data
+        metadata = self.cache.get_metadata(file_hash)
+        if metadata is not None and self.cache.content_path(file_hash).exists():
+            return DocumentRecord.from_document(metadata, self.load_content)
+        
+        page_offsets = None
+        with self.cache.content_writer(file_hash) as writer:
+            if file_path.suffix.lower() == '.pdf':
+                page_offsets = self._stream_pdf_pages(file_path, writer)
+            else:
+                for text in self._iter_text(file_path, file_hash):
+                    writer.write(text)
+        
+        document_data = self._document_metadata(file_path, stat, file_hash, writer.chars)
+        if page_offsets is not None:
+            document_data["page_offsets"] = page_offsets
+        self.cache.put_metadata(file_hash, document_data)
+        
+        return DocumentRecord.from_document(document_data, self.load_content)
+    
+    def _stream_pdf_pages(self, file_path: Path, writer) -> List[Dict[str, int]]:
+        """Write each page's text as it is extracted, releasing the page after
+        
+        Pages are laid out as in _join_pages; pages without a text layer are
+        OCRed one at a time.
+        """
+        offsets = []
+        with pdfplumber.open(file_path) as pdf:
+            for index, page in enumerate(pdf.pages):
+                try:
+                    page_text = (page.extract_text() or "").strip()
+                    if not page_text:
+                        page_text = ocr_job((page.to_image(resolution=OCR_DPI).original, OCR_DPI))
+                except Exception as e:
+                    logger.warning(f"Failed to extract page {index + 1} of {file_path}: {e}")
+                    page_text = ""
+                finally:
+                    # Drop the parsed layout so memory stays flat across pages
+                    page.close()
+                
+                if writer.chars and page_text:
+                    writer.write("\n")
+                offsets.append({"page": index + 1, "start": writer.chars,
+                                "end": writer.chars + len(page_text)})
+                writer.write(page_text)
+        
+        return offsets
+    
+    def process_isolated(self, file_path: Path) -> Optional[DocumentRecord]:
+        """Process one file in a supervised worker under the large-file memory cap
+        
+        Files that exceed the cap are quarantined, as in pooled scans.
+        """
+        if self.is_quarantined(file_path):
+            logger.warning(f"Skipping quarantined file {file_path}")
+            return None
+        
+        supervisor = ExtractionSupervisor(
+            _process_in_worker,
+            workers=1,
+            timeout=None,
+            memory_limit_mb=LARGE_FILE_MEMORY_LIMIT_MB,
+            initializer=_init_worker
+        )
+        for outcome in supervisor.run([file_path]):
+            if outcome.quarantined:
+                self.quarantine_file(file_path, outcome.error)
+                return None
+            if outcome.error:
+                logger.error(f"Failed to process {file_path}: {outcome.error}")
+                return None
+            return DocumentRecord.from_document(outcome.result, self.load_content)
+        return None
+    
+    def load_content(self, document: Mapping) -> str:
+        """Fetch a document's text from the cache, re-extracting if it was evicted"""
+        file_hash = document.get("file_hash")
+        if file_hash:
+            try:
+                content = self.cache.get_content(file_hash)
+                if content is not None:
+                    return content
+            except Exception as e:
+                logger.warning(f"Failed to load cached content for {document.get('file_path')}: {e}")
+        
+        try:
+            if document.get("archive_path"):
+                # Members have no file of their own; re-expanding the archive re-caches them
+                self.process_archive(Path(document["archive_path"]))
+                return self.cache.get_content(file_hash) or ""
+            if document.get("attachment_of"):
+                self.parse_email(Path(document["attachment_of"]))
+                return self.cache.get_content(file_hash) or ""
+            if document.get("mbox_path"):
+                self.process_mbox(Path(document["mbox_path"]))
+                return self.cache.get_content(file_hash) or ""
+            return self.process_document(Path(document["file_path"]))["content"]
+        except Exception as e:
+            logger.error(f"Failed to load content for {document.get('file_path')}: {e}")
+            return ""
     
     def _determine_category(self, relative_path: Path) -> str:
         """Determine document category based on path"""
@@ -171,34 +815,264 @@ class DocumentProcessor:
                     return category
         return "other"
     
-    def scan_documents(self, base_path: Path = BASE_DIR) -> List[Dict[str, Any]]:
-        """Scan all documents in the package"""
-        documents = []
+    def scan_documents(self, base_path: Path = BASE_DIR,
+                       workers: Optional[int] = None) -> List[DocumentRecord]:
+        """Scan all documents in the package
+
+        With more than one worker, extraction runs in supervised worker
+        processes with a per-file time and memory budget; results are returned
+        in discovery order regardless of completion order. Files that blew
+        their budget on an earlier scan are skipped until they change.
+        
+        Returned records hold metadata only and load content lazily.
+        Near-duplicate copies carry "duplicate_of"; see mark_near_duplicates.
+        """
+        workers = workers or SCAN_WORKERS
+        # Single walk; hidden directories and flow_analyzer itself are pruned
+        file_paths = list(walk_files(
+            base_path,
+            suffixes=SUPPORTED_FILE_TYPES,
+            skip_dirs={'flow_analyzer'}
+        ))
+        
+        quarantined = [p for p in file_paths if self.is_quarantined(p)]
+        if quarantined:
+            logger.warning(f"Skipping {len(quarantined)} quarantined files")
+            file_paths = [p for p in file_paths if not self.is_quarantined(p)]
         
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[throughput]}"),
             console=console
         ) as progress:
-            task = progress.add_task("Scanning documents...", total=None)
+            task = progress.add_task("Scanning documents...", total=len(file_paths), throughput="")
             
-            for ext in SUPPORTED_FILE_TYPES:
-                for file_path in base_path.rglob(f"*{ext}"):
-                    # Skip hidden files and directories
-                    if any(part.startswith('.') for part in file_path.parts):
-                        continue
-                    
-                    # Skip the flow_analyzer directory itself
-                    if 'flow_analyzer' in file_path.parts:
-                        continue
-                    
-                    progress.update(task, description=f"Processing {file_path.name}...")
-                    
-                    try:
-                        doc_data = self.process_document(file_path)
-                        documents.append(doc_data)
-                    except Exception as e:
-                        logger.error(f"Failed to process {file_path}: {e}")
+            if workers > 1 and len(file_paths) > 1:
+                results = self._scan_parallel(file_paths, workers, progress, task)
+            else:
+                results = self._scan_serial(file_paths, progress, task)
         
+        # Keep only metadata in memory; content is read back from the cache on demand
+        documents = [
+            DocumentRecord.from_document(doc, self.load_content)
+            for doc in results if doc is not None
+        ]
+        documents = mark_near_duplicates(documents, self.cache)
+        # Record this scan's cache hits for LRU eviction
+        self.cache.flush_touches()
         console.print(f"[green]✓[/green] Processed {len(documents)} documents")
-        return documents
\ No newline at end of file
+        return documents
+    
+    def _scan_serial(self, file_paths: List[Path], progress: Progress, task) -> List[Optional[Dict[str, Any]]]:
+        """Process files one at a time in this process"""
+        results = []
+        meter = _ThroughputMeter()
+        
+        images = [p for p in file_paths if p.suffix.lower() in IMAGE_TYPES]
+        if len(images) > 1:
+            progress.update(task, description=f"OCR {len(images)} images...")
+            self.ocr_image_batch(images)
+        
+        for file_path in file_paths:
+            progress.update(task, description=f"Processing {file_path.name}...")
+            
+            try:
+                results.append(self.process_document(file_path))
+            except Exception as e:
+                logger.error(f"Failed to process {file_path}: {e}")
+                results.append(None)
+            
+            meter.add(_file_size(file_path))
+            progress.update(task, advance=1, throughput=meter.render())
+        
+        return results
+    
+    def _scan_parallel(self, file_paths: List[Path], workers: int,
+                       progress: Progress, task) -> List[Optional[Dict[str, Any]]]:
+        """Process files in supervised worker processes, preserving input order
+        
+        Each file gets EXTRACTION_TIMEOUT seconds and EXTRACTION_MEMORY_LIMIT_MB
+        of resident memory; a worker that exceeds either is killed and replaced
+        and the file is quarantined.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        meter = _ThroughputMeter()
+        progress.update(task, description=f"Processing with {workers} workers...")
+        
+        supervisor = ExtractionSupervisor(
+            _process_in_worker,
+            workers=workers,
+            timeout=EXTRACTION_TIMEOUT,
+            memory_limit_mb=EXTRACTION_MEMORY_LIMIT_MB,
+            initializer=_init_worker
+        )
+        
+        for outcome in supervisor.run(file_paths):
+            file_path = file_paths[outcome.index]
+            
+            if outcome.quarantined:
+                self.quarantine_file(file_path, outcome.error)
+            elif outcome.error:
+                logger.error(f"Failed to process {file_path}: {outcome.error}")
+            results[outcome.index] = outcome.result
+            
+            meter.add(_file_size(file_path))
+            progress.update(task, advance=1, throughput=meter.render())
+        
+        return results
+    
+    def _load_quarantine(self) -> Dict[str, Dict[str, Any]]:
+        """Load the quarantine list of files that blew their extraction budget"""
+        if self.quarantine_path.exists():
+            try:
+                with open(self.quarantine_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load quarantine list: {e}")
+        return {}
+    
+    def quarantine_file(self, file_path: Path, reason: str):
+        """Record a file that could not be extracted within its budget"""
+        logger.error(f"Quarantined {file_path}: {reason}")
+        try:
+            stat = file_path.stat()
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime_ns = None, None
+        
+        self.quarantine[str(file_path)] = {
+            "reason": reason,
+            "file_size": size,
+            "mtime_ns": mtime_ns,
+            "quarantined_at": datetime.now().isoformat()
+        }
+        try:
+            with open(self.quarantine_path, 'w') as f:
+                json.dump(self.quarantine, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Failed to save quarantine list: {e}")
+    
+    def is_quarantined(self, file_path: Path) -> bool:
+        """A quarantined file is retried once its size or mtime changes"""
+        entry = self.quarantine.get(str(file_path))
+        if not entry:
+            return False
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return False
+        return (entry["file_size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)
+
+class _BoundedText:
+    """Text rendering of table rows for search, capped at max_chars"""
+    
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.size = 0
+        self.rows_total = 0
+        self.rows_rendered = 0
+    
+    def _append(self, part: str) -> bool:
+        if self.size + len(part) > self.max_chars:
+            return False
+        self.parts.append(part)
+        self.size += len(part) + 1
+        return True
+    
+    def add_heading(self, heading: str):
+        self._append(heading)
+    
+    def add_rows(self, chunk: pd.DataFrame, header: bool):
+        self.rows_total += len(chunk)
+        if self.rows_rendered == self.rows_total - len(chunk):
+            if self._append(chunk.to_string(header=header)):
+                self.rows_rendered += len(chunk)
+    
+    def render(self) -> str:
+        text = "\n".join(self.parts)
+        if self.rows_rendered < self.rows_total:
+            text += (f"\n[{self.rows_total - self.rows_rendered} of {self.rows_total} rows not rendered; "
+                     f"all rows are in the transaction store]")
+        return text.strip()
+
+
+class _ThroughputMeter:
+    """Tracks files/sec and bytes/sec across a whole scan"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.files = 0
+        self.bytes = 0
+    
+    def add(self, size: int):
+        self.files += 1
+        self.bytes += size
+    
+    def render(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (f"{self.files / elapsed:.1f} files/s "
+                f"{filesize.decimal(int(self.bytes / elapsed))}/s")
+
+
+def _file_size(file_path: Path) -> int:
+    try:
+        return file_path.stat().st_size
+    except OSError:
+        return 0
+
+
+IMAGE_TYPES = ('.png', '.jpg', '.jpeg')
+
+# Files above this size are streamed rather than extracted in memory, for the
+# types that can be streamed (tabular files are always chunked)
+LARGE_FILE_BYTES = LARGE_FILE_THRESHOLD_MB * 1024 * 1024
+STREAMED_TYPES = ('.pdf', '.txt', '.md')
+
+# Encoding detection samples (bytes), tried in order while chardet is unsure
+ENCODING_SAMPLE_SIZES = (64 * 1024, 512 * 1024, 4 * 1024 * 1024)
+ENCODING_CONFIDENCE = 0.8
+DECODE_CHUNK_BYTES = 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _open_binary(source: Source):
+    """Open a path for reading, or rewind an in-memory file for reuse"""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    source.seek(0)
+    return contextlib.nullcontext(source)
+
+
+# Per-process processor used by scan workers
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def _init_worker():
+    global _worker_processor
+    _worker_processor = DocumentProcessor()
+
+
+def _parse_email_in_worker(file_path: Path) -> Dict[str, Any]:
+    return _worker_processor.parse_email(file_path)
+
+
+def _process_in_worker(file_path: Path) -> Dict[str, Any]:
+    """Run process_document in a supervised worker
+    
+    The content is already in the cache, so only metadata is sent back.
+    """
+    document = _worker_processor.process_document(file_path)
+    if isinstance(document, DocumentRecord):
+        return document.metadata()
+    return {k: v for k, v in document.items() if k != "content"}
@@ -0,0 +1,96 @@
+"""
+Memory-lean document records
+Holds only document metadata; the extracted text is fetched on demand from the
+document cache so large cases don't keep every statement's text in memory
+"""
+
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Metadata every processed document carries, stored in slots
+FIELDS = (
+    "file_path",
+    "relative_path",
+    "file_name",
+    "file_type",
+    "file_size",
+    "file_hash",
+    "modified_time",
+    "content_length",
+    "category",
+)
+
+_FIELD_SET = frozenset(FIELDS)
+
+
+class DocumentRecord(Mapping):
+    """Read-only mapping view of a document with lazily loaded content
+
+    Supports the same ``doc["file_name"]`` / ``doc.get("content")`` access as
+    the plain document dicts, so existing consumers work unchanged. Reading
+    ``content`` calls the loader each time; the text is never retained.
+    Less common keys (page_offsets, email_metadata, ...) live in ``extra``.
+    """
+
+    __slots__ = FIELDS + ("extra", "_loader")
+
+    def __init__(self, loader: Callable[["DocumentRecord"], str],
+                 extra: Optional[Dict[str, Any]] = None, **fields: Any):
+        for name in FIELDS:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            extra = {**(extra or {}), **fields}
+        self.extra = extra or None
+        self._loader = loader
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any],
+                      loader: Callable[["DocumentRecord"], str]) -> "DocumentRecord":
+        """Build a record from a processed document dict, dropping its content"""
+        if isinstance(document, cls):
+            return document
+        fields = {k: v for k, v in document.items() if k != "content"}
+        if fields.get("content_length") is None and "content" in document:
+            fields["content_length"] = len(document["content"])
+        return cls(loader, **fields)
+
+    @property
+    def content(self) -> str:
+        return self._loader(self) or ""
+
+    def with_extra(self, **fields: Any) -> "DocumentRecord":
+        """A copy of this record with additional metadata fields"""
+        return DocumentRecord(self._loader, extra={**(self.extra or {}), **fields},
+                              **{name: getattr(self, name) for name in FIELDS})
+
+    def metadata(self) -> Dict[str, Any]:
+        """All fields except content, as a plain dict"""
+        data = {name: getattr(self, name) for name in FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "content":
+            return self.content
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        # Avoid Mapping's default, which would load the content
+        return key in _FIELD_SET or key == "content" or bool(self.extra and key in self.extra)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        yield "content"
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(FIELDS) + 1 + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self) -> str:
+        return f"DocumentRecord({self.file_name!r}, category={self.category!r})"
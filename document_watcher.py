@@ -0,0 +1,188 @@
+"""
+Watch mode: incrementally re-ingests documents as they change under BASE_DIR
+Filesystem events are debounced and coalesced per path, then only new, changed
+or deleted files are re-extracted and re-indexed
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler, FileSystemEvent
+
+from document_processor import DocumentProcessor
+from document_record import DocumentRecord
+from config import BASE_DIR, SUPPORTED_FILE_TYPES, WATCH_DEBOUNCE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "DocumentWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.is_directory:
+            return
+        self.watcher.record(Path(event.src_path))
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.record(Path(dest_path))
+
+
+class DocumentWatcher:
+    """Keeps a document set and vector index in step with the filesystem
+
+    Events are only collected per path; once no new event has arrived for
+    debounce seconds, each touched path is resolved against the filesystem,
+    so a burst of create/modify/move events costs one extraction per file.
+    """
+
+    def __init__(self, processor: DocumentProcessor,
+                 analyzer=None,
+                 base_path: Path = BASE_DIR,
+                 debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 documents: Optional[List[Dict[str, Any]]] = None,
+                 on_update: Optional[Callable[[List[Dict[str, Any]], List[str]], None]] = None):
+        self.processor = processor
+        self.analyzer = analyzer
+        self.base_path = Path(base_path)
+        self.debounce = debounce
+        self.on_update = on_update
+        # Metadata-only records; content is read back from the cache on demand
+        self.documents: Dict[str, DocumentRecord] = {
+            doc["file_path"]: DocumentRecord.from_document(doc, processor.load_content)
+            for doc in (documents or [])
+        }
+
+        self._pending: Dict[Path, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer: Optional[Observer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _is_watched(self, path: Path) -> bool:
+        try:
+            relative = path.relative_to(self.base_path)
+        except ValueError:
+            return False
+        if any(part.startswith('.') or part == 'flow_analyzer' for part in relative.parts):
+            return False
+        return path.suffix.lower() in SUPPORTED_FILE_TYPES
+
+    def record(self, path: Path):
+        """Note that a path changed; it is processed after the debounce window"""
+        if self._is_watched(path):
+            with self._lock:
+                self._pending[path] = time.monotonic()
+
+    def flush(self, force: bool = False) -> int:
+        """Process pending paths whose events have settled; returns the count"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                return 0
+            # Wait for the whole burst to settle so a batch of dropped files
+            # is handled together
+            if not force and now - max(self._pending.values()) < self.debounce:
+                return 0
+            paths = sorted(self._pending)
+            self._pending.clear()
+
+        changed = []
+        removed = []
+        for path in paths:
+            key = str(path)
+            if path.is_file():
+                try:
+                    doc = DocumentRecord.from_document(self.processor.process_document(path),
+                                                       self.processor.load_content)
+                except Exception as e:
+                    logger.error(f"Failed to process {path}: {e}")
+                    continue
+                previous = self.documents.get(key)
+                if previous and previous.get("file_hash") == doc.get("file_hash"):
+                    continue
+                self.documents[key] = doc
+                changed.append(doc)
+            else:
+                # Files indexed before the watcher started aren't in
+                # self.documents, so every deleted path is removed
+                self.documents.pop(key, None)
+                removed.append(key)
+                self._forget_cached(path)
+
+        if changed or removed:
+            self._reindex(changed, removed)
+            logger.info(f"Watch: {len(changed)} documents updated, {len(removed)} removed")
+            if self.on_update:
+                self.on_update(changed, removed)
+
+        return len(changed) + len(removed)
+
+    def _forget_cached(self, path: Path):
+        """Drop a deleted file's manifest entry, and its cached extraction
+        unless another file has the same content"""
+        file_hash = self.processor.manifest.forget(path)
+        if file_hash and not self.processor.manifest.references(file_hash):
+            self.processor.cache.remove(file_hash)
+
+    def _reindex(self, changed: List[Dict[str, Any]], removed: List[str]):
+        if not self.analyzer:
+            return
+        try:
+            # Changed documents replace their own stale chunks when re-indexed
+            if removed:
+                self.analyzer.remove_documents(removed)
+            self.analyzer.index_documents(changed)
+        except Exception as e:
+            logger.error(f"Failed to re-index watched documents: {e}")
+
+    def _run(self):
+        interval = min(self.debounce / 4, 0.5) if self.debounce else 0.1
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Watch flush failed: {e}")
+
+    def start(self):
+        """Start watching base_path in background threads"""
+        self._observer = Observer()
+        self._observer.schedule(_EventHandler(self), str(self.base_path), recursive=True)
+        self._observer.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="document-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.base_path} for document changes")
+
+    def stop(self):
+        """Stop watching and process anything still pending"""
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread:
+            self._thread.join()
+        self.flush(force=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    analyzer = None
+    if os.getenv("ANTHROPIC_API_KEY"):
+        from claude_integration import ClaudeAnalyzer
+        analyzer = ClaudeAnalyzer()
+
+    watcher = DocumentWatcher(DocumentProcessor(), analyzer)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
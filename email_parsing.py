@@ -0,0 +1,81 @@
+"""
+Helpers shared by .eml and mbox ingestion: header metadata, plain-text body,
+and attachments decoded in chunks rather than as one payload copy
+"""
+
+import binascii
+from email.message import EmailMessage
+from typing import Dict, Iterator, NamedTuple
+
+# Base64 characters decoded per step (a multiple of 4)
+DECODE_CHUNK_CHARS = 256 * 1024
+
+
+class Attachment(NamedTuple):
+    filename: str
+    content_type: str
+    part: EmailMessage
+
+
+def message_metadata(msg: EmailMessage) -> Dict[str, str]:
+    return {
+        'from': str(msg.get('From', '')),
+        'to': str(msg.get('To', '')),
+        'cc': str(msg.get('Cc', '')),
+        'subject': str(msg.get('Subject', '')),
+        'date': str(msg.get('Date', '')),
+        'message_id': str(msg.get('Message-ID', ''))
+    }
+
+
+def message_body(msg: EmailMessage) -> str:
+    """Concatenated text/plain parts that are not attachments"""
+    body = []
+    for part in msg.walk() if msg.is_multipart() else [msg]:
+        if part.get_content_type() != 'text/plain' or part.get_filename():
+            continue
+        try:
+            body.append(part.get_content())
+        except Exception:
+            # Unknown charsets; keep what can be read
+            payload = part.get_payload(decode=True) or b""
+            body.append(payload.decode('utf-8', errors='replace'))
+    return "\n".join(body)
+
+
+def iter_attachments(msg: EmailMessage) -> Iterator[Attachment]:
+    """Parts that carry a filename, including inline ones"""
+    if not msg.is_multipart():
+        return
+    for part in msg.walk():
+        filename = part.get_filename()
+        if filename and not part.is_multipart():
+            yield Attachment(filename, part.get_content_type(), part)
+
+
+def iter_decoded(part: EmailMessage) -> Iterator[bytes]:
+    """Yield an attachment's decoded bytes a chunk at a time
+
+    Base64 bodies, by far the common case, are decoded in slices, so hashing
+    an attachment never holds a second full copy of it.
+    """
+    if part.get('Content-Transfer-Encoding', '').strip().lower() != 'base64':
+        yield part.get_payload(decode=True) or b""
+        return
+
+    payload = part.get_payload(decode=False)
+    carry = ""
+    for start in range(0, len(payload), DECODE_CHUNK_CHARS):
+        text = carry + "".join(payload[start:start + DECODE_CHUNK_CHARS].split())
+        cut = len(text) - len(text) % 4
+        carry = text[cut:]
+        if cut:
+            yield binascii.a2b_base64(text[:cut])
+    tail = carry.rstrip("=")
+    if tail:
+        # Tolerate missing padding, as the email package does; a single
+        # dangling character holds no complete byte
+        try:
+            yield binascii.a2b_base64(tail + "=" * (-len(tail) % 4))
+        except binascii.Error:
+            pass
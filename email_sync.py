@@ -0,0 +1,256 @@
+"""
+Incremental email sync from the Cloudflare Worker
+Only mail newer than a persisted high-water mark is requested; pages are
+fetched concurrently over one pooled session, with exponential backoff on
+throttling and transient failures
+"""
+
+import os
+import json
+import math
+import random
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import aiohttp
+
+from config import (
+    EMAIL_SYNC_ADDRESS, EMAIL_SYNC_PAGE_SIZE, EMAIL_SYNC_CONCURRENCY,
+    EMAIL_SYNC_MAX_RETRIES, EMAIL_SYNC_BACKOFF_SECONDS, EMAIL_SYNC_TIMEOUT_SECONDS,
+    EMAIL_SYNC_LOOKBACK_DAYS, EMAIL_SYNC_MAX_PAGES
+)
+
+logger = logging.getLogger(__name__)
+
+# Throttling and server-side failures are retried; other errors are not
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class EmailSyncError(RuntimeError):
+    """The worker refused a request or kept failing after all retries"""
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    """Parse an ISO or RFC 2822 date; naive dates are taken as UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(str(value))
+        except (TypeError, ValueError):
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _email_id(email_data: Dict[str, Any]) -> str:
+    return str(email_data.get("id") or (
+        f"{email_data.get('from', '')}|{email_data.get('subject', '')}|{email_data.get('date', '')}"
+    ))
+
+
+class SyncCursor:
+    """High-water mark of a mailbox sync, persisted between runs
+
+    since is the newest message date already synced; boundary_ids holds the
+    messages dated exactly at since, which the inclusive next request returns
+    again and are dropped.
+    """
+
+    def __init__(self, cursor_path: Path):
+        self.cursor_path = cursor_path
+        self.since: Optional[datetime] = None
+        self.boundary_ids: List[str] = []
+
+        if cursor_path.exists():
+            try:
+                data = json.loads(cursor_path.read_text())
+                self.since = _parse_date(data.get("since"))
+                self.boundary_ids = data.get("boundary_ids", [])
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable sync cursor {cursor_path}: {e}")
+
+    def advance(self, emails: List[Dict[str, Any]]):
+        """Move the mark to the newest date among emails"""
+        for email_data in emails:
+            date = _parse_date(email_data.get("date"))
+            if date is None:
+                continue
+            if self.since is None or date > self.since:
+                self.since = date
+                self.boundary_ids = [_email_id(email_data)]
+            elif date == self.since:
+                self.boundary_ids.append(_email_id(email_data))
+
+    def save(self):
+        payload = json.dumps({
+            "since": self.since.isoformat() if self.since else None,
+            "boundary_ids": self.boundary_ids
+        })
+        self.cursor_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cursor_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.cursor_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class EmailSyncClient:
+    """Paginated, incremental client for the worker's fetch_emails action
+
+    The client keeps one aiohttp session for its lifetime (re-opened if the
+    event loop changes between scans); call close() when done.
+    """
+
+    def __init__(self, worker_url: str, cursor_path: Path,
+                 token: Optional[str] = None,
+                 address: str = EMAIL_SYNC_ADDRESS,
+                 page_size: int = EMAIL_SYNC_PAGE_SIZE,
+                 concurrency: int = EMAIL_SYNC_CONCURRENCY,
+                 max_retries: int = EMAIL_SYNC_MAX_RETRIES,
+                 backoff: float = EMAIL_SYNC_BACKOFF_SECONDS,
+                 max_pages: int = EMAIL_SYNC_MAX_PAGES):
+        self.worker_url = worker_url
+        self.cursor_path = cursor_path
+        self.token = token if token is not None else os.getenv("CLOUDFLARE_WORKER_TOKEN", "")
+        self.address = address
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_pages = max_pages
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                headers={
+                    "Authorization": f"Bearer {self.token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=aiohttp.ClientTimeout(total=EMAIL_SYNC_TIMEOUT_SECONDS),
+                connector=aiohttp.TCPConnector(limit=self.concurrency)
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def sync(self) -> List[Dict[str, Any]]:
+        """Fetch the emails newer than the cursor and advance it
+
+        The cursor is saved only after every page arrived, so a failed sync
+        is repeated in full next time rather than leaving a gap.
+        """
+        cursor = SyncCursor(self.cursor_path)
+        end = datetime.now(timezone.utc)
+        start = cursor.since or end - timedelta(days=EMAIL_SYNC_LOOKBACK_DAYS)
+        # One window for every page, so mail arriving mid-sync can't shift them
+        window = {"start": start.isoformat(), "end": end.isoformat()}
+
+        emails, total = await self._fetch_page(window, 1)
+        if total is not None:
+            last_page = math.ceil(total / self.page_size)
+            if last_page > self.max_pages:
+                raise EmailSyncError(f"Worker reports {total} emails, over {self.max_pages} pages")
+            emails.extend(await self._fetch_pages(window, range(2, last_page + 1)))
+        else:
+            # No total reported: fetch waves of pages until one comes back
+            # short, or adds nothing new (a worker that ignores paging returns
+            # the same emails for every page)
+            fetched = {_email_id(email_data) for email_data in emails}
+            page, full = 2, len(emails) >= self.page_size
+            while full:
+                if page > self.max_pages:
+                    raise EmailSyncError(f"Sync did not finish within {self.max_pages} pages")
+                pages = range(page, min(page + self.concurrency, self.max_pages + 1))
+                results = await asyncio.gather(*(self._fetch_page(window, p) for p in pages))
+                added = 0
+                for batch, _ in results:
+                    for email_data in batch:
+                        email_id = _email_id(email_data)
+                        if email_id not in fetched:
+                            fetched.add(email_id)
+                            emails.append(email_data)
+                            added += 1
+                if not added:
+                    logger.warning(f"Pages {pages.start}-{pages.stop - 1} added no new emails; "
+                                   f"the worker appears to ignore paging")
+                    break
+                full = all(len(batch) >= self.page_size for batch, _ in results)
+                page = pages.stop
+
+        seen = set(cursor.boundary_ids)
+        new_emails = []
+        for email_data in emails:
+            email_id = _email_id(email_data)
+            if email_id not in seen:
+                seen.add(email_id)
+                new_emails.append(email_data)
+
+        cursor.advance(new_emails)
+        cursor.save()
+        logger.info(f"Synced {len(new_emails)} new emails since {window['start']}")
+        return new_emails
+
+    async def _fetch_pages(self, window: Dict[str, str], pages: range) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(page: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return (await self._fetch_page(window, page))[0]
+
+        emails = []
+        for batch in await asyncio.gather(*(fetch(page) for page in pages)):
+            emails.extend(batch)
+        return emails
+
+    async def _fetch_page(self, window: Dict[str, str], page: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of emails, and the total the worker reports (if any)"""
+        payload = {
+            "action": "fetch_emails",
+            "email": self.address,
+            "date_range": window,
+            "page": page,
+            "page_size": self.page_size
+        }
+        session = self._get_session()
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with session.post(self.worker_url, json=payload) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return data.get("emails", []), data.get("total")
+                    if response.status not in RETRY_STATUSES:
+                        raise EmailSyncError(f"Worker returned {response.status} for page {page}")
+                    error = f"status {response.status}"
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+
+            if attempt == self.max_retries:
+                break
+            # Exponential backoff with full jitter, unless the worker says how long
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            logger.warning(f"Page {page} failed ({error}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        raise EmailSyncError(f"Page {page} failed after {self.max_retries + 1} attempts: {error}")
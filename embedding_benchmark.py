@@ -0,0 +1,177 @@
+"""
+Embedding backend benchmark
+Embeds the same document chunks with the PyTorch and ONNX backends and
+reports throughput, how closely the vectors agree, and known-item retrieval
+recall: each query is a passage cut from one chunk, which should rank in the
+top k.
+
+    python embedding_benchmark.py [DOCUMENTS_DIR] --limit 2000 --queries 200
+"""
+
+import re
+import time
+import random
+import argparse
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from rich.console import Console
+from rich.table import Table
+
+from config import BASE_DIR, EMBEDDING_MAX_BATCH, EMBEDDING_WORKERS
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+_WORD = re.compile(r"\S+")
+
+
+def known_item_queries(chunks: Sequence[str], count: int, words: int = 24,
+                       seed: int = 0) -> List[Tuple[str, int]]:
+    """(query, chunk index) pairs, each query a run of words from the middle of its chunk"""
+    candidates = [i for i, chunk in enumerate(chunks) if len(_WORD.findall(chunk)) >= words * 2]
+    picked = random.Random(seed).sample(candidates, min(count, len(candidates)))
+    queries = []
+    for index in picked:
+        tokens = _WORD.findall(chunks[index])
+        start = (len(tokens) - words) // 2
+        queries.append((" ".join(tokens[start:start + words]), index))
+    return queries
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def top_k(doc_vectors, query_vectors, k: int) -> np.ndarray:
+    """Indices of each query's k nearest documents by cosine similarity"""
+    scores = _normalize(query_vectors) @ _normalize(doc_vectors).T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def recall_at_k(ranked: np.ndarray, expected: Sequence[int]) -> float:
+    """Share of queries whose expected document is among their results"""
+    if not len(expected):
+        return 0.0
+    return float(np.mean([target in row for row, target in zip(ranked, expected)]))
+
+
+def overlap_at_k(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean share of results two rankings have in common"""
+    return float(np.mean([len(set(x) & set(y)) / len(x) for x, y in zip(a, b)]))
+
+
+def benchmark(chunks: Sequence[str], backends: Dict[str, Embeddings],
+              queries: Sequence[Tuple[str, int]], k: int = 10) -> List[Dict]:
+    """Time and score each backend; the first one is the reference
+
+    Besides each backend's own recall, reports its recall when its queries
+    are run against the reference's document vectors, i.e. against an index
+    built by the reference backend.
+    """
+    texts = [query for query, _ in queries]
+    expected = [index for _, index in queries]
+    results = []
+    reference = None
+    for name, embeddings in backends.items():
+        started = time.perf_counter()
+        doc_vectors = embeddings.embed_documents(list(chunks))
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        query_vectors = [embeddings.embed_query(text) for text in texts]
+        ranked = top_k(doc_vectors, query_vectors, k)
+
+        result = {
+            "backend": name,
+            "seconds": elapsed,
+            "chunks_per_s": len(chunks) / elapsed,
+            "recall": recall_at_k(ranked, expected)
+        }
+        if reference is None:
+            reference = (_normalize(doc_vectors), ranked)
+        else:
+            result["speedup"] = results[0]["seconds"] / elapsed
+            result["cosine_to_reference"] = float(np.mean(np.sum(_normalize(doc_vectors) * reference[0], axis=1)))
+            result["overlap_with_reference"] = overlap_at_k(ranked, reference[1])
+            result["recall_on_reference_index"] = recall_at_k(top_k(reference[0], query_vectors, k), expected)
+        results.append(result)
+    return results
+
+
+def load_chunks(base_path: Path, limit: int) -> List[str]:
+    """Document chunks as ClaudeAnalyzer would index them"""
+    from document_processor import DocumentProcessor
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    processor = DocumentProcessor()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
+    chunks: List[str] = []
+    for document in processor.scan_documents(base_path):
+        if document.get("duplicate_of"):
+            continue
+        chunks.extend(splitter.split_text(processor.load_content(document)))
+        if len(chunks) >= limit:
+            break
+    return chunks[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument("path", nargs="?", type=Path, default=BASE_DIR)
+    parser.add_argument("--limit", type=int, default=2000, help="chunks to embed")
+    parser.add_argument("--queries", type=int, default=200, help="known-item queries")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=EMBEDDING_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from embedding_workers import BulkEmbedder
+    from onnx_embeddings import OnnxEmbeddings
+
+    chunks = load_chunks(args.path, args.limit)
+    queries = known_item_queries(chunks, args.queries)
+    # Both run through BulkEmbedder, as indexing does, with their models and
+    # worker pools loaded before timing starts
+    factories = {
+        "huggingface": partial(HuggingFaceEmbeddings, model_name=MODEL_NAME,
+                               model_kwargs={'device': 'cpu'},
+                               encode_kwargs={'batch_size': EMBEDDING_MAX_BATCH}),
+        "onnx": partial(OnnxEmbeddings, model_name=MODEL_NAME)
+    }
+    backends = {
+        name: BulkEmbedder(factory, MODEL_NAME, local=factory(), workers=args.workers)
+        for name, factory in factories.items()
+    }
+    try:
+        for embedder in backends.values():
+            embedder.embed_documents(chunks[:embedder.pool_min_texts])
+        results = benchmark(chunks, backends, queries, args.k)
+    finally:
+        for embedder in backends.values():
+            embedder.close()
+
+    table = Table(title=f"{len(chunks)} chunks, {len(queries)} queries, recall@{args.k}")
+    for column in ("backend", "chunks/s", "speedup", "recall", "cosine to torch",
+                   f"top-{args.k} overlap", "recall on torch index"):
+        table.add_column(column)
+    for result in results:
+        table.add_row(
+            result["backend"],
+            f"{result['chunks_per_s']:.1f}",
+            f"{result.get('speedup', 1.0):.2f}x",
+            f"{result['recall']:.3f}",
+            f"{result.get('cosine_to_reference', 1.0):.4f}",
+            f"{result.get('overlap_with_reference', 1.0):.3f}",
+            f"{result.get('recall_on_reference_index', result['recall']):.3f}"
+        )
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
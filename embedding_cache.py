@@ -0,0 +1,218 @@
+"""
+Persistent embedding cache
+Vectors are stored as float16 (or int8 with a per-row scale) in a
+memory-mapped array file, located through a SQLite hash-to-row index; only
+texts never seen before reach the model, in large deduplicated batches
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import EMBEDDING_CACHE_DTYPE, EMBEDDING_ENCODE_BATCH
+
+logger = logging.getLogger(__name__)
+
+_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+class EmbeddingStore:
+    """Append-only array of vectors with a hash-to-row index
+
+    Rows are allocated inside a SQLite write transaction, so several
+    processes can share one store; a row becomes visible only once its
+    vector is on disk.
+    """
+
+    def __init__(self, store_dir: Path, dtype: str = EMBEDDING_CACHE_DTYPE):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.store_dir = store_dir
+        self.dtype = np.dtype(_DTYPES[dtype])
+        self.vectors_path = store_dir / f"vectors.{dtype}"
+        self.scales_path = store_dir / "scales.f32"
+        self.dim: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._map: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited through fork must not be reused
+        if self._conn is None or self._pid != os.getpid():
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.store_dir / "index.sqlite3"), timeout=30,
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS rows (key BLOB PRIMARY KEY, row INTEGER NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            self.dim = row[0] if row else None
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'dtype'").fetchone()
+            if row and row[0] != self.dtype.name:
+                raise ValueError(f"Embedding cache {self.store_dir} holds {row[0]} vectors, not {self.dtype.name}")
+            self._pid = os.getpid()
+            self._map = None
+        return self._conn
+
+    def _rows(self, count: int) -> np.ndarray:
+        """Memory map covering at least count rows, re-mapped as the file grows"""
+        if self._map is None or len(self._map) < count:
+            self._map = np.memmap(self.vectors_path, dtype=self.dtype, mode="r").reshape(-1, self.dim)
+        return self._map
+
+    def get(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Vectors (as float32) for the keys that are stored"""
+        if not keys:
+            return {}
+        with self._lock:
+            conn = self._connect()
+            found = {}
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 900):
+                batch = keys[start:start + 900]
+                found.update(conn.execute(
+                    f"SELECT key, row FROM rows WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall())
+            if not found:
+                return {}
+
+            rows = np.fromiter(found.values(), dtype=np.int64, count=len(found))
+            scales = None
+            if self.dtype == np.int8:
+                scales = np.memmap(self.scales_path, dtype=np.float32, mode="r")[rows]
+            vectors = self._decode(self._rows(int(rows.max()) + 1)[rows], scales)
+        return dict(zip(found.keys(), vectors))
+
+    def put(self, keys: Sequence[bytes], vectors: np.ndarray) -> np.ndarray:
+        """Append vectors for keys not already stored
+
+        Returns the vectors as they read back from the store, so callers see
+        the same values on a hit as on the miss that filled it.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+                    self.dim = row[0] if row else vectors.shape[1]
+                    conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+                    conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dtype', ?)", (self.dtype.name,))
+                if vectors.shape[1] != self.dim:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache ({self.dim})")
+
+                # Another process may have stored some of them meanwhile
+                stored = set()
+                for start in range(0, len(keys), 900):
+                    batch = keys[start:start + 900]
+                    stored.update(key for key, in conn.execute(
+                        f"SELECT key FROM rows WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ))
+                fresh = [i for i, key in enumerate(keys) if key not in stored]
+                encoded, scales = self._encode(vectors)
+                if fresh:
+                    next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+                    if scales is not None:
+                        self._write_at(self.scales_path, next_row * 4, scales[fresh].tobytes())
+                    self._write_at(self.vectors_path, next_row * self.dim * self.dtype.itemsize,
+                                   encoded[fresh].tobytes())
+                    conn.executemany("INSERT INTO rows (key, row) VALUES (?, ?)",
+                                     [(keys[i], next_row + n) for n, i in enumerate(fresh)])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self._decode(encoded, scales)
+
+    def _encode(self, vectors: np.ndarray):
+        if self.dtype != np.int8:
+            return vectors.astype(self.dtype), None
+        # Symmetric quantisation with one float32 scale per row
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    @staticmethod
+    def _decode(encoded: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        vectors = encoded.astype(np.float32)
+        if scales is not None:
+            vectors *= scales[:, None]
+        return vectors
+
+    @staticmethod
+    def _write_at(path: Path, offset: int, data: bytes):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, data, offset)
+        finally:
+            os.close(fd)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that encodes each distinct text once, ever
+
+    Texts are keyed by a hash of their content (documents and queries
+    separately, since some models embed them differently) in a store per
+    model and storage precision.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache_dir: Path,
+                 dtype: str = EMBEDDING_CACHE_DTYPE,
+                 encode_batch: int = EMBEDDING_ENCODE_BATCH):
+        self.embeddings = embeddings
+        self.model_name = str(getattr(embeddings, "model_name", type(embeddings).__name__))
+        store_name = re.sub(r"[^\w.-]+", "_", self.model_name)
+        # One store per precision: rows and files of one can't be read as another
+        self.store = EmbeddingStore(cache_dir / store_name / dtype, dtype)
+        self.encode_batch = encode_batch
+
+    @staticmethod
+    def _key(kind: bytes, text: str) -> bytes:
+        return hashlib.blake2b(kind + b"\0" + text.encode("utf-8"), digest_size=16).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(b"doc", text) for text in texts]
+        vectors = self.store.get(list(dict.fromkeys(keys)))
+
+        # Each distinct missing text is encoded once, however often it repeats
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            logger.info(f"Encoding {len(missing)} of {len(texts)} texts ({len(texts) - len(missing)} cached or repeated)")
+            missing_keys = list(missing)
+            for start in range(0, len(missing_keys), self.encode_batch):
+                batch = missing_keys[start:start + self.encode_batch]
+                encoded = self.embeddings.embed_documents([missing[k] for k in batch])
+                vectors.update(zip(batch, self.store.put(batch, encoded)))
+
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(b"query", text)
+        cached = self.store.get([key])
+        if key in cached:
+            return cached[key].tolist()
+        vector = self.store.put([key], [self.embeddings.embed_query(text)])[0]
+        return vector.tolist()
+
+    def close(self):
+        """Release the wrapped model's resources, e.g. worker processes"""
+        close = getattr(self.embeddings, "close", None)
+        if callable(close):
+            close()
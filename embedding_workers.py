@@ -0,0 +1,163 @@
+"""
+Bulk embedding on all cores
+Texts are sorted by estimated token length so each batch pads little, packed
+into batches sized to the memory currently available, and encoded by a pool
+of worker processes that each hold a copy of the model. Used for indexing and
+any other bulk vector backfill; queries and small inputs stay in-process.
+"""
+
+import os
+import re
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+import logging
+
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    EMBEDDING_WORKERS, EMBEDDING_MAX_BATCH, EMBEDDING_MAX_TOKENS,
+    EMBEDDING_MEMORY_FRACTION, EMBEDDING_BYTES_PER_TOKEN, EMBEDDING_POOL_MIN_TEXTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Word pieces and punctuation, as BERT-style tokenizers pre-split text
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Model loaded by each worker process; see _init_worker
+_worker_embeddings: Optional[Embeddings] = None
+
+
+def estimate_tokens(text: str, max_tokens: int = EMBEDDING_MAX_TOKENS) -> int:
+    """Approximate token count, capped at the model's truncation length"""
+    return min(len(_TOKEN.findall(text)) + 2, max_tokens)
+
+
+def available_memory() -> int:
+    """Bytes of memory available to new allocations"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def plan_batches(lengths: Sequence[int], token_budget: int,
+                 max_batch: int = EMBEDDING_MAX_BATCH) -> List[List[int]]:
+    """Group text indices, shortest first, into batches within token_budget
+
+    A batch costs its size times its longest member (everything is padded to
+    it), so sorting first keeps that close to the tokens actually used.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for index in order:
+        # Sorted ascending, so this text is the batch's longest
+        if batch and (len(batch) >= max_batch or (len(batch) + 1) * lengths[index] > token_budget):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _init_worker(factory: Callable[[], Embeddings], threads: int):
+    global _worker_embeddings
+    # Split the cores between workers instead of every worker using all of them
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _worker_embeddings = factory()
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+class BulkEmbedder(Embeddings):
+    """Embeddings that encode large inputs on a pool of worker processes
+
+    factory builds the underlying model and must be picklable (a class or a
+    functools.partial of one); each worker calls it once. local, if given,
+    is an already loaded model for in-process use. The pool starts on the
+    first large request and lives until close().
+    """
+
+    def __init__(self, factory: Callable[[], Embeddings], model_name: str,
+                 local: Optional[Embeddings] = None,
+                 workers: int = EMBEDDING_WORKERS,
+                 max_batch: int = EMBEDDING_MAX_BATCH,
+                 pool_min_texts: int = EMBEDDING_POOL_MIN_TEXTS):
+        self.factory = factory
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.max_batch = max_batch
+        self.pool_min_texts = pool_min_texts
+        self.last_throughput: Optional[float] = None
+        self._local = local
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def local(self) -> Embeddings:
+        """In-process model for queries and small inputs, loaded on first use"""
+        if self._local is None:
+            self._local = self.factory()
+        return self._local
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # Model libraries' thread pools don't survive fork
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.factory, threads)
+            )
+        return self._pool
+
+    def token_budget(self) -> int:
+        """Padded tokens one worker may encode at once, given free memory"""
+        share = available_memory() * EMBEDDING_MEMORY_FRACTION / self.workers
+        return max(EMBEDDING_MAX_TOKENS, int(share / EMBEDDING_BYTES_PER_TOKEN))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.monotonic()
+        lengths = [estimate_tokens(text) for text in texts]
+        batches = plan_batches(lengths, self.token_budget(), self.max_batch)
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        if self.workers > 1 and len(texts) >= self.pool_min_texts:
+            pool = self._get_pool()
+            futures = [(batch, pool.submit(_embed_batch, [texts[i] for i in batch])) for batch in batches]
+            for batch, future in futures:
+                for index, vector in zip(batch, future.result()):
+                    vectors[index] = vector
+        else:
+            for batch in batches:
+                for index, vector in zip(batch, self.local.embed_documents([texts[i] for i in batch])):
+                    vectors[index] = vector
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.last_throughput = len(texts) / elapsed
+        logger.info(f"Embedded {len(texts)} chunks in {len(batches)} batches: "
+                    f"{self.last_throughput:.1f} chunks/s")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.local.embed_query(text)
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -15,8 +15,13 @@ from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives.serialization import Encoding, PrivateFormat, NoEncryption
 import base64
 
+from file_hashing import get_hash_registry, hash_file
+
 logger = logging.getLogger(__name__)
 
+# Digests recorded for every authenticated file
+AUTHENTICATION_ALGORITHMS = ("md5", "sha1", "sha256", "sha512")
+
 
 class DigitalEvidenceAuthenticator:
     """Handles digital evidence authentication and chain of custody"""
@@ -26,6 +31,9 @@ class DigitalEvidenceAuthenticator:
         self.evidence_dir.mkdir(exist_ok=True)
         self.chain_of_custody_file = self.evidence_dir / "chain_of_custody.json"
         self.private_key = self._load_or_generate_signing_key()
+        # Files scanned from now on get these digests in the same read as
+        # their cache key, so authenticating them does not read them again
+        get_hash_registry().add_prefetch(AUTHENTICATION_ALGORITHMS)
 
     def _load_or_generate_signing_key(self) -> rsa.RSAPrivateKey:
         """Load or generate RSA key for digital signing"""
@@ -105,28 +113,15 @@ class DigitalEvidenceAuthenticator:
 
         return auth_record
 
-    def _calculate_file_hashes(self, file_path: Path) -> Dict[str, str]:
-        """Calculate multiple hash algorithms for file integrity"""
-        hashes_dict = {}
-
-        # Hash algorithms for different purposes
-        algorithms = {
-            "md5": hashlib.md5(),
-            "sha1": hashlib.sha1(),
-            "sha256": hashlib.sha256(),
-            "sha512": hashlib.sha512()
-        }
-
-        with open(file_path, 'rb') as f:
-            # Read file in chunks to handle large files
-            while chunk := f.read(8192):
-                for algo in algorithms.values():
-                    algo.update(chunk)
-
-        for name, algo in algorithms.items():
-            hashes_dict[name] = algo.hexdigest()
+    def _calculate_file_hashes(self, file_path: Path, use_registry: bool = True) -> Dict[str, str]:
+        """Calculate multiple hash algorithms for file integrity
 
-        return hashes_dict
+        Digests already computed this run (e.g. during scanning) are reused;
+        pass use_registry=False to force a fresh read of the file.
+        """
+        if use_registry:
+            return get_hash_registry().get(file_path, AUTHENTICATION_ALGORITHMS)
+        return hash_file(file_path, AUTHENTICATION_ALGORITHMS)
 
     def _extract_file_metadata(self, file_path: Path) -> Dict[str, Any]:
         """Extract technical metadata for authentication"""
@@ -319,7 +314,8 @@ class DigitalEvidenceAuthenticator:
 
     def verify_file_integrity(self, file_path: Path, original_record: Dict[str, Any]) -> Dict[str, Any]:
         """Verify file has not been altered since authentication"""
-        current_hashes = self._calculate_file_hashes(file_path)
+        # Always reread the file; metadata can be preserved across tampering
+        current_hashes = self._calculate_file_hashes(file_path, use_registry=False)
         original_hashes = original_record["hashes"]
 
         integrity_check = {
@@ -0,0 +1,291 @@
+"""
+Supervised extraction workers with per-task wall-clock and memory budgets
+A worker that exceeds its budget is killed and replaced; the rest of the batch
+keeps running at full throughput
+"""
+
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How often busy workers are checked against their budgets
+POLL_INTERVAL = 0.25
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+class TaskOutcome(NamedTuple):
+    index: int
+    result: Any
+    error: Optional[str]
+    quarantined: bool
+
+
+def _worker_main(conn, task: Callable, initializer: Optional[Callable]):
+    if initializer:
+        initializer()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        index, func, item = message
+        try:
+            conn.send((index, (func or task)(item), None))
+        except Exception as e:
+            conn.send((index, None, str(e)))
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _resolve(future: Future, outcome: Optional[TaskOutcome] = None,
+             error: Optional[BaseException] = None):
+    # The submitter may have cancelled the future meanwhile
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(outcome)
+    except InvalidStateError:
+        pass
+
+
+class _Worker:
+    def __init__(self, context, task: Callable, initializer: Optional[Callable]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, task, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.index: Optional[int] = None
+        self.started = 0.0
+
+    def assign(self, index: int, item: Any, task: Optional[Callable] = None):
+        self.index = index
+        self.started = time.monotonic()
+        self.conn.send((index, task, item))
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ExtractionSupervisor:
+    """Runs a picklable task over items in isolated worker processes
+
+    Each task gets a wall-clock budget (timeout, seconds) and a resident
+    memory budget (memory_limit_mb). Tasks that blow their budget or crash
+    their worker are reported as quarantined; ordinary exceptions raised by
+    the task are reported as errors.
+
+    run() processes a known batch. For items that arrive one at a time, start()
+    the supervisor, submit() each item and close() it when done; the workers
+    are shared by every submission.
+    """
+
+    def __init__(self, task: Callable, workers: int, timeout: float,
+                 memory_limit_mb: Optional[int] = None,
+                 initializer: Optional[Callable] = None):
+        self.task = task
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.initializer = initializer
+        self._context = multiprocessing.get_context()
+        # Service mode; see start()
+        self._submissions: "queue.Queue" = queue.Queue()
+        self._wakeup_reader = self._wakeup_writer = None
+        self._wakeup_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.task, self.initializer)
+
+    def _over_budget(self, worker: _Worker, now: float) -> Optional[str]:
+        if self.timeout and now - worker.started > self.timeout:
+            return f"exceeded {self.timeout:g}s time budget"
+        if self.memory_limit:
+            rss = _rss_bytes(worker.process.pid)
+            if rss is not None and rss > self.memory_limit:
+                return f"exceeded {self.memory_limit // (1024 * 1024)} MB memory budget"
+        return None
+
+    def _poll(self, busy: Dict[Any, _Worker], idle: List[_Worker],
+              extra: Sequence[Any] = ()) -> Iterator[TaskOutcome]:
+        """Collect finished tasks and kill workers over budget
+
+        Waits up to POLL_INTERVAL for a busy worker or one of extra to be ready.
+        """
+        def replace(worker: _Worker):
+            del busy[worker.conn]
+            worker.kill()
+            idle.append(self._spawn())
+
+        for conn in wait([*busy, *extra], timeout=POLL_INTERVAL):
+            worker = busy.get(conn)
+            if worker is None:
+                continue
+            try:
+                index, result, error = conn.recv()
+            except (EOFError, OSError):
+                index = worker.index
+                worker.process.join()
+                reason = f"worker exited with code {worker.process.exitcode}"
+                replace(worker)
+                yield TaskOutcome(index, None, reason, True)
+                continue
+
+            del busy[conn]
+            idle.append(worker)
+            yield TaskOutcome(index, result, error, False)
+
+        now = time.monotonic()
+        for worker in list(busy.values()):
+            reason = self._over_budget(worker, now)
+            if reason:
+                index = worker.index
+                logger.warning(f"Killing extraction worker {worker.process.pid}: {reason}")
+                replace(worker)
+                yield TaskOutcome(index, None, reason, True)
+
+    @staticmethod
+    def _shutdown(busy: Dict[Any, _Worker], idle: List[_Worker]):
+        for worker in list(busy.values()):
+            worker.kill()
+        for worker in idle:
+            worker.stop()
+
+    def run(self, items: Sequence[Any]) -> Iterator[TaskOutcome]:
+        """Yield an outcome per item as tasks finish (not in input order)"""
+        pending = deque(enumerate(items))
+        idle: List[_Worker] = [self._spawn() for _ in range(min(self.workers, len(items)))]
+        busy: Dict[Any, _Worker] = {}
+
+        def dispatch():
+            while idle and pending:
+                worker = idle.pop()
+                worker.assign(*pending.popleft())
+                busy[worker.conn] = worker
+
+        try:
+            dispatch()
+            while busy:
+                yield from self._poll(busy, idle)
+                dispatch()
+        finally:
+            self._shutdown(busy, idle)
+
+    def start(self):
+        """Serve submit() calls from a background thread until close()"""
+        if self._thread:
+            return
+        self._wakeup_reader, self._wakeup_writer = self._context.Pipe(duplex=False)
+        self._thread = threading.Thread(target=self._serve, name="extraction-supervisor", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any, task: Optional[Callable] = None) -> "Future[TaskOutcome]":
+        """Queue one item, run by task instead of the supervisor's own task if given
+
+        The future resolves to the item's TaskOutcome (index is meaningless here).
+        """
+        if not self._thread:
+            raise RuntimeError("ExtractionSupervisor.start() has not been called")
+        future: Future = Future()
+        self._submissions.put((future, task, item))
+        self._wake()
+        return future
+
+    def close(self):
+        """Stop the service thread; work still queued or running is cancelled"""
+        if not self._thread:
+            return
+        self._submissions.put(None)
+        self._wake()
+        self._thread.join()
+        self._thread = None
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
+    def _wake(self):
+        with self._wakeup_lock:
+            self._wakeup_writer.send_bytes(b"")
+
+    def _serve(self):
+        pending: deque = deque()
+        futures: Dict[int, Future] = {}
+        idle: List[_Worker] = []
+        busy: Dict[Any, _Worker] = {}
+        counter = 0
+        closing = False
+
+        try:
+            while not closing:
+                while self._wakeup_reader.poll():
+                    self._wakeup_reader.recv_bytes()
+                while True:
+                    try:
+                        submission = self._submissions.get_nowait()
+                    except queue.Empty:
+                        break
+                    if submission is None:
+                        closing = True
+                        break
+                    future, task, item = submission
+                    if not future.cancelled():
+                        futures[counter] = future
+                        pending.append((counter, item, task))
+                        counter += 1
+                if closing:
+                    break
+
+                # Workers are started as work arrives, up to the configured number
+                while pending and not idle and len(busy) < self.workers:
+                    idle.append(self._spawn())
+                while idle and pending:
+                    worker = idle.pop()
+                    worker.assign(*pending.popleft())
+                    busy[worker.conn] = worker
+
+                for outcome in self._poll(busy, idle, extra=[self._wakeup_reader]):
+                    _resolve(futures.pop(outcome.index), outcome)
+        except Exception as e:
+            logger.error(f"Extraction supervisor failed: {e}")
+            for future in futures.values():
+                _resolve(future, error=e)
+            futures.clear()
+        finally:
+            self._shutdown(busy, idle)
+            for future in futures.values():
+                future.cancel()
@@ -0,0 +1,109 @@
+"""
+Shared streaming file hashing service
+Computes every requested digest in one constant-memory pass and keeps a per-run
+registry so no digest of a file is computed twice
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+
+from config import HASH_PREFETCH_ALGORITHMS
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = 1024 * 1024
+
+_buffers = threading.local()
+
+
+def _get_buffer() -> bytearray:
+    """Reusable per-thread read buffer"""
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = _buffers.buf = bytearray(BUFFER_SIZE)
+    return buf
+
+
+def hash_file(file_path: Path, algorithms: Iterable[str] = ("md5", "sha256")) -> Dict[str, str]:
+    """Stream a file once, feeding each chunk to every requested hash algorithm"""
+    hashers = {name: hashlib.new(name) for name in algorithms}
+    buf = _get_buffer()
+    view = memoryview(buf)
+
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            for hasher in hashers.values():
+                hasher.update(chunk)
+
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+class HashRegistry:
+    """Per-run memo of file digests keyed by (st_dev, st_ino, st_size, st_mtime_ns)
+
+    A file whose metadata changes gets a new key, so stale digests are never
+    served. A miss computes only the digests not yet recorded, plus any
+    prefetch algorithms (for runs that will need them for every file anyway,
+    such as authenticating everything scanned; see add_prefetch). The registry
+    is bounded and evicts least recently used entries.
+    """
+
+    def __init__(self, prefetch: Iterable[str] = (), max_entries: int = 100_000):
+        self.prefetch = tuple(prefetch)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, int, int, int], Dict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: Path, algorithms: Iterable[str] = ("md5",),
+            stat: Optional[os.stat_result] = None) -> Dict[str, str]:
+        """Return the requested digests, reading the file only on a registry miss"""
+        algorithms = tuple(algorithms)
+        stat = stat or os.stat(file_path)
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            digests = dict(self._entries.get(key) or {})
+            if all(name in digests for name in algorithms):
+                self._entries.move_to_end(key)
+                return {name: digests[name] for name in algorithms}
+
+            prefetch = self.prefetch
+
+        wanted = tuple(name for name in dict.fromkeys(algorithms + prefetch) if name not in digests)
+        computed = hash_file(file_path, wanted)
+
+        with self._lock:
+            digests = self._entries.setdefault(key, {})
+            digests.update(computed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return {name: digests[name] for name in algorithms}
+
+    def add_prefetch(self, algorithms: Iterable[str]):
+        """Compute these digests too on every later first read of a file"""
+        with self._lock:
+            self.prefetch = tuple(dict.fromkeys(self.prefetch + tuple(algorithms)))
+
+    def clear(self):
+        """Forget all recorded digests"""
+        with self._lock:
+            self._entries.clear()
+
+
+_registry = HashRegistry(HASH_PREFETCH_ALGORITHMS)
+
+
+def get_hash_registry() -> HashRegistry:
+    """Process-wide registry shared by the scanner, cache and authenticator"""
+    return _registry
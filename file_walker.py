@@ -0,0 +1,98 @@
+"""
+Single-pass directory walker shared by DocumentProcessor and RecursiveScanner
+Prunes hidden and excluded directories before descending and filters files by suffix
+"""
+
+import os
+from pathlib import Path
+from typing import Collection, Dict, Iterator, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VisitedDirs:
+    """Directories entered during one walk, keyed by (st_dev, st_ino)
+
+    Identity rather than path catches a directory reached again through a
+    symlink or bind mount. Inode numbers are grouped per device, which keeps
+    the per-directory cost to one int in a set.
+    """
+
+    def __init__(self):
+        self._inodes: Dict[int, Set[int]] = {}
+
+    def add(self, st: os.stat_result) -> bool:
+        """Record a directory; False if it was already visited"""
+        inodes = self._inodes.setdefault(st.st_dev, set())
+        if st.st_ino in inodes:
+            return False
+        inodes.add(st.st_ino)
+        return True
+
+    def __contains__(self, st: os.stat_result) -> bool:
+        return st.st_ino in self._inodes.get(st.st_dev, ())
+
+    def __len__(self) -> int:
+        return sum(len(inodes) for inodes in self._inodes.values())
+
+
+def walk_files(base_path: Path,
+               suffixes: Optional[Collection[str]] = None,
+               max_depth: Optional[int] = None,
+               follow_symlinks: bool = False,
+               skip_dirs: Collection[str] = (),
+               seen_dirs: Optional[VisitedDirs] = None) -> Iterator[Path]:
+    """Walk base_path once, yielding files whose lowercase suffix is in suffixes
+
+    Entries are visited in sorted order so repeated scans of an unchanged tree
+    produce the same sequence. Hidden files and directories (leading '.') and
+    directories named in skip_dirs are never entered. Directories already in
+    seen_dirs are skipped and newly entered ones are added to it; when
+    following symlinks a fresh VisitedDirs is used if none is given, so link
+    cycles end the descent instead of looping until max_depth.
+    """
+    suffixes = {s.lower() for s in suffixes} if suffixes is not None else None
+    if seen_dirs is None and follow_symlinks:
+        seen_dirs = VisitedDirs()
+    stack = [(Path(base_path), 0)]
+
+    while stack:
+        path, depth = stack.pop()
+
+        if seen_dirs is not None:
+            try:
+                if not seen_dirs.add(path.stat()):
+                    continue
+            except OSError as e:
+                logger.error(f"Error scanning {path}: {e}")
+                continue
+
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except PermissionError:
+            logger.warning(f"Permission denied: {path}")
+            continue
+        except OSError as e:
+            logger.error(f"Error scanning {path}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if entry.name not in skip_dirs and (max_depth is None or depth < max_depth):
+                        subdirs.append(Path(entry.path))
+                elif entry.is_file():
+                    if suffixes is None or os.path.splitext(entry.name)[1].lower() in suffixes:
+                        yield Path(entry.path)
+            except OSError as e:
+                logger.warning(f"Cannot access {entry.path}: {e}")
+
+        # Push in reverse so subdirectories are visited in sorted order
+        for subdir in reversed(subdirs):
+            stack.append((subdir, depth + 1))
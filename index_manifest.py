@@ -0,0 +1,104 @@
+"""
+Persistent manifest of what the vector store holds for each document
+Records the content hash and index configuration each file was embedded with,
+so re-indexing skips unchanged documents and removes only stale chunks
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+_CREATE = """
+    CREATE TABLE IF NOT EXISTS indexed (
+        file_path TEXT PRIMARY KEY,
+        file_hash TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        chunk_count INTEGER NOT NULL
+    )
+"""
+
+
+def chunk_ids(file_hash: str, fingerprint: str, chunk_count: int) -> List[str]:
+    """Deterministic vector store IDs for a document's chunks"""
+    return [
+        hashlib.sha1(f"{file_hash}:{fingerprint}:{index}".encode()).hexdigest()
+        for index in range(chunk_count)
+    ]
+
+
+class IndexedDocument(NamedTuple):
+    file_hash: str
+    fingerprint: str
+    chunk_count: int
+
+    @property
+    def ids(self) -> List[str]:
+        return chunk_ids(self.file_hash, self.fingerprint, self.chunk_count)
+
+
+class IndexManifest:
+    """Maps each indexed file path to the hash, configuration and chunk count
+    its chunks were built from
+
+    Identical files at different paths share chunk IDs; their chunks are
+    deleted only once no path refers to them.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute(_CREATE)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_all(self) -> Dict[str, IndexedDocument]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path, file_hash, fingerprint, chunk_count FROM indexed"
+            ).fetchall()
+        return {row[0]: IndexedDocument(*row[1:]) for row in rows}
+
+    def get(self, file_path: str) -> Optional[IndexedDocument]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hash, fingerprint, chunk_count FROM indexed WHERE file_path = ?",
+                (file_path,)
+            ).fetchone()
+        return IndexedDocument(*row) if row else None
+
+    def record(self, entries: Dict[str, IndexedDocument]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO indexed (file_path, file_hash, fingerprint, chunk_count) "
+                "VALUES (?, ?, ?, ?)",
+                [(path, *entry) for path, entry in entries.items()]
+            )
+            self._conn.commit()
+
+    def forget(self, file_paths: Iterable[str]) -> List[str]:
+        """Drop the given paths; returns chunk IDs no remaining path refers to"""
+        file_paths = list(file_paths)
+        with self._lock:
+            released = {}
+            for path in file_paths:
+                row = self._conn.execute(
+                    "SELECT file_hash, fingerprint, chunk_count FROM indexed WHERE file_path = ?",
+                    (path,)
+                ).fetchone()
+                if row:
+                    released[(row[0], row[1])] = IndexedDocument(*row)
+            self._conn.executemany("DELETE FROM indexed WHERE file_path = ?", [(p,) for p in file_paths])
+
+            stale = []
+            for (file_hash, fingerprint), entry in released.items():
+                shared = self._conn.execute(
+                    "SELECT 1 FROM indexed WHERE file_hash = ? AND fingerprint = ? LIMIT 1",
+                    (file_hash, fingerprint)
+                ).fetchone()
+                if not shared:
+                    stale.extend(entry.ids)
+            self._conn.commit()
+        return stale
@@ -360,8 +360,8 @@ class IntakeAnalyzer:
         """Use AI to extract more complex facts and relationships"""
         enhanced_facts = []
         
-        # Sample documents for AI analysis
-        sample_docs = documents[:5]  # Limit for performance
+        # Sample documents for AI analysis; near-duplicate copies add nothing new
+        sample_docs = [doc for doc in documents if not doc.get('duplicate_of')][:5]  # Limit for performance
         
         prompt = """Analyze these documents and extract additional facts including:
         - Complex financial relationships (e.g., "X paid Y for Z")
@@ -383,6 +383,7 @@ class IntakeAnalyzer:
                     ai_facts = json.loads(response.content)
                     for fact in ai_facts:
                         fact['source_document'] = doc['file_name']
+                        fact['duplicate_documents'] = doc.get('duplicates', [])
                         fact['extraction_method'] = 'ai'
                         fact['confidence'] = 0.8
                         enhanced_facts.append(fact)
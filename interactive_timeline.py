@@ -151,9 +151,12 @@ class InteractiveTimeline:
         Return as JSON array with fields: date, type, description, amount (if applicable), 
         source_account, destination_account, supporting_documents"""
         
-        # Batch process documents
+        # Batch process documents; near-duplicate copies are covered by their
+        # canonical document, whose events list them as provenance
         events = []
         for doc in documents:
+            if doc.get('duplicate_of'):
+                continue
             if doc.get('content'):
                 doc_prompt = f"{prompt}\n\nDocument: {doc['file_name']}\nContent: {doc['content'][:2000]}"
                 response = await self.analyzer.chat_model.ainvoke([
@@ -165,6 +168,7 @@ class InteractiveTimeline:
                     for event in doc_events:
                         event['source_document'] = doc['file_name']
                         event['document_path'] = doc['file_path']
+                        event['duplicate_documents'] = doc.get('duplicates', [])
                         events.append(event)
                 except:
                     pass
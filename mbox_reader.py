@@ -0,0 +1,191 @@
+"""
+Memory-mapped mbox reading
+Message boundaries are found in one pass over a memory map and kept in a
+persisted offset index; messages are parsed in parallel by offset range, and
+a mailbox that has only grown has just its new tail indexed
+"""
+
+import os
+import mmap
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+import msgpack
+
+from email_parsing import message_body, message_metadata
+from config import MBOX_WORKERS, MBOX_BATCH_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+# Bytes hashed at each end of the indexed region to detect rewritten mailboxes
+EDGE_BYTES = 4096
+
+_SEPARATOR = b"\nFrom "
+
+
+def find_boundaries(mm: mmap.mmap, start: int = 0) -> List[int]:
+    """Offsets of every "From " envelope line at or after start"""
+    boundaries = []
+    if start == 0 and mm[:5] == b"From ":
+        boundaries.append(0)
+    position = mm.find(_SEPARATOR, max(start - 1, 0))
+    while position != -1:
+        if position + 1 >= start:
+            boundaries.append(position + 1)
+        position = mm.find(_SEPARATOR, position + 1)
+    return boundaries
+
+
+def _digest(mm: mmap.mmap, start: int, end: int) -> str:
+    return hashlib.md5(mm[start:end]).hexdigest()
+
+
+class MboxIndex:
+    """Message offsets of one mbox file, persisted between scans
+
+    keys holds the content hash of each message once it has been parsed, or
+    None for messages that are new or whose byte range changed.
+    """
+
+    def __init__(self, index_path: Path):
+        self.index_path = index_path
+        self._reset()
+
+        if index_path.exists():
+            try:
+                self._load()
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable mbox index {index_path}: {e}")
+                self._reset()
+
+    def _reset(self):
+        self.size = 0
+        self.inode: Optional[int] = None
+        self.head = ""
+        self.tail = ""
+        self.starts: List[int] = []
+        self.keys: List[Optional[str]] = []
+
+    def _load(self):
+        data = msgpack.unpackb(self.index_path.read_bytes(), raw=False)
+        self.size = data["size"]
+        self.inode = data["inode"]
+        self.head = data["head"]
+        self.tail = data["tail"]
+        self.starts = data["starts"]
+        self.keys = data["keys"]
+
+    def save(self):
+        payload = msgpack.packb({
+            "size": self.size,
+            "inode": self.inode,
+            "head": self.head,
+            "tail": self.tail,
+            "starts": self.starts,
+            "keys": self.keys,
+        }, use_bin_type=True)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _only_appended(self, mm: mmap.mmap, stat: os.stat_result) -> bool:
+        return (
+            bool(self.starts)
+            and stat.st_ino == self.inode
+            and len(mm) >= self.size
+            and self.head == _digest(mm, 0, min(EDGE_BYTES, self.size))
+            and self.tail == _digest(mm, max(0, self.size - EDGE_BYTES), self.size)
+        )
+
+    def refresh(self, mm: mmap.mmap, stat: os.stat_result):
+        """Bring the index up to date with the mapped file
+
+        If the file only grew, just the appended bytes are scanned; otherwise
+        the whole file is re-indexed.
+        """
+        size = len(mm)
+        if self._only_appended(mm, stat):
+            if size == self.size:
+                return
+            appended = find_boundaries(mm, self.size)
+            if not appended or appended[0] != self.size:
+                # The last message was extended rather than followed
+                self.keys[-1] = None
+            self.starts.extend(appended)
+            self.keys.extend([None] * len(appended))
+        else:
+            self.starts = find_boundaries(mm)
+            self.keys = [None] * len(self.starts)
+
+        self.size = size
+        self.inode = stat.st_ino
+        self.head = _digest(mm, 0, min(EDGE_BYTES, size))
+        self.tail = _digest(mm, max(0, size - EDGE_BYTES), size)
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """(start, end) byte range of every message"""
+        ends = self.starts[1:] + [self.size]
+        return list(zip(self.starts, ends))
+
+
+def parse_message(data: bytes) -> Dict[str, Any]:
+    """Parse one mbox message (envelope line included) into metadata and body"""
+    if data.startswith(b"From "):
+        newline = data.find(b"\n")
+        data = data[newline + 1:] if newline != -1 else b""
+    msg = BytesParser(policy=policy.default).parsebytes(data)
+    metadata = message_metadata(msg)
+
+    try:
+        sent = parsedate_to_datetime(metadata['date']).isoformat() if metadata['date'] else None
+    except (TypeError, ValueError):
+        sent = None
+
+    return {"email_metadata": metadata, "body": message_body(msg), "sent": sent}
+
+
+def _parse_batch(job: Tuple[str, Sequence[Tuple[int, int]]]) -> List[Tuple[int, str, Dict[str, Any]]]:
+    path, ranges = job
+    results = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start, end in ranges:
+            data = mm[start:end]
+            results.append((start, hashlib.md5(data).hexdigest(), parse_message(data)))
+    return results
+
+
+def parse_ranges(path: Path, ranges: Sequence[Tuple[int, int]],
+                 workers: int = MBOX_WORKERS,
+                 batch_size: int = MBOX_BATCH_MESSAGES) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """Yield (start, content hash, parsed message) for each range, in order
+
+    Ranges are split into batches that worker processes parse from their own
+    memory map of the file.
+    """
+    jobs = [(str(path), ranges[i:i + batch_size]) for i in range(0, len(ranges), batch_size)]
+    # Supervised scan workers are daemonic and may not start children
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    if workers <= 1 or len(jobs) < 2:
+        for job in jobs:
+            yield from _parse_batch(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        for batch in pool.map(_parse_batch, jobs):
+            yield from batch
@@ -0,0 +1,162 @@
+"""
+Near-duplicate document detection
+MinHash signatures over word shingles, banded into an LSH index so that only
+documents sharing a band are compared; the same statement downloaded as a
+PDF, attached to an email and scanned is clustered and indexed once
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+import logging
+
+import numpy as np
+
+from document_cache import DocumentCache
+from document_record import DocumentRecord
+from config import NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_MIN_WORDS
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs at Jaccard 0.8 become candidates ~95% of the time
+LSH_BANDS = 16
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Fixed seed: signatures are cached and must be comparable across runs
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+# Shingles hashed per step, bounding the (shingles x NUM_PERM) scratch array
+_BLOCK = 8192
+
+_WORD = re.compile(r"\w+")
+
+
+def minhash_signature(text: str, min_words: int = NEAR_DUPLICATE_MIN_WORDS) -> Optional[np.ndarray]:
+    """MinHash of the text's word shingles, or None if it is too short to compare"""
+    words = _WORD.findall(text.lower())
+    if len(words) < max(min_words, SHINGLE_WORDS):
+        return None
+
+    shingles = {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), _BLOCK):
+        block = hashes[start:start + _BLOCK, None]
+        permuted = (block * _PERM_A + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def cluster_signatures(signatures: Sequence[Optional[np.ndarray]],
+                       threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[List[int]]:
+    """Group indices whose signatures are at least threshold similar
+
+    Each signature is hashed band by band into buckets; only pairs sharing a
+    bucket are compared, so the work grows with the number of documents rather
+    than its square. Returns clusters of two or more indices, each sorted.
+    """
+    rows = NUM_PERM // LSH_BANDS
+    buckets: Dict[bytes, List[int]] = defaultdict(list)
+    for index, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for band in range(LSH_BANDS):
+            key = band.to_bytes(2, "little") + signature[band * rows:(band + 1) * rows].tobytes()
+            buckets[key].append(index)
+
+    parent = list(range(len(signatures)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for members in buckets.values():
+        # Compare against the bucket's first member only; a large cluster of
+        # copies then costs one comparison per copy, not one per pair
+        anchor = members[0]
+        for j in members[1:]:
+            if find(anchor) != find(j) and similarity(signatures[anchor], signatures[j]) >= threshold:
+                parent[find(j)] = find(anchor)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for index in range(len(signatures)):
+        if signatures[index] is not None:
+            clusters[find(index)].append(index)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def _signature(document: Mapping, cache: Optional[DocumentCache]) -> Optional[np.ndarray]:
+    name = f"minhash-{NUM_PERM}"
+    file_hash = document.get("file_hash")
+    if cache is not None and file_hash:
+        cached = cache.get_extra(file_hash, name)
+        if cached is not None:
+            return np.frombuffer(cached, dtype=np.uint32) if cached else None
+
+    signature = minhash_signature(document.get("content") or "")
+    if cache is not None and file_hash:
+        # An empty record remembers that the text was too short
+        cache.put_extra(file_hash, name, signature.tobytes() if signature is not None else b"")
+    return signature
+
+
+def _with_fields(document: Mapping, **fields: Any) -> Mapping:
+    if isinstance(document, DocumentRecord):
+        return document.with_extra(**fields)
+    return {**document, **fields}
+
+
+def mark_near_duplicates(documents: Iterable[Mapping],
+                         cache: Optional[DocumentCache] = None,
+                         threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Mapping]:
+    """Annotate near-duplicate copies with provenance links
+
+    In each cluster the canonical document (the first original file seen, or
+    the first email attachment / archive member if there is none) gets
+    "duplicates", the paths of every other copy; each copy gets
+    "duplicate_of" and its "similarity" to the canonical. Downstream stages
+    embed and analyse only documents without "duplicate_of". Signatures are
+    cached per content hash when a cache is given.
+    """
+    documents = list(documents)
+    if threshold <= 0 or len(documents) < 2:
+        return documents
+
+    signatures = [_signature(document, cache) for document in documents]
+    clusters = cluster_signatures(signatures, threshold)
+
+    for members in clusters:
+        canonical = min(members, key=lambda i: ("!/" in documents[i]["file_path"], i))
+        copies = [i for i in members if i != canonical]
+        canonical_path = documents[canonical]["file_path"]
+        for i in copies:
+            documents[i] = _with_fields(
+                documents[i],
+                duplicate_of=canonical_path,
+                similarity=round(similarity(signatures[i], signatures[canonical]), 3)
+            )
+        documents[canonical] = _with_fields(
+            documents[canonical],
+            duplicates=[documents[i]["file_path"] for i in copies]
+        )
+
+    if clusters:
+        skipped = sum(len(members) - 1 for members in clusters)
+        logger.info(f"Found {len(clusters)} near-duplicate clusters; {skipped} copies will not be re-analysed")
+    return documents
@@ -0,0 +1,161 @@
+"""
+Local OCR for scanned receipts, confirmations and image-only PDF pages
+Images are deskewed and downscaled to the target DPI, then recognised with
+Tesseract in a process pool, a batch at a time
+"""
+
+import io
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+import logging
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageOps
+
+from config import OCR_DPI, OCR_LANGUAGE, OCR_WORKERS, OCR_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# An image file on disk or in memory, or an already rendered page, with its
+# resolution (None when unknown)
+OcrJob = Tuple[Union[Path, BinaryIO, Image.Image], Optional[float]]
+
+# Skew search: +/- SKEW_RANGE degrees in SKEW_STEP increments, measured on a
+# copy no wider than SKEW_SAMPLE_WIDTH pixels
+SKEW_RANGE = 5.0
+SKEW_STEP = 0.5
+SKEW_SAMPLE_WIDTH = 800
+
+
+def estimate_skew(image: Image.Image) -> float:
+    """Angle (degrees) that best aligns text lines horizontally
+
+    Uses the projection-profile method: rows of level text give the sharpest
+    row-sum profile, i.e. the largest variance.
+    """
+    sample = image
+    if sample.width > SKEW_SAMPLE_WIDTH:
+        ratio = SKEW_SAMPLE_WIDTH / sample.width
+        sample = sample.resize((SKEW_SAMPLE_WIDTH, max(1, int(sample.height * ratio))))
+    # Text becomes 1, background 0
+    ink = sample.point(lambda v: 255 if v < 128 else 0)
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(SKEW_RANGE / SKEW_STEP)
+    for step in range(-steps, steps + 1):
+        angle = step * SKEW_STEP
+        rotated = ink.rotate(angle, fillcolor=0) if angle else ink
+        score = float(np.asarray(rotated, dtype=np.float32).sum(axis=1).var())
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def preprocess(image: Image.Image, source_dpi: Optional[float] = None,
+               target_dpi: int = OCR_DPI) -> Image.Image:
+    """Greyscale, downscale to target_dpi and deskew an image for Tesseract"""
+    image = ImageOps.exif_transpose(image).convert("L")
+
+    if source_dpi and source_dpi > target_dpi:
+        ratio = target_dpi / source_dpi
+        image = image.resize((max(1, int(image.width * ratio)), max(1, int(image.height * ratio))),
+                             Image.LANCZOS)
+
+    angle = estimate_skew(image)
+    if angle:
+        image = image.rotate(angle, expand=True, fillcolor=255, resample=Image.BICUBIC)
+    return image
+
+
+def _load(job: OcrJob) -> Tuple[Image.Image, Optional[float]]:
+    source, dpi = job
+    if isinstance(source, Image.Image):
+        return source, dpi
+    if hasattr(source, "read"):
+        source.seek(0)
+        image = Image.open(source)
+    else:
+        with open(source, 'rb') as f:
+            image = Image.open(io.BytesIO(f.read()))
+    image.load()
+    if dpi is None and "dpi" in image.info:
+        dpi = float(image.info["dpi"][0]) or None
+    return image, dpi
+
+
+def ocr_job(job: OcrJob) -> str:
+    """Recognise the text of one image"""
+    image, dpi = _load(job)
+    image = preprocess(image, dpi)
+    return pytesseract.image_to_string(image, lang=OCR_LANGUAGE,
+                                       config=f"--dpi {OCR_DPI}").strip()
+
+
+# One OCR pool per process, created on first use, so concurrent extractions
+# share OCR_WORKERS processes instead of each starting a pool of their own
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS))
+        return _pool
+
+
+def shutdown_pool(pool: Optional[ProcessPoolExecutor] = None):
+    """Shut down the shared OCR pool (or pool, if it is still the shared one)
+
+    The next ocr_images call starts a fresh pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or (pool is not None and pool is not _pool):
+            return
+        pool, _pool = _pool, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool_workers(requested: int) -> int:
+    # Supervised scan workers are daemonic and may not start children; they
+    # already run one file per process, so OCR stays in-process there
+    if multiprocessing.current_process().daemon:
+        return 1
+    return max(1, requested)
+
+
+def ocr_images(jobs: Iterable[OcrJob], workers: int = OCR_WORKERS,
+               batch_size: int = OCR_BATCH_SIZE) -> Iterator[str]:
+    """Yield the text of each image in input order
+
+    jobs is consumed lazily, batch_size at a time, so callers can render PDF
+    pages on demand without holding a whole document's images in memory.
+    With workers > 1 the batches go to the process-wide OCR pool.
+    """
+    jobs = iter(jobs)
+    workers = _pool_workers(workers)
+    batch: List[OcrJob] = list(islice(jobs, batch_size))
+
+    if workers == 1 or len(batch) < 2:
+        while batch:
+            yield from map(ocr_job, batch)
+            batch = list(islice(jobs, batch_size))
+        return
+
+    pool = _shared_pool()
+    try:
+        while batch:
+            yield from pool.map(ocr_job, batch)
+            batch = list(islice(jobs, batch_size))
+    except BrokenProcessPool:
+        # Replace the pool for other callers rather than failing every later OCR
+        shutdown_pool(pool)
+        raise
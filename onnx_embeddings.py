@@ -0,0 +1,87 @@
+"""
+ONNX Runtime embedding backend
+Runs the int8-quantized ONNX export of the sentence-transformers model on
+CPU, with the same tokenizer, truncation, mean pooling and normalisation, so
+its vectors are cosine-compatible with the PyTorch model's
+"""
+
+import os
+from pathlib import Path
+from typing import List, Optional
+import logging
+
+import numpy as np
+import onnxruntime as ort
+from huggingface_hub import hf_hub_download
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+from config import EMBEDDING_ONNX_FILE, EMBEDDING_MAX_TOKENS, EMBEDDING_MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Mask-weighted mean of token vectors, L2-normalised per row"""
+    mask = mask[:, :, None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norms, 1e-12, None)
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX model file
+
+    The model and tokenizer come from the model's Hugging Face repository
+    (which publishes quantized ONNX exports under onnx/), or from model_dir
+    when given. Intra-op threads default to OMP_NUM_THREADS, so embedding
+    worker processes share the cores.
+    """
+
+    def __init__(self, model_name: str, onnx_file: str = EMBEDDING_ONNX_FILE,
+                 model_dir: Optional[Path] = None,
+                 max_tokens: int = EMBEDDING_MAX_TOKENS,
+                 batch_size: int = EMBEDDING_MAX_BATCH,
+                 threads: Optional[int] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        if model_dir is not None:
+            model_path = Path(model_dir) / onnx_file
+            tokenizer_path = Path(model_dir) / "tokenizer.json"
+        else:
+            model_path = hf_hub_download(model_name, onnx_file)
+            tokenizer_path = hf_hub_download(model_name, "tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        if threads is None:
+            threads = int(os.environ.get("OMP_NUM_THREADS") or 0)
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {model_path}")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask
+        }
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+        return mean_pool(hidden, mask)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
@@ -5,22 +5,29 @@ Integrates with Cloudflare Workers for email and communication processing
 
 import os
 import asyncio
-import aiohttp
 import hashlib
-import mimetypes
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Set
+from typing import Callable, Dict, List, Any, Optional, Set
 from datetime import datetime
 import json
 import logging
 import re
+import threading
 from concurrent.futures import ThreadPoolExecutor
-import email
-from email import policy
-from email.parser import BytesParser
 
-from document_processor import DocumentProcessor
-from config import BASE_DIR, SUPPORTED_FILE_TYPES
+from document_processor import DocumentProcessor, _init_worker, _process_in_worker, _parse_email_in_worker
+from document_record import DocumentRecord
+from extraction_supervisor import ExtractionSupervisor, TaskOutcome
+from archive_reader import is_archive
+from email_sync import EmailSyncClient
+from file_walker import VisitedDirs, walk_files
+from near_duplicates import mark_near_duplicates
+from file_hashing import get_hash_registry
+from config import (
+    BASE_DIR, SUPPORTED_FILE_TYPES, LARGE_FILE_THRESHOLD_MB, MAX_FILE_SIZE_MB,
+    SCAN_WORKERS, SCAN_CONCURRENCY, SCAN_QUEUE_SIZE,
+    EXTRACTION_TIMEOUT, EXTRACTION_MEMORY_LIMIT_MB
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +36,19 @@ class RecursiveScanner:
     def __init__(self, cloudflare_worker_url: Optional[str] = None):
         self.processor = DocumentProcessor()
         self.cloudflare_worker_url = cloudflare_worker_url or os.getenv("CLOUDFLARE_WORKER_URL")
-        self.scanned_paths: Set[str] = set()
+        # Created on first sync and kept so its HTTP session is reused
+        self._email_sync: Optional[EmailSyncClient] = None
+        # Executors for the duration of a scan; see scan_recursive
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._extractor: Optional[ExtractionSupervisor] = None
         self.email_patterns = [
             r'nick@chitty\.cc',
             r'[\w\.-]+@[\w\.-]+\.\w+',  # General email pattern
         ]
+        # One pass per text instead of one per pattern
+        self.relevance_pattern = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in self.email_patterns), re.IGNORECASE
+        )
         
         # Extended file types for communications
         self.communication_extensions = {
@@ -48,6 +63,7 @@ class RecursiveScanner:
         self.archive_extensions = {
             '.zip': 'ZIP archive',
             '.tar': 'TAR archive',
+            '.tgz': 'Gzipped TAR archive',
             '.gz': 'GZIP archive',
             '.7z': '7-Zip archive',
             '.rar': 'RAR archive'
@@ -73,65 +89,133 @@ class RecursiveScanner:
     async def scan_recursive(self, start_path: Path = BASE_DIR, 
                            max_depth: int = 10,
                            follow_symlinks: bool = False) -> List[Dict[str, Any]]:
-        """Recursively scan for all documents including nested archives and communications"""
-        documents = []
+        """Recursively scan for all documents including nested archives and communications
         
-        async def scan_directory(path: Path, depth: int = 0):
-            if depth > max_depth:
-                return
-            
-            # Avoid scanning the same path twice
-            abs_path = str(path.absolute())
-            if abs_path in self.scanned_paths:
-                return
-            self.scanned_paths.add(abs_path)
-            
+        The directory walk runs in a thread and feeds a bounded queue that
+        SCAN_CONCURRENCY tasks drain. Extraction goes to supervised worker
+        processes when SCAN_WORKERS > 1, under the same time and memory budget
+        and quarantine as DocumentProcessor.scan_documents; other blocking I/O
+        goes to a thread pool. A full
+        queue pauses the walk, so memory stays flat on very large trees.
+        Documents are returned in walk order.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+        results: Dict[int, List[Dict[str, Any]]] = {}
+        stop = threading.Event()
+        
+        def walk():
+            # One walk of the tree; hidden directories are pruned before descending
+            items = walk_files(start_path,
+                               suffixes=self.all_supported_types,
+                               max_depth=max_depth,
+                               follow_symlinks=follow_symlinks,
+                               seen_dirs=VisitedDirs())
+            for index, item in enumerate(items):
+                if stop.is_set():
+                    break
+                # Blocks while the queue is full
+                asyncio.run_coroutine_threadsafe(queue.put((index, item)), loop).result()
+        
+        async def produce():
             try:
-                for item in path.iterdir():
-                    if item.is_file():
-                        # Process file
-                        if self._should_process_file(item):
-                            doc = await self._process_file(item)
-                            if doc:
-                                documents.append(doc)
-                        
-                        # Check if it's an archive to extract
-                        if item.suffix.lower() in self.archive_extensions:
-                            extracted_docs = await self._process_archive(item)
-                            documents.extend(extracted_docs)
-                    
-                    elif item.is_dir():
-                        # Skip hidden directories
-                        if not item.name.startswith('.'):
-                            await scan_directory(item, depth + 1)
-                    
-                    elif item.is_symlink() and follow_symlinks:
-                        # Follow symlink if enabled
-                        target = item.resolve()
-                        if target.exists():
-                            if target.is_file():
-                                doc = await self._process_file(target)
-                                if doc:
-                                    documents.append(doc)
-                            elif target.is_dir():
-                                await scan_directory(target, depth + 1)
-            
-            except PermissionError:
-                logger.warning(f"Permission denied: {path}")
-            except Exception as e:
-                logger.error(f"Error scanning {path}: {e}")
+                await loop.run_in_executor(self._io_pool, walk)
+            finally:
+                for _ in range(SCAN_CONCURRENCY):
+                    await queue.put(None)
+        
+        async def consume():
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    break
+                index, item = entry
+                docs = await self._process_item(item)
+                if docs:
+                    results[index] = docs
+        
+        self._io_pool = ThreadPoolExecutor(max_workers=SCAN_CONCURRENCY + 1,
+                                           thread_name_prefix="scan-io")
+        if SCAN_WORKERS > 1:
+            self._extractor = ExtractionSupervisor(
+                _process_in_worker,
+                workers=SCAN_WORKERS,
+                timeout=EXTRACTION_TIMEOUT,
+                memory_limit_mb=EXTRACTION_MEMORY_LIMIT_MB,
+                initializer=_init_worker
+            )
+            self._extractor.start()
+        try:
+            await asyncio.gather(produce(), *(consume() for _ in range(SCAN_CONCURRENCY)))
+        finally:
+            stop.set()
+            # Unblock a walk waiting on a full queue
+            while not queue.empty():
+                queue.get_nowait()
+            self._io_pool.shutdown(wait=False)
+            if self._extractor:
+                self._extractor.close()
+            self._io_pool = self._extractor = None
         
-        # Start scanning
-        await scan_directory(start_path)
+        documents = []
+        seen_attachments: Set[str] = set()
+        for index in sorted(results):
+            for doc in results[index]:
+                # An attachment repeated across emails is kept with the first in walk order
+                if doc.get('attachment_of'):
+                    if doc['file_hash'] in seen_attachments:
+                        continue
+                    seen_attachments.add(doc['file_hash'])
+                documents.append(doc)
         
         # Process email ingestion if configured
         if self.cloudflare_worker_url:
             email_docs = await self._ingest_cloudflare_emails()
             documents.extend(email_docs)
         
+        documents = await asyncio.to_thread(mark_near_duplicates, documents, self.processor.cache)
+        
         logger.info(f"Recursive scan complete. Found {len(documents)} documents")
         return documents
     
+    async def _run_io(self, func: Callable, *args) -> Any:
+        """Run blocking work in the scan's thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_pool, func, *args)
+    
+    async def _run_supervised(self, task: Callable, file_path: Path) -> TaskOutcome:
+        """Run task(file_path) in a supervised worker
+        
+        A file that blows its budget or kills its worker is quarantined and
+        skipped by later scans until it changes.
+        """
+        outcome = await asyncio.wrap_future(self._extractor.submit(file_path, task))
+        if outcome.quarantined:
+            self.processor.quarantine_file(file_path, outcome.error)
+        elif outcome.error:
+            logger.error(f"Failed to process {file_path}: {outcome.error}")
+        return outcome
+    
+    async def _process_item(self, item: Path) -> List[Dict[str, Any]]:
+        """Process one walked path, plus the contents of archives"""
+        documents = []
+        try:
+            if await self._run_io(self._should_process_file, item):
+                if item.suffix.lower() == '.mbox':
+                    documents.extend(await self._process_mailbox(item))
+                elif item.suffix.lower() == '.eml':
+                    documents.extend(await self._process_email(item))
+                else:
+                    doc = await self._process_file(item)
+                    if doc:
+                        documents.append(doc)
+            
+            # Check if it's an archive to extract
+            if item.suffix.lower() in self.archive_extensions:
+                documents.extend(await self._process_archive(item))
+        except Exception as e:
+            logger.error(f"Failed to process {item}: {e}")
+        return documents
+    
     def _should_process_file(self, file_path: Path) -> bool:
         """Check if file should be processed"""
         # Check file extension
@@ -142,10 +226,10 @@ class RecursiveScanner:
         if file_path.name.startswith('~') or file_path.name.startswith('.'):
             return False
         
-        # Check file size (skip files over 100MB)
+        # Check file size; large files are streamed, only the configured maximum is skipped
         try:
-            if file_path.stat().st_size > 100 * 1024 * 1024:
-                logger.warning(f"Skipping large file: {file_path} (>100MB)")
+            if MAX_FILE_SIZE_MB and file_path.stat().st_size > MAX_FILE_SIZE_MB * 1024 * 1024:
+                logger.warning(f"Skipping large file: {file_path} (>{MAX_FILE_SIZE_MB}MB)")
                 return False
         except (OSError, PermissionError) as e:
             logger.warning(f"Cannot access file {file_path}: {e}")
@@ -158,7 +242,20 @@ class RecursiveScanner:
         try:
             # Use existing document processor for standard files
             if file_path.suffix.lower() in SUPPORTED_FILE_TYPES:
-                return self.processor.process_document(file_path)
+                if file_path.stat().st_size > LARGE_FILE_THRESHOLD_MB * 1024 * 1024:
+                    # Streamed in a worker under a memory ceiling
+                    logger.info(f"Large file mode for {file_path}")
+                    return await self._run_io(self.processor.process_isolated, file_path)
+                if self._extractor:
+                    if self.processor.is_quarantined(file_path):
+                        logger.warning(f"Skipping quarantined file {file_path}")
+                        return None
+                    # Workers cache the content and send back metadata only
+                    outcome = await self._run_supervised(_process_in_worker, file_path)
+                    if outcome.result is None:
+                        return None
+                    return DocumentRecord.from_document(outcome.result, self.processor.load_content)
+                return await self._run_io(self.processor.process_document, file_path)
             
             # Process communication files
             elif file_path.suffix.lower() in self.communication_extensions:
@@ -176,59 +273,77 @@ class RecursiveScanner:
         """Process email and communication files"""
         try:
             if file_path.suffix.lower() == '.eml':
-                return self._process_eml_file(file_path)
+                return (await self._process_email(file_path))[0]
             elif file_path.suffix.lower() == '.msg':
                 return await self._process_msg_file(file_path)
-            elif file_path.suffix.lower() in ['.mbox', '.pst', '.ost']:
+            elif file_path.suffix.lower() in ['.pst', '.ost']:
                 logger.info(f"Found mailbox file: {file_path} (requires specialized processing)")
                 # For now, just catalog these files
-                return self._create_document_entry(file_path, "Mailbox file - requires extraction")
+                return await self._run_io(self._create_document_entry, file_path,
+                                          "Mailbox file - requires extraction")
         
         except Exception as e:
             logger.error(f"Failed to process communication file {file_path}: {e}")
             return None
     
-    def _process_eml_file(self, file_path: Path) -> Dict[str, Any]:
-        """Process .eml email file"""
-        with open(file_path, 'rb') as f:
-            msg = BytesParser(policy=policy.default).parse(f)
-        
-        # Extract email metadata
-        metadata = {
-            'from': msg.get('From', ''),
-            'to': msg.get('To', ''),
-            'cc': msg.get('Cc', ''),
-            'subject': msg.get('Subject', ''),
-            'date': msg.get('Date', ''),
-            'message_id': msg.get('Message-ID', '')
-        }
-        
-        # Extract body
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == 'text/plain':
-                    body += part.get_content() + "\n"
+    async def _process_mailbox(self, mbox_path: Path) -> List[Dict[str, Any]]:
+        """Catalog an mbox file and extract each of its messages"""
+        try:
+            messages = await self._run_io(self.processor.process_mbox, mbox_path)
+        except Exception as e:
+            logger.error(f"Failed to process mailbox {mbox_path}: {e}")
+            messages = []
+        doc = await self._run_io(
+            self._create_document_entry,
+            mbox_path,
+            f"Mailbox file containing {len(messages)} messages"
+        )
+        return [doc, *messages]
+    
+    async def _process_email(self, file_path: Path) -> List[Dict[str, Any]]:
+        """Process .eml email file, followed by attachments not yet seen this scan"""
+        if self._extractor:
+            if self.processor.is_quarantined(file_path):
+                logger.warning(f"Skipping quarantined file {file_path}")
+                return []
+            outcome = await self._run_supervised(_parse_email_in_worker, file_path)
+            if outcome.result is None:
+                return []
+            parsed = outcome.result
         else:
-            body = msg.get_content()
-        
-        # Check for relevant email addresses
-        all_text = f"{metadata['from']} {metadata['to']} {metadata['cc']} {body}"
-        is_relevant = any(re.search(pattern, all_text, re.IGNORECASE) 
-                         for pattern in self.email_patterns)
+            parsed = await self._run_io(self.processor.parse_email, file_path)
+        return await self._run_io(self._email_documents, file_path, parsed)
+    
+    def _is_relevant(self, metadata: Dict[str, str], body: str) -> bool:
+        # Headers first; the body is only searched when they don't match
+        return any(self.relevance_pattern.search(text)
+                   for text in (metadata['from'], metadata['to'], metadata['cc'], body) if text)
+    
+    def _email_documents(self, file_path: Path, parsed: Dict[str, Any]) -> List[Dict[str, Any]]:
+        metadata = parsed['email_metadata']
+        body = parsed['body']
         
         doc_entry = self._create_document_entry(file_path, body)
         doc_entry['metadata'] = metadata
-        doc_entry['category'] = 'communications' if is_relevant else 'other'
+        doc_entry['category'] = 'communications' if self._is_relevant(metadata, body) else 'other'
         doc_entry['email_metadata'] = metadata
+        doc_entry['attachments'] = [
+            {key: attachment[key] for key in ('file_name', 'file_hash', 'content_type', 'file_size')}
+            for attachment in parsed['attachments']
+        ]
         
-        return doc_entry
+        documents = [doc_entry]
+        for attachment in parsed['attachments']:
+            if attachment['file_type'] in SUPPORTED_FILE_TYPES:
+                documents.append(DocumentRecord.from_document(attachment, self.processor.load_content))
+        return documents
     
     async def _process_msg_file(self, file_path: Path) -> Dict[str, Any]:
         """Process .msg Outlook file"""
         # For now, create a placeholder entry
         # Full .msg processing would require python-outlook or similar
-        return self._create_document_entry(
+        return await self._run_io(
+            self._create_document_entry,
             file_path, 
             "Outlook message file - requires specialized extraction"
         )
@@ -237,7 +352,8 @@ class RecursiveScanner:
         """Process additional document types"""
         # For now, create catalog entries for these files
         # Full processing would require python-docx, python-odt, etc.
-        return self._create_document_entry(
+        return await self._run_io(
+            self._create_document_entry,
             file_path,
             f"{self.additional_doc_types[file_path.suffix.lower()]} - requires extraction"
         )
@@ -245,26 +361,31 @@ class RecursiveScanner:
     async def _process_archive(self, archive_path: Path) -> List[Dict[str, Any]]:
         """Process archive files"""
         logger.info(f"Found archive: {archive_path}")
-        # For now, just catalog the archive
-        # Full extraction would require zipfile, tarfile, etc.
-        doc = self._create_document_entry(
+        if not is_archive(archive_path.name):
+            # 7z/rar are only catalogued
+            doc = await self._run_io(
+                self._create_document_entry,
+                archive_path,
+                f"Archive file containing multiple documents"
+            )
+            return [doc]
+        
+        # Members are extracted in memory and cached individually
+        members = await self._run_io(self.processor.process_archive, archive_path)
+        doc = await self._run_io(
+            self._create_document_entry,
             archive_path,
-            f"Archive file containing multiple documents"
+            f"Archive file containing {len(members)} documents"
         )
-        return [doc]
+        return [doc, *members]
     
     def _create_document_entry(self, file_path: Path, content: str = "") -> Dict[str, Any]:
         """Create a document entry for files that need special processing"""
         stat = file_path.stat()
         relative_path = file_path.relative_to(BASE_DIR)
         
-        # Generate file hash
-        hasher = hashlib.md5()
-        with open(file_path, 'rb') as f:
-            buf = f.read(65536)  # Read in 64kb chunks
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = f.read(65536)
+        # Generate file hash (shared with the cache and authenticator)
+        file_hash = get_hash_registry().get(file_path, ("md5",), stat)["md5"]
         
         return {
             "file_path": str(file_path),
@@ -272,7 +393,7 @@ class RecursiveScanner:
             "file_name": file_path.name,
             "file_type": file_path.suffix.lower(),
             "file_size": stat.st_size,
-            "file_hash": hasher.hexdigest(),
+            "file_hash": file_hash,
             "modified_time": datetime.fromtimestamp(stat.st_mtime).isoformat(),
             "content": content,
             "content_length": len(content),
@@ -299,51 +420,33 @@ class RecursiveScanner:
         return "other"
     
     async def _ingest_cloudflare_emails(self) -> List[Dict[str, Any]]:
-        """Ingest emails from Cloudflare Worker"""
+        """Ingest emails received since the last sync from Cloudflare Worker"""
         if not self.cloudflare_worker_url:
             return []
         
+        if self._email_sync is None:
+            url_hash = hashlib.md5(self.cloudflare_worker_url.encode()).hexdigest()
+            self._email_sync = EmailSyncClient(
+                self.cloudflare_worker_url,
+                self.processor.cache_dir / "email_sync" / f"{url_hash}.json"
+            )
+        
         documents = []
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Request emails from worker
-                payload = {
-                    "action": "fetch_emails",
-                    "email": "nick@chitty.cc",
-                    "date_range": {
-                        "start": (datetime.now().replace(year=datetime.now().year-1)).isoformat(),
-                        "end": datetime.now().isoformat()
-                    }
-                }
-                
-                headers = {
-                    "Authorization": f"Bearer {os.getenv('CLOUDFLARE_WORKER_TOKEN', '')}",
-                    "Content-Type": "application/json"
-                }
-                
-                async with session.post(
-                    self.cloudflare_worker_url,
-                    json=payload,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        emails = data.get("emails", [])
-                        
-                        for email_data in emails:
-                            doc = self._create_email_document(email_data)
-                            documents.append(doc)
-                        
-                        logger.info(f"Ingested {len(emails)} emails from Cloudflare Worker")
-                    else:
-                        logger.error(f"Failed to fetch emails: {response.status}")
-        
+            emails = await self._email_sync.sync()
+            documents = [self._create_email_document(email_data) for email_data in emails]
+            logger.info(f"Ingested {len(emails)} emails from Cloudflare Worker")
         except Exception as e:
             logger.error(f"Error ingesting Cloudflare emails: {e}")
         
         return documents
     
+    async def close(self):
+        """Release the pooled email sync session"""
+        if self._email_sync is not None:
+            await self._email_sync.close()
+    
     def _create_email_document(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create document entry from Cloudflare email data"""
         # Create a virtual path for the email
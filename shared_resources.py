@@ -0,0 +1,139 @@
+"""
+Process-wide registry of expensive objects
+The embedding model, vector store and chat clients are built on first use,
+once per process, and shared by every Streamlit session and API request.
+warm_up() builds them ahead of time, optionally on a background thread, and
+records how long each one took.
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """Named factories whose results are built once and then shared
+
+    A factory may take arguments (e.g. an API key); each distinct set of
+    arguments gets its own instance. Different resources build concurrently,
+    while callers asking for one that is being built wait for it.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[..., Any]] = {}
+        self._preload: List[str] = []
+        self._values: Dict[Tuple, Any] = {}
+        self._locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.load_seconds: Dict[str, float] = {}
+        self.warmup_seconds: Optional[float] = None
+        self._warmup: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Callable[..., Any], preload: bool = True):
+        """Add a factory; preload=False leaves it out of the default warm-up
+        (for factories that need arguments)"""
+        self._factories[name] = factory
+        if preload:
+            self._preload.append(name)
+
+    def get(self, name: str, *args: Any) -> Any:
+        """The shared instance, built on first request"""
+        key = (name, *args)
+        if key in self._values:
+            return self._values[key]
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._values:
+                started = time.monotonic()
+                self._values[key] = self._factories[name](*args)
+                self.load_seconds[name] = time.monotonic() - started
+                logger.info(f"Loaded {name} in {self.load_seconds[name]:.2f}s")
+        return self._values[key]
+
+    def loaded(self, name: str) -> bool:
+        return any(key[0] == name for key in list(self._values))
+
+    def warm_up(self, names: Optional[Iterable[str]] = None,
+                background: bool = False) -> Optional[threading.Thread]:
+        """Build the named resources (every preload one by default)
+
+        With background=True this returns at once and the work continues on
+        a daemon thread; failures are logged and left to surface on first use.
+        """
+        names = list(names) if names is not None else list(self._preload)
+
+        def run():
+            started = time.monotonic()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"Warm-up of {name} failed: {e}")
+            self.warmup_seconds = time.monotonic() - started
+            logger.info(f"Warm-up finished in {self.warmup_seconds:.2f}s")
+
+        if not background:
+            run()
+            return None
+        # Once per registry: callers such as Streamlit reruns may ask repeatedly
+        with self._lock:
+            if self._warmup is None:
+                self._warmup = threading.Thread(target=run, name="resource-warmup", daemon=True)
+                self._warmup.start()
+        return self._warmup
+
+    @property
+    def warming_up(self) -> bool:
+        return self._warmup is not None and self._warmup.is_alive()
+
+    def status(self) -> Dict[str, Any]:
+        """What is loaded and how long it took, for health checks"""
+        return {
+            "loaded": sorted({key[0] for key in list(self._values)}),
+            "load_seconds": {name: round(s, 3) for name, s in self.load_seconds.items()},
+            "warming_up": self.warming_up,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None
+        }
+
+    def close(self):
+        """Release resources that hold processes or connections"""
+        with self._lock:
+            values = list(self._values.values())
+            self._values.clear()
+        for value in values:
+            close = getattr(value, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"Error closing {type(value).__name__}: {e}")
+
+
+class SharedResource:
+    """Attribute resolved through the owner's registry on first access
+
+    keyed_by names an owner attribute passed to the factory (e.g. the API
+    key). Assigning the attribute overrides it for that instance only.
+    """
+
+    def __init__(self, name: str, keyed_by: Optional[str] = None):
+        self.name = name
+        self.keyed_by = keyed_by
+
+    def __set_name__(self, owner, attr: str):
+        self.attr = attr
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if self.attr in instance.__dict__:
+            return instance.__dict__[self.attr]
+        args = (getattr(instance, self.keyed_by),) if self.keyed_by else ()
+        return instance.resources.get(self.name, *args)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.attr] = value
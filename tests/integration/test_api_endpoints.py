@@ -419,7 +419,7 @@ class TestAPIIntegration:
 
             # Verify workflow
             mock_processor.scan_documents.assert_called()
-            mock_analyzer.index_documents.assert_called_with(mock_docs)
+            mock_analyzer.index_documents.assert_called_with(mock_docs, prune=True)
             mock_analyzer.search_documents.assert_called_with("Show me the transactions", k=10)
 
     @patch.dict(os.environ, {"API_TOKENS": "integration-token"})
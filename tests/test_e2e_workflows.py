@@ -71,11 +71,12 @@ class TestDocumentAnalysisWorkflow:
         }
 
     @pytest.mark.asyncio
-    async def test_complete_forensic_analysis_workflow(self, temp_documents_dir, mock_claude_responses):
+    async def test_complete_forensic_analysis_workflow(self, temp_documents_dir, mock_claude_responses, temp_dir):
         """Test complete forensic analysis from document scan to exhibit generation"""
 
         # Step 1: Initialize all components
-        with patch('document_processor.BASE_DIR', temp_documents_dir):
+        with patch('document_processor.BASE_DIR', temp_documents_dir), \
+             patch('document_processor.CACHE_DIR', temp_dir / 'cache'):
             processor = DocumentProcessor()
 
         with patch('claude_integration.Anthropic') as mock_anthropic, \
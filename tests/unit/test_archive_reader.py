@@ -0,0 +1,70 @@
+import pytest
+import io
+import gzip
+import tarfile
+import zipfile
+
+from archive_reader import MemberTooLarge, is_archive, iter_members
+
+
+def _zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar_bytes(members, mode='w:gz'):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1700000000
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class TestIterMembers:
+
+    def test_is_archive(self):
+        """Test archive detection by name"""
+        assert is_archive('production.ZIP')
+        assert is_archive('statements.tar.gz')
+        assert is_archive('ledger.csv.gz')
+        assert not is_archive('statement.pdf')
+
+    def test_zip_members_with_crc(self):
+        """Test reading zip members and their CRC fingerprints"""
+        data = _zip_bytes({'a/statement.txt': b'statement', 'b.csv': b'x,y\n1,2\n'})
+
+        members = [(m.path, m.fingerprint, m.read()) for m in iter_members(io.BytesIO(data), 'p.zip')]
+
+        assert [m[0] for m in members] == ['a/statement.txt', 'b.csv']
+        assert members[0][1] == f"crc32:{zipfile.crc32(b'statement'):08x}"
+        assert members[0][2] == b'statement'
+
+    def test_tar_members_streamed(self):
+        """Test reading compressed tar members sequentially"""
+        data = _tar_bytes({'one.txt': b'first', 'two.txt': b'second'})
+
+        members = [(m.path, m.read()) for m in iter_members(io.BytesIO(data), 'p.tar.gz')]
+
+        assert members == [('one.txt', b'first'), ('two.txt', b'second')]
+
+    def test_gzip_single_member(self):
+        """Test a bare .gz yields one member named after the archive"""
+        data = gzip.compress(b'wire confirmation')
+
+        members = [(m.path, m.read()) for m in iter_members(io.BytesIO(data), 'wire.txt.gz')]
+
+        assert members == [('wire.txt', b'wire confirmation')]
+
+    def test_member_size_limit(self):
+        """Test that members decompressing past the limit are refused"""
+        data = _zip_bytes({'big.txt': b'0' * 1000})
+
+        with pytest.raises(MemberTooLarge):
+            for member in iter_members(io.BytesIO(data), 'p.zip', max_member_bytes=100):
+                member.read()
@@ -4,11 +4,17 @@ import json
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
 from datetime import datetime
 
-from claude_integration import ClaudeAnalyzer
+from claude_integration import ClaudeAnalyzer, create_resources
 
 
 class TestClaudeAnalyzer:
 
+    @pytest.fixture(autouse=True)
+    def vector_db_path(self, temp_dir):
+        """Keep the index manifest out of the real vector store directory"""
+        with patch('claude_integration.VECTOR_DB_PATH', temp_dir / 'chroma_db'):
+            yield temp_dir / 'chroma_db'
+
     @pytest.fixture
     def mock_env_key(self):
         """Mock environment with API key"""
@@ -92,6 +98,31 @@ class TestClaudeAnalyzer:
         assert call_args[0].metadata["file_name"] == "doc1.pdf"
         assert call_args[0].metadata["chunk_index"] == 0
 
+    def test_index_documents_skips_near_duplicates(self, analyzer):
+        """Test that copies are not embedded and the canonical chunks link to them"""
+        documents = [
+            {
+                "file_path": "/test/statement.pdf",
+                "file_name": "statement.pdf",
+                "category": "financial",
+                "content": "Closing balance 1,250.00",
+                "duplicates": ["/test/scan.png"]
+            },
+            {
+                "file_path": "/test/scan.png",
+                "file_name": "scan.png",
+                "category": "financial",
+                "content": "Closing balance 1,25O.00",
+                "duplicate_of": "/test/statement.pdf"
+            }
+        ]
+
+        analyzer.index_documents(documents)
+
+        chunks = analyzer.vector_store.add_documents.call_args[0][0]
+        assert [c.metadata["file_name"] for c in chunks] == ["statement.pdf"]
+        assert json.loads(chunks[0].metadata["duplicates"]) == ["/test/scan.png"]
+
     def test_index_documents_empty_content(self, analyzer):
         """Test indexing documents with empty content"""
         documents = [
@@ -108,6 +139,135 @@ class TestClaudeAnalyzer:
         # Should not call add_documents for empty content
         analyzer.vector_store.add_documents.assert_not_called()
 
+    def test_reindex_unchanged_corpus_is_a_no_op(self, analyzer):
+        """Test that indexing the same documents twice embeds nothing the second time"""
+        content = Mock(side_effect=lambda: "Closing balance 1,250.00")
+
+        class Record(dict):
+            def get(self, key, default=None):
+                return content() if key == "content" else super().get(key, default)
+
+        documents = [Record(file_path="/test/statement.pdf", file_name="statement.pdf",
+                            category="financial", file_hash="h1")]
+
+        analyzer.index_documents(documents)
+        ids = analyzer.vector_store.add_documents.call_args.kwargs["ids"]
+        analyzer.vector_store.reset_mock()
+        content.reset_mock()
+
+        analyzer.index_documents(documents)
+
+        assert len(ids) == 1
+        analyzer.vector_store.add_documents.assert_not_called()
+        analyzer.vector_store.delete.assert_not_called()
+        content.assert_not_called()
+
+    def test_changed_document_replaces_its_chunks(self, analyzer):
+        """Test that a changed document upserts new chunks and deletes the old ones"""
+        document = {"file_path": "/test/statement.pdf", "file_name": "statement.pdf",
+                    "category": "financial", "file_hash": "h1", "content": "January balance"}
+        analyzer.index_documents([document])
+        old_ids = analyzer.vector_store.add_documents.call_args.kwargs["ids"]
+
+        analyzer.index_documents([{**document, "file_hash": "h2", "content": "February balance"}])
+        new_ids = analyzer.vector_store.add_documents.call_args.kwargs["ids"]
+
+        assert new_ids != old_ids
+        analyzer.vector_store.delete.assert_called_with(ids=old_ids)
+
+    def test_prune_removes_documents_missing_from_corpus(self, analyzer):
+        """Test that pruning deletes chunks of files no longer in the corpus"""
+        documents = [
+            {"file_path": f"/test/{name}", "file_name": name, "category": "financial",
+             "file_hash": name, "content": f"Statement {name}"}
+            for name in ["a.pdf", "b.pdf"]
+        ]
+        analyzer.index_documents(documents)
+        ids_b = analyzer.vector_store.add_documents.call_args.kwargs["ids"][1:]
+        analyzer.vector_store.reset_mock()
+
+        analyzer.index_documents(documents[:1], prune=True)
+
+        analyzer.vector_store.add_documents.assert_not_called()
+        analyzer.vector_store.delete.assert_called_once_with(ids=ids_b)
+        assert analyzer.index_manifest.get("/test/b.pdf") is None
+
+    def test_identical_files_share_chunks(self, analyzer):
+        """Test that a copy at another path is not embedded and keeps the chunks alive"""
+        original = {"file_path": "/test/a.pdf", "file_name": "a.pdf", "category": "financial",
+                    "file_hash": "h1", "content": "Closing balance"}
+        analyzer.index_documents([original])
+        analyzer.vector_store.reset_mock()
+
+        analyzer.index_documents([{**original, "file_path": "/test/copy.pdf"}])
+        analyzer.remove_documents(["/test/a.pdf"])
+
+        analyzer.vector_store.add_documents.assert_not_called()
+        analyzer.vector_store.delete.assert_not_called()
+
+    def test_renamed_file_keeps_its_chunks(self, analyzer):
+        """Test that a file moved to a new path keeps its chunks, now pointing at the new path"""
+        original = {"file_path": "/test/old/a.pdf", "file_name": "a.pdf", "category": "financial",
+                    "file_hash": "h1", "content": "Closing balance"}
+        analyzer.index_documents([original])
+        ids = analyzer.vector_store.add_documents.call_args.kwargs["ids"]
+        analyzer.vector_store.reset_mock()
+        analyzer.vector_store.get.return_value = {
+            "ids": ids,
+            "documents": ["Closing balance"],
+            "metadatas": [{"file_path": "/test/old/a.pdf", "file_name": "a.pdf", "chunk_index": 0}]
+        }
+
+        moved = {**original, "file_path": "/test/new/b.pdf", "file_name": "b.pdf"}
+        analyzer.index_documents([moved], prune=True)
+
+        analyzer.vector_store.add_documents.assert_not_called()
+        analyzer.vector_store.delete.assert_not_called()
+        assert analyzer.index_manifest.get("/test/old/a.pdf") is None
+        assert analyzer.index_manifest.get("/test/new/b.pdf").ids == ids
+        update = analyzer.vector_store.update_documents.call_args.kwargs
+        assert update["ids"] == ids
+        assert update["documents"][0].metadata == {
+            "file_path": "/test/new/b.pdf", "file_name": "b.pdf", "chunk_index": 0
+        }
+
+        # Indexing again finds it unchanged; deleting it then removes the chunks
+        analyzer.vector_store.reset_mock()
+        analyzer.index_documents([moved], prune=True)
+        analyzer.vector_store.add_documents.assert_not_called()
+        analyzer.remove_documents(["/test/new/b.pdf"])
+        analyzer.vector_store.delete.assert_called_once_with(ids=ids)
+
+    def test_removed_original_repoints_shared_chunks(self, analyzer):
+        """Test that removing the path a shared chunk names moves it to the remaining copy"""
+        original = {"file_path": "/test/a.pdf", "file_name": "a.pdf", "category": "financial",
+                    "file_hash": "h1", "content": "Closing balance"}
+        analyzer.index_documents([original, {**original, "file_path": "/test/copy.pdf"}])
+        ids = analyzer.vector_store.add_documents.call_args.kwargs["ids"]
+        analyzer.vector_store.get.return_value = {
+            "ids": ids, "documents": ["Closing balance"],
+            "metadatas": [{"file_path": "/test/a.pdf", "file_name": "a.pdf"}]
+        }
+
+        analyzer.remove_documents(["/test/a.pdf"])
+
+        update = analyzer.vector_store.update_documents.call_args.kwargs
+        assert update["documents"][0].metadata["file_path"] == "/test/copy.pdf"
+        assert update["documents"][0].metadata["file_name"] == "copy.pdf"
+
+    def test_remove_documents(self, analyzer):
+        """Test removing indexed chunks for specific files"""
+        analyzer.remove_documents(["/test/doc1.pdf", "/test/doc2.txt"])
+
+        analyzer.vector_store.delete.assert_called_once_with(
+            where={"file_path": {"$in": ["/test/doc1.pdf", "/test/doc2.txt"]}}
+        )
+
+    def test_remove_documents_empty(self, analyzer):
+        """Test that removing nothing does not touch the vector store"""
+        analyzer.remove_documents([])
+        analyzer.vector_store.delete.assert_not_called()
+
     def test_search_documents(self, analyzer):
         """Test document searching"""
         mock_docs = [Mock(), Mock()]
@@ -365,6 +525,15 @@ class TestClaudeAnalyzerIntegration:
 
             analyzer = ClaudeAnalyzer()
 
+            # Nothing heavy is built until it is used or warmed up
+            mock_embeddings.assert_not_called()
+            mock_chroma.assert_not_called()
+
+            analyzer.resources.warm_up()
+            analyzer.client
+            analyzer.chat_model
+            analyzer.chat_model
+
             # Verify all components were initialized
             mock_anthropic.assert_called_once()
             mock_chat.assert_called_once()
@@ -377,6 +546,27 @@ class TestClaudeAnalyzerIntegration:
             assert chat_call_args['temperature'] == 0.0
             assert chat_call_args['max_tokens'] == 4096
 
+    def test_analyzers_share_resources(self, mock_env_vars, temp_dir):
+        """Test that analyzers on one registry load the model and vector store once"""
+        with patch('claude_integration.VECTOR_DB_PATH', temp_dir / 'chroma_db'), \
+             patch('claude_integration.Anthropic') as mock_anthropic, \
+             patch('claude_integration.ChatAnthropic'), \
+             patch('claude_integration.HuggingFaceEmbeddings') as mock_embeddings, \
+             patch('claude_integration.Chroma') as mock_chroma:
+
+            resources = create_resources()
+            first = ClaudeAnalyzer("key-a", resources=resources)
+            second = ClaudeAnalyzer("key-b", resources=resources)
+
+            assert first.vector_store is second.vector_store
+            assert first.embeddings is second.embeddings
+            first.client, second.client, first.client
+            mock_embeddings.assert_called_once()
+            mock_chroma.assert_called_once()
+            # One client per API key
+            assert [c.kwargs["api_key"] for c in mock_anthropic.call_args_list] == ["key-a", "key-b"]
+            assert "vector_store" in resources.status()["loaded"]
+
     @pytest.mark.asyncio
     async def test_full_analysis_workflow(self, mock_env_vars):
         """Test complete analysis workflow"""
@@ -0,0 +1,152 @@
+import pytest
+import time
+
+from document_cache import DocumentCache
+
+
+class TestDocumentCache:
+
+    @pytest.fixture
+    def cache(self, temp_dir):
+        return DocumentCache(temp_dir / 'cache', max_bytes=0)
+
+    @pytest.fixture
+    def document(self):
+        return {
+            'file_path': '/test/statement.pdf',
+            'file_name': 'statement.pdf',
+            'category': 'bank_statements',
+            'file_size': 2048,
+            'content': 'USAA checking statement ' * 200
+        }
+
+    def test_round_trip(self, cache, document):
+        """Test storing and loading a full document"""
+        cache.put('ab' * 16, document)
+
+        assert cache.get('ab' * 16) == document
+
+    def test_metadata_stored_without_content(self, cache, document):
+        """Test that metadata loads without the document text"""
+        cache.put('ab' * 16, document)
+
+        metadata = cache.get_metadata('ab' * 16)
+
+        assert 'content' not in metadata
+        assert metadata['file_name'] == 'statement.pdf'
+        assert cache.get_content('ab' * 16) == document['content']
+
+    def test_streamed_content(self, cache, document):
+        """Test writing content incrementally and registering it afterwards"""
+        with cache.content_writer('ab' * 16) as writer:
+            for _ in range(200):
+                writer.write('USAA checking statement ')
+
+        assert writer.chars == len(document['content'])
+        cache.put_metadata('ab' * 16, {k: v for k, v in document.items() if k != 'content'})
+
+        assert cache.get('ab' * 16) == document
+        assert cache.total_size() > 0
+
+    def test_streamed_content_aborts_on_error(self, cache):
+        """Test that a failed stream leaves no content record behind"""
+        with pytest.raises(RuntimeError):
+            with cache.content_writer('ab' * 16) as writer:
+                writer.write('partial')
+                raise RuntimeError('extraction failed')
+
+        assert cache.get_content('ab' * 16) is None
+        assert not list(cache.content_path('ab' * 16).parent.glob('*.tmp'))
+
+    def test_sharded_layout(self, cache, document):
+        """Test that records are spread across hash-prefix directories"""
+        file_hash = '0123456789abcdef' * 2
+        cache.put(file_hash, document)
+
+        assert cache.meta_path(file_hash).relative_to(cache.root).parts[:3] == ('meta', '01', '23')
+        assert cache.content_path(file_hash).exists()
+
+    def test_iter_metadata(self, cache, document):
+        """Test listing every cached metadata record"""
+        cache.put('aa' * 16, document)
+        cache.put('bb' * 16, {**document, 'file_name': 'other.pdf'})
+
+        names = sorted(m['file_name'] for m in cache.iter_metadata())
+
+        assert names == ['other.pdf', 'statement.pdf']
+
+    def test_missing_entry(self, cache):
+        """Test that unknown hashes return None"""
+        assert cache.get('cd' * 16) is None
+
+    def test_lru_eviction(self, temp_dir, document):
+        """Test that the least recently used documents are evicted over the cap"""
+        cache = DocumentCache(temp_dir / 'cache', max_bytes=10 ** 9)
+        for name in ['aa', 'bb', 'cc']:
+            cache.put(name * 16, {**document, 'content': f'{name} ' * 5000})
+            time.sleep(0.01)
+
+        # Touch the oldest entry so it becomes most recently used
+        cache.get_metadata('aa' * 16)
+        per_entry = cache.total_size() // 3
+        cache.max_bytes = per_entry * 2 + per_entry // 2
+        cache.evict()
+
+        assert cache.get('bb' * 16) is None
+        assert cache.get('aa' * 16) is not None
+        assert cache.get('cc' * 16) is not None
+
+    def test_pages_round_trip_and_removal(self, cache, document):
+        """Test that cached pages are stored per page and removed with the document"""
+        file_hash = 'ef' * 16
+        cache.put_page_count(file_hash, 2)
+        cache.put_page(file_hash, 1, "Second page")
+        cache.put_page(file_hash, 0, "First page")
+        cache.put(file_hash, document)
+
+        assert cache.get_page_count(file_hash) == 2
+        assert cache.get_pages(file_hash) == {0: "First page", 1: "Second page"}
+        assert cache.total_size() > 0
+
+        cache.remove(file_hash)
+
+        assert cache.get_pages(file_hash) == {}
+        assert cache.get_page_count(file_hash) is None
+        assert cache.total_size() == 0
+
+    def test_overwritten_extra_counted_once(self, cache):
+        """Test that rewriting an auxiliary record replaces its size instead of adding to it"""
+        file_hash = 'ab' * 16
+        cache.put_extra(file_hash, "minhash", b"x" * 1000)
+        size = cache.total_size()
+
+        for _ in range(5):
+            cache.put_extra(file_hash, "minhash", b"x" * 1000)
+
+        assert cache.total_size() == size
+
+    def test_extras_trigger_eviction(self, temp_dir, document):
+        """Test that auxiliary records alone can push older documents out"""
+        cache = DocumentCache(temp_dir / 'cache', max_bytes=10 ** 9)
+        cache.put('aa' * 16, {**document, 'content': 'aa ' * 5000})
+        cache.max_bytes = cache.total_size() + 100
+        time.sleep(0.01)
+
+        cache.put_extra('bb' * 16, "pages", bytes(range(256)) * 64)
+
+        assert cache.get('aa' * 16) is None
+        assert cache.total_size() <= cache.max_bytes
+
+    def test_reads_do_not_write_index_until_flushed(self, cache, document):
+        """Test that access-time updates are buffered rather than written per read"""
+        file_hash = 'cd' * 16
+        cache.put(file_hash, document)
+        conn = cache._connect()
+        before = conn.execute("SELECT last_access FROM entries").fetchone()[0]
+
+        for _ in range(10):
+            cache.get_metadata(file_hash)
+
+        assert conn.execute("SELECT last_access FROM entries").fetchone()[0] == before
+        cache.flush_touches()
+        assert conn.execute("SELECT last_access FROM entries").fetchone()[0] > before
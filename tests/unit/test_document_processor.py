@@ -1,22 +1,29 @@
 import pytest
 import tempfile
 import json
+import time
 from pathlib import Path
 from unittest.mock import Mock, patch, mock_open, MagicMock
 import pandas as pd
+import openpyxl
 from datetime import datetime
 
 from document_processor import DocumentProcessor
+from document_record import DocumentRecord
+import mbox_reader
 
 
 class TestDocumentProcessor:
 
     @pytest.fixture
     def processor(self, temp_dir):
-        """Create DocumentProcessor instance with temporary cache directory"""
+        """Create DocumentProcessor instance with temporary cache directory
+
+        The patch stays active so forked scan workers use the same cache.
+        """
         with patch('document_processor.CACHE_DIR', temp_dir / 'cache'):
             processor = DocumentProcessor()
-            return processor
+            yield processor
 
     @pytest.fixture
     def sample_file(self, temp_dir):
@@ -55,13 +62,45 @@ class TestDocumentProcessor:
 
         assert hash1 != hash2
 
+    def test_get_content_hash_uses_manifest(self, processor, sample_file):
+        """Test that an unchanged file resolves its hash without rereading"""
+        expected = processor.get_file_hash(sample_file)
+        assert processor.get_content_hash(sample_file) == expected
+
+        with patch.object(processor, 'get_file_hash') as mock_hash:
+            assert processor.get_content_hash(sample_file) == expected
+            mock_hash.assert_not_called()
+
+    def test_get_content_hash_rehashes_changed_file(self, processor, sample_file):
+        """Test that a size or mtime change forces a rehash"""
+        original = processor.get_content_hash(sample_file)
+
+        sample_file.write_text("Different content that changes the size")
+
+        assert processor.get_content_hash(sample_file) != original
+        assert processor.get_content_hash(sample_file) == processor.get_file_hash(sample_file)
+
+    def test_manifest_forget_reports_hash_and_references(self, processor, sample_file, temp_dir):
+        """Test that forgetting a path returns its hash and other paths keep it referenced"""
+        copy = temp_dir / "copy.txt"
+        copy.write_text(sample_file.read_text())
+        expected = processor.get_content_hash(sample_file)
+        processor.get_content_hash(copy)
+
+        assert processor.manifest.forget(sample_file) == expected
+        assert processor.manifest.references(expected)
+        assert processor.manifest.forget(copy) == expected
+        assert not processor.manifest.references(expected)
+        assert processor.manifest.forget(copy) is None
+
     def test_get_cache_path(self, processor, sample_file):
         """Test cache path generation"""
         cache_path = processor.get_cache_path(sample_file)
+        file_hash = processor.get_file_hash(sample_file)
 
-        assert cache_path.parent == processor.cache_dir
-        assert cache_path.suffix == '.json'
-        assert len(cache_path.stem) == 32  # MD5 hash length
+        assert processor.cache_dir in cache_path.parents
+        assert cache_path.name == f"{file_hash}.mpk.zst"
+        assert cache_path.parent.name == file_hash[2:4]  # Sharded by hash prefix
 
     def test_save_and_load_cache(self, processor, sample_file):
         """Test saving and loading cache data"""
@@ -85,12 +124,12 @@ class TestDocumentProcessor:
         assert result is None
 
     @patch('document_processor.logger')
-    def test_load_from_cache_invalid_json(self, mock_logger, processor, sample_file):
-        """Test loading from cache with invalid JSON"""
-        # Create invalid JSON cache file
+    def test_load_from_cache_corrupt_record(self, mock_logger, processor, sample_file):
+        """Test loading from cache with a corrupt record"""
+        # Create corrupt cache file
         cache_path = processor.get_cache_path(sample_file)
         cache_path.parent.mkdir(parents=True, exist_ok=True)
-        cache_path.write_text("invalid json content")
+        cache_path.write_text("not a zstd frame")
 
         result = processor.load_from_cache(sample_file)
 
@@ -140,55 +179,143 @@ class TestDocumentProcessor:
         mock_reader.pages = [mock_page]
         mock_pypdf2.return_value = mock_reader
 
-        with patch('builtins.open', mock_open(read_data=b"pdf content")):
-            result = processor.extract_text_from_pdf(pdf_file)
+        result = processor.extract_text_from_pdf(pdf_file)
 
         assert result == "PyPDF2 content"
         mock_logger.warning.assert_called_once()
 
-    @patch('pandas.read_excel')
-    def test_extract_text_from_excel_success(self, mock_read_excel, processor, temp_dir):
+    @patch('pdfplumber.open')
+    @patch('pypdf2.PdfReader')
+    def test_extract_pdf_pages_falls_back_per_page(self, mock_pypdf2, mock_pdfplumber, processor, temp_dir):
+        """Test that PyPDF2 is only used for the pages pdfplumber failed on"""
+        pdf_file = temp_dir / "statement.pdf"
+        pdf_file.write_bytes(b"%PDF-1.4 statement")
+
+        good_page = Mock()
+        good_page.extract_text.return_value = "Page 1 content"
+        bad_page = Mock()
+        bad_page.extract_text.side_effect = Exception("malformed content stream")
+        mock_pdf = Mock()
+        mock_pdf.pages = [good_page, bad_page]
+        mock_pdfplumber.return_value.__enter__.return_value = mock_pdf
+
+        reader_pages = [Mock(), Mock()]
+        reader_pages[1].extract_text.return_value = "Page 2 via PyPDF2"
+        mock_pypdf2.return_value = Mock(pages=reader_pages)
+
+        pages = processor.extract_pdf_pages(pdf_file)
+
+        assert pages == ["Page 1 content", "Page 2 via PyPDF2"]
+        reader_pages[0].extract_text.assert_not_called()
+
+    @patch('pdfplumber.open')
+    def test_extract_pdf_pages_uses_page_cache(self, mock_pdfplumber, processor, temp_dir):
+        """Test that a completed extraction is served from the page cache"""
+        pdf_file = temp_dir / "statement.pdf"
+        pdf_file.write_bytes(b"%PDF-1.4 statement")
+
+        pages = [Mock(), Mock()]
+        pages[0].extract_text.return_value = "First page"
+        pages[1].extract_text.return_value = "Second page"
+        mock_pdfplumber.return_value.__enter__.return_value = Mock(pages=pages)
+
+        first = processor.extract_pdf_pages(pdf_file)
+        second = processor.extract_pdf_pages(pdf_file)
+
+        assert first == second == ["First page", "Second page"]
+        mock_pdfplumber.assert_called_once()
+
+    @patch('pdfplumber.open')
+    def test_extract_pdf_pages_resumes_after_interruption(self, mock_pdfplumber, processor, temp_dir):
+        """Test that a rerun only extracts pages missing from the cache"""
+        pdf_file = temp_dir / "statement.pdf"
+        pdf_file.write_bytes(b"%PDF-1.4 statement")
+        file_hash = processor.get_content_hash(pdf_file)
+
+        # Simulate a run that stopped after the first page
+        processor.cache.put_page_count(file_hash, 2)
+        processor.cache.put_page(file_hash, 0, "First page")
+
+        pages = [Mock(), Mock()]
+        pages[1].extract_text.return_value = "Second page"
+        mock_pdfplumber.return_value.__enter__.return_value = Mock(pages=pages)
+
+        assert processor.extract_pdf_pages(pdf_file) == ["First page", "Second page"]
+        pages[0].extract_text.assert_not_called()
+
+    def test_join_pages_offsets(self, processor):
+        """Test that page offsets index into the joined text"""
+        text, offsets = processor._join_pages(["Page one", "", "Page three"])
+
+        assert text == "Page one\nPage three"
+        for entry, expected in zip(offsets, ["Page one", "", "Page three"]):
+            assert text[entry["start"]:entry["end"]] == expected
+        assert [entry["page"] for entry in offsets] == [1, 2, 3]
+
+    def test_extract_text_from_excel_success(self, processor, temp_dir):
         """Test successful Excel text extraction"""
         excel_file = temp_dir / "test.xlsx"
-        excel_file.touch()
-
-        # Mock pandas read_excel
-        mock_df = pd.DataFrame({'A': [1, 2], 'B': [3, 4]})
-        mock_read_excel.return_value = {'Sheet1': mock_df}
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Sheet1"
+        sheet.append(["A", "B"])
+        sheet.append([1, 3])
+        sheet.append([2, 4])
+        workbook.save(excel_file)
 
         result = processor.extract_text_from_excel(excel_file)
 
         assert "Sheet: Sheet1" in result
         assert "1" in result and "2" in result and "3" in result and "4" in result
-        mock_read_excel.assert_called_once_with(excel_file, sheet_name=None)
 
-    @patch('pandas.read_excel')
+    @patch('openpyxl.load_workbook')
     @patch('document_processor.logger')
-    def test_extract_text_from_excel_error(self, mock_logger, mock_read_excel, processor, temp_dir):
+    def test_extract_text_from_excel_error(self, mock_logger, mock_load_workbook, processor, temp_dir):
         """Test Excel text extraction error handling"""
         excel_file = temp_dir / "test.xlsx"
         excel_file.touch()
 
-        mock_read_excel.side_effect = Exception("Excel read error")
+        mock_load_workbook.side_effect = Exception("Excel read error")
 
         result = processor.extract_text_from_excel(excel_file)
 
         assert result == ""
         mock_logger.error.assert_called_once()
 
-    @patch('pandas.read_csv')
-    def test_extract_text_from_csv_success(self, mock_read_csv, processor, temp_dir):
+    def test_ingest_excel_streams_sheets_to_store(self, processor, temp_dir):
+        """Test that every sheet's rows land in the transaction store"""
+        excel_file = temp_dir / "ledger.xlsx"
+        workbook = openpyxl.Workbook()
+        checking = workbook.active
+        checking.title = "Checking"
+        checking.append(["Date", "Amount"])
+        checking.append(["2024-01-15", 1500.0])
+        savings = workbook.create_sheet("Savings")
+        savings.append(["Date", "Amount", "Memo"])
+        savings.append(["2024-01-16", -250, None])
+        savings.append(["2024-01-17", 75.5, "Fee"])
+        workbook.save(excel_file)
+        file_hash = processor.get_content_hash(excel_file)
+
+        with patch('document_processor.TABULAR_CHUNK_ROWS', 1):
+            text, tables = processor.ingest_excel(excel_file)
+
+        assert [(t['sheet'], t['rows']) for t in tables] == [('Checking', 1), ('Savings', 2)]
+        savings_rows = processor.transactions.read(file_hash, sheet_index=1).to_pylist()
+        assert savings_rows == [
+            {'Date': '2024-01-16', 'Amount': '-250', 'Memo': ''},
+            {'Date': '2024-01-17', 'Amount': '75.5', 'Memo': 'Fee'},
+        ]
+        assert "Sheet: Savings" in text
+
+    def test_extract_text_from_csv_success(self, processor, temp_dir):
         """Test successful CSV text extraction"""
         csv_file = temp_dir / "test.csv"
-        csv_file.touch()
-
-        mock_df = pd.DataFrame({'A': [1, 2], 'B': [3, 4]})
-        mock_read_csv.return_value = mock_df
+        csv_file.write_text("A,B\n1,3\n2,4\n")
 
         result = processor.extract_text_from_csv(csv_file)
 
         assert "1" in result and "2" in result and "3" in result and "4" in result
-        mock_read_csv.assert_called_once_with(csv_file)
 
     @patch('pandas.read_csv')
     @patch('document_processor.logger')
@@ -204,6 +331,24 @@ class TestDocumentProcessor:
         assert result == ""
         mock_logger.error.assert_called_once()
 
+    def test_ingest_csv_chunks_and_bounds_text(self, processor, temp_dir):
+        """Test that CSV rows are written in chunks while the text rendering stays bounded"""
+        csv_file = temp_dir / "transactions.csv"
+        rows = "\n".join(f"2024-01-{i % 28 + 1:02d},{i}.00,Transfer {i}" for i in range(1000))
+        csv_file.write_text("Date,Amount,Description\n" + rows + "\n")
+        file_hash = processor.get_content_hash(csv_file)
+
+        with patch('document_processor.TABULAR_CHUNK_ROWS', 100), \
+             patch('document_processor.TABULAR_TEXT_MAX_CHARS', 10000):
+            text, tables = processor.ingest_csv(csv_file)
+
+        assert tables[0]['rows'] == 1000
+        assert tables[0]['columns'] == ['Date', 'Amount', 'Description']
+        assert len(text) < 10500
+        assert "rows not rendered" in text
+        amounts = processor.transactions.read(file_hash, columns=['Amount']).column('Amount').to_pylist()
+        assert amounts[999] == '999.00'
+
     @patch('chardet.detect')
     def test_extract_text_from_txt_success(self, mock_detect, processor, temp_dir):
         """Test successful text file extraction"""
@@ -222,7 +367,7 @@ class TestDocumentProcessor:
     def test_extract_text_from_txt_error(self, mock_logger, mock_detect, processor, temp_dir):
         """Test text file extraction error handling"""
         txt_file = temp_dir / "test.txt"
-        txt_file.touch()
+        txt_file.write_bytes("Caf\u00e9 receipt".encode('latin-1'))
 
         mock_detect.side_effect = Exception("Encoding detection error")
 
@@ -231,23 +376,107 @@ class TestDocumentProcessor:
         assert result == ""
         mock_logger.error.assert_called_once()
 
-    @patch('document_processor.BASE_DIR')
-    def test_process_document_pdf(self, mock_base_dir, processor, temp_dir):
-        """Test processing a PDF document"""
-        mock_base_dir.__truediv__ = lambda self, other: temp_dir / other
-        mock_base_dir.__str__ = lambda self: str(temp_dir)
+    def test_extract_text_from_txt_non_utf8(self, processor, temp_dir):
+        """Test decoding a file chardet has to detect, with newline translation"""
+        txt_file = temp_dir / "test.txt"
+        content = "Wire transfer to Soci\u00e9t\u00e9 G\u00e9n\u00e9rale\r\n" * 50
+        txt_file.write_bytes(content.encode('cp1252'))
+
+        with patch('chardet.detect', return_value={'encoding': 'windows-1252', 'confidence': 0.9}) as mock_detect:
+            result = processor.extract_text_from_txt(txt_file)
+
+        assert result == content.replace("\r\n", "\n")
+        mock_detect.assert_called_once()
+
+    def test_extract_text_from_txt_bounded_sample(self, processor, temp_dir):
+        """Test detection reads only a sample and the encoding is cached per hash"""
+        txt_file = temp_dir / "test.txt"
+        line = "D\u00e9p\u00f4t 120,00\n"
+        txt_file.write_bytes((line * 20000).encode('latin-1'))
+
+        with patch('chardet.detect', return_value={'encoding': 'iso-8859-1', 'confidence': 0.95}) as mock_detect:
+            result = processor.extract_text_from_txt(txt_file)
+            assert result == line * 20000
+            assert len(mock_detect.call_args.args[0]) == 64 * 1024
+
+            mock_detect.reset_mock()
+            assert processor.extract_text_from_txt(txt_file) == line * 20000
+            mock_detect.assert_not_called()
+
+    def test_extract_text_from_txt_bom(self, processor, temp_dir):
+        """Test byte order marks decide the encoding without chardet"""
+        txt_file = temp_dir / "test.txt"
+        txt_file.write_bytes("Balance due".encode('utf-16'))
+
+        with patch('chardet.detect') as mock_detect:
+            assert processor.extract_text_from_txt(txt_file) == "Balance due"
+        mock_detect.assert_not_called()
+
+    def test_extract_text_from_image_caches_by_hash(self, processor, temp_dir):
+        """Test image OCR runs once per content hash"""
+        image_file = temp_dir / "receipt.png"
+        image_file.write_bytes(b"png bytes")
+
+        with patch('document_processor.ocr_job', return_value="Wire confirmation") as mock_ocr:
+            assert processor.extract_text_from_image(image_file) == "Wire confirmation"
+            assert processor.extract_text_from_image(image_file) == "Wire confirmation"
+
+        mock_ocr.assert_called_once()
+
+    def test_ocr_image_batch_fills_cache(self, processor, temp_dir):
+        """Test batched OCR stores each image's text for later extraction"""
+        images = []
+        for i in range(3):
+            path = temp_dir / f"scan{i}.jpg"
+            path.write_bytes(f"jpeg {i}".encode())
+            images.append(path)
+
+        with patch('document_processor.ocr_images',
+                   side_effect=lambda jobs: iter([f"text of {p.name}" for p, _ in jobs])) as mock_batch:
+            processor.ocr_image_batch(images)
+            processor.ocr_image_batch(images)
+
+        mock_batch.assert_called_once()
+        with patch('document_processor.ocr_job') as mock_ocr:
+            assert processor.extract_text_from_image(images[1]) == "text of scan1.jpg"
+        mock_ocr.assert_not_called()
+
+    def test_extract_pdf_pages_ocrs_pages_without_text(self, processor, temp_dir):
+        """Test that only pages with an empty text layer are OCRed, once"""
+        pdf_file = temp_dir / "scanned.pdf"
+        pdf_file.write_text("dummy pdf content")
 
+        pages = [Mock(), Mock()]
+        pages[0].extract_text.return_value = "Typed page"
+        pages[1].extract_text.return_value = ""
+        mock_pdf = MagicMock()
+        mock_pdf.__enter__.return_value.pages = pages
+
+        with patch('document_processor.pdfplumber.open', return_value=mock_pdf), \
+             patch('document_processor.ocr_images',
+                   side_effect=lambda jobs: iter(["Scanned page" for _ in jobs])) as mock_ocr:
+            assert processor.extract_pdf_pages(pdf_file) == ["Typed page", "Scanned page"]
+            assert processor.extract_pdf_pages(pdf_file) == ["Typed page", "Scanned page"]
+
+        mock_ocr.assert_called_once()
+        pages[0].to_image.assert_not_called()
+        pages[1].to_image.assert_called_once()
+
+    def test_process_document_pdf(self, processor, temp_dir):
+        """Test processing a PDF document"""
         pdf_file = temp_dir / "test.pdf"
         pdf_file.write_text("dummy pdf content")
 
-        with patch.object(processor, 'extract_text_from_pdf', return_value="PDF content"):
-            with patch.object(processor, '_determine_category', return_value="financial"):
-                result = processor.process_document(pdf_file)
+        with patch('document_processor.BASE_DIR', temp_dir):
+            with patch.object(processor, 'extract_pdf_pages', return_value=["PDF content"]):
+                with patch.object(processor, '_determine_category', return_value="financial"):
+                    result = processor.process_document(pdf_file)
 
         assert result['file_name'] == 'test.pdf'
         assert result['file_type'] == '.pdf'
         assert result['content'] == 'PDF content'
         assert result['category'] == 'financial'
+        assert result['page_offsets'] == [{'page': 1, 'start': 0, 'end': 11}]
         assert 'modified_time' in result
         assert 'file_size' in result
 
@@ -274,20 +503,14 @@ class TestDocumentProcessor:
         assert processor._determine_category(Path('contracts/service.pdf')) == 'legal'
         assert processor._determine_category(Path('random/file.txt')) == 'other'
 
-    @patch('document_processor.SUPPORTED_FILE_TYPES', ['.txt', '.pdf'])
-    @patch('document_processor.BASE_DIR')
-    def test_scan_documents(self, mock_base_dir, processor, temp_dir):
+    def test_scan_documents(self, processor, temp_dir):
         """Test scanning multiple documents"""
-        mock_base_dir.rglob = lambda pattern: [
-            temp_dir / 'file1.txt',
-            temp_dir / 'file2.pdf',
-            temp_dir / '.hidden.txt'  # Should be skipped
-        ]
-
         # Create test files
         (temp_dir / 'file1.txt').write_text("content1")
         (temp_dir / 'file2.pdf').write_text("content2")
-        (temp_dir / '.hidden.txt').write_text("hidden")
+        (temp_dir / '.hidden.txt').write_text("hidden")  # Should be skipped
+        (temp_dir / 'flow_analyzer').mkdir()
+        (temp_dir / 'flow_analyzer' / 'own.txt').write_text("skipped")
 
         with patch.object(processor, 'process_document') as mock_process:
             mock_process.side_effect = [
@@ -295,7 +518,7 @@ class TestDocumentProcessor:
                 {'file_name': 'file2.pdf'}
             ]
 
-            result = processor.scan_documents()
+            result = processor.scan_documents(temp_dir)
 
         assert len(result) == 2
         assert mock_process.call_count == 2
@@ -303,18 +526,282 @@ class TestDocumentProcessor:
     @patch('document_processor.logger')
     def test_scan_documents_error_handling(self, mock_logger, processor, temp_dir):
         """Test error handling during document scanning"""
-        with patch('document_processor.SUPPORTED_FILE_TYPES', ['.txt']):
-            with patch('document_processor.BASE_DIR') as mock_base_dir:
-                mock_base_dir.rglob.return_value = [temp_dir / 'error.txt']
+        (temp_dir / 'error.txt').write_text("content")
 
-                (temp_dir / 'error.txt').write_text("content")
-
-                with patch.object(processor, 'process_document', side_effect=Exception("Process error")):
-                    result = processor.scan_documents()
+        with patch.object(processor, 'process_document', side_effect=Exception("Process error")):
+            result = processor.scan_documents(temp_dir)
 
         assert result == []
         mock_logger.error.assert_called_once()
 
+    def test_scan_documents_parallel_preserves_order(self, processor, temp_dir):
+        """Test that a pooled scan returns the same documents in the same order as a serial scan"""
+        for name in ['b.txt', 'a.txt', 'c.csv']:
+            (temp_dir / name).write_text(f"content of {name}")
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            serial = processor.scan_documents(temp_dir, workers=1)
+            parallel = processor.scan_documents(temp_dir, workers=2)
+
+        assert [d['file_name'] for d in parallel] == ['a.txt', 'b.txt', 'c.csv']
+        assert [d['file_name'] for d in serial] == [d['file_name'] for d in parallel]
+
+    def test_scan_documents_returns_lazy_records(self, processor, temp_dir):
+        """Test that scanned documents hold metadata and read content from the cache"""
+        (temp_dir / 'a.txt').write_text("statement text")
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            [record] = processor.scan_documents(temp_dir, workers=2)
+
+        assert isinstance(record, DocumentRecord)
+        assert record['content_length'] == len("statement text")
+        with patch.object(processor, 'process_document') as mock_process:
+            assert record['content'] == "statement text"
+            mock_process.assert_not_called()
+
+    def test_load_content_reextracts_evicted_document(self, processor, temp_dir):
+        """Test that content evicted from the cache is extracted again"""
+        (temp_dir / 'a.txt').write_text("statement text")
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            [record] = processor.scan_documents(temp_dir)
+            processor.cache.remove(record['file_hash'])
+
+            assert record['content'] == "statement text"
+
+    def test_process_document_streams_large_text_file(self, processor, temp_dir):
+        """Test that large text files are written to the cache in chunks"""
+        txt_file = temp_dir / "ledger.txt"
+        content = "2023-12-31 brokerage sweep 1,204.55\n" * 2000
+        txt_file.write_text(content, encoding='utf-8')
+
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch('document_processor.LARGE_FILE_BYTES', 1024), \
+             patch('document_processor.DECODE_CHUNK_BYTES', 4096):
+            record = processor.process_document(txt_file)
+
+            assert isinstance(record, DocumentRecord)
+            assert record['content_length'] == len(content)
+            assert record['content'] == content
+
+            with patch.object(processor, '_iter_text') as mock_iter:
+                assert processor.process_document(txt_file)['file_hash'] == record['file_hash']
+            mock_iter.assert_not_called()
+
+    def test_process_document_streams_large_pdf_page_by_page(self, processor, temp_dir):
+        """Test that large PDFs are streamed one page at a time, releasing each page"""
+        pdf_file = temp_dir / "year_end.pdf"
+        pdf_file.write_text("dummy pdf content")
+
+        pages = [Mock(), Mock(), Mock()]
+        for page, text in zip(pages, ["First", "", "Third"]):
+            page.extract_text.return_value = text
+        mock_pdf = MagicMock()
+        mock_pdf.__enter__.return_value.pages = pages
+
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch('document_processor.LARGE_FILE_BYTES', 1), \
+             patch('document_processor.pdfplumber.open', return_value=mock_pdf), \
+             patch('document_processor.ocr_job', return_value="") as mock_ocr:
+            record = processor.process_document(pdf_file)
+
+        assert record['content'] == "First\nThird"
+        assert record['page_offsets'] == [
+            {'page': 1, 'start': 0, 'end': 5},
+            {'page': 2, 'start': 5, 'end': 5},
+            {'page': 3, 'start': 6, 'end': 11},
+        ]
+        assert all(page.close.called for page in pages)
+        mock_ocr.assert_called_once()
+
+    def test_process_isolated_runs_in_worker(self, processor, temp_dir):
+        """Test processing a file in a supervised worker process"""
+        txt_file = temp_dir / "big.txt"
+        txt_file.write_text("brokerage statement", encoding='utf-8')
+
+        # The forked worker builds its own processor on the same cache
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch('document_processor.CACHE_DIR', processor.cache_dir):
+            record = processor.process_isolated(txt_file)
+
+            assert record['file_name'] == 'big.txt'
+            assert record['content'] == "brokerage statement"
+
+    def _write_production_zip(self, path, members):
+        import io
+        import zipfile
+        inner = io.BytesIO()
+        with zipfile.ZipFile(inner, 'w') as archive:
+            archive.writestr('nested/wire.txt', "wire confirmation")
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+            archive.writestr('inner.zip', inner.getvalue())
+
+    def test_process_archive_expands_nested_members(self, processor, temp_dir):
+        """Test that supported members of nested archives are extracted in memory"""
+        archive = temp_dir / "production.zip"
+        self._write_production_zip(archive, {'statement.txt': "USAA statement", 'notes.bin': "skip"})
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            documents = processor.process_archive(archive)
+
+            assert [d['file_path'] for d in documents] == [
+                f"{archive}!/statement.txt",
+                f"{archive}!/inner.zip!/nested/wire.txt",
+            ]
+            assert documents[0]['relative_path'] == "production.zip!/statement.txt"
+            assert documents[1]['file_name'] == "wire.txt"
+            assert documents[1]['content'] == "wire confirmation"
+            assert not list(temp_dir.glob('**/wire.txt'))
+
+    def test_process_archive_unchanged_costs_nothing(self, processor, temp_dir):
+        """Test that rescanning an unchanged archive neither opens it nor extracts members"""
+        archive = temp_dir / "production.zip"
+        self._write_production_zip(archive, {'statement.txt': "USAA statement"})
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            first = processor.process_archive(archive)
+            with patch('document_processor.iter_members') as mock_iter:
+                second = processor.process_archive(archive)
+
+        mock_iter.assert_not_called()
+        assert [d['file_hash'] for d in second] == [d['file_hash'] for d in first]
+
+    def test_process_archive_resumes_from_member_cache(self, processor, temp_dir):
+        """Test that an interrupted expansion reuses members already extracted"""
+        archive = temp_dir / "production.zip"
+        self._write_production_zip(archive, {'statement.txt': "USAA statement", 'ledger.txt': "ledger"})
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            original = processor._extract_content
+            calls = []
+
+            def fail_after_first(*args):
+                calls.append(args)
+                if len(calls) > 1:
+                    raise KeyboardInterrupt
+                return original(*args)
+
+            with patch.object(processor, '_extract_content', side_effect=fail_after_first):
+                with pytest.raises(KeyboardInterrupt):
+                    processor.process_archive(archive)
+
+            with patch.object(processor, '_extract_content', wraps=original) as mock_extract:
+                documents = processor.process_archive(archive)
+
+        assert [d['file_name'] for d in documents] == ['statement.txt', 'ledger.txt', 'wire.txt']
+        assert mock_extract.call_count == 2
+
+    def test_load_content_reexpands_evicted_member(self, processor, temp_dir):
+        """Test that an evicted archive member's content is restored from its archive"""
+        archive = temp_dir / "production.zip"
+        self._write_production_zip(archive, {'statement.txt': "USAA statement"})
+
+        with patch('document_processor.BASE_DIR', temp_dir):
+            record = processor.process_archive(archive)[0]
+            processor.cache.remove(record['file_hash'])
+
+            assert record['content'] == "USAA statement"
+
+    def test_process_archive_depth_limit(self, processor, temp_dir):
+        """Test that archives nested beyond the limit are not expanded"""
+        archive = temp_dir / "production.zip"
+        self._write_production_zip(archive, {'statement.txt': "USAA statement"})
+
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch('document_processor.ARCHIVE_MAX_DEPTH', 0):
+            documents = processor.process_archive(archive)
+
+        assert [d['file_name'] for d in documents] == ['statement.txt']
+
+    def test_process_mbox_parses_only_appended_messages(self, processor, temp_dir):
+        """Test that each message becomes a document and re-scans parse only new ones"""
+        def message(number):
+            return (f"From a@example.com Mon Jan  1 00:00:00 2024\nFrom: a@example.com\n"
+                    f"Subject: Statement {number}\n\nBalance {number}\n\n").encode()
+
+        mbox = temp_dir / "inbox.mbox"
+        mbox.write_bytes(message(0) + message(1))
+
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch('document_processor.parse_ranges', wraps=mbox_reader.parse_ranges) as mock_parse:
+            documents = processor.process_mbox(mbox)
+
+            assert [d['email_metadata']['subject'] for d in documents] == ["Statement 0", "Statement 1"]
+            assert documents[1]['file_path'] == f"{mbox}!/message-000001.eml"
+            assert documents[1]['content'].strip() == "Balance 1"
+
+            with open(mbox, 'ab') as f:
+                f.write(message(2))
+            documents = processor.process_mbox(mbox)
+
+        assert len(documents) == 3
+        assert [len(c.args[1]) for c in mock_parse.call_args_list] == [2, 1]
+
+    def test_parse_email_extracts_shared_attachment_once(self, processor, temp_dir):
+        """Test that an attachment sent on several emails is extracted once and loadable"""
+        from email.message import EmailMessage
+
+        def write_email(name, subject):
+            msg = EmailMessage()
+            msg['From'] = 'bank@example.com'
+            msg['To'] = 'nick@chitty.cc'
+            msg['Subject'] = subject
+            msg.set_content("See attached")
+            msg.add_attachment(b"Closing balance 1,250.00", maintype='text',
+                               subtype='plain', filename='statement.txt')
+            path = temp_dir / name
+            path.write_bytes(msg.as_bytes())
+            return path
+
+        first = write_email("first.eml", "January")
+        second = write_email("second.eml", "Resent")
+
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch.object(processor, '_extract_content', wraps=processor._extract_content) as mock_extract:
+            parsed = processor.parse_email(first)
+            resent = processor.parse_email(second)
+
+            attachment = parsed['attachments'][0]
+            assert parsed['email_metadata']['subject'] == "January"
+            assert parsed['body'].strip() == "See attached"
+            assert attachment['file_name'] == 'statement.txt'
+            assert attachment['file_path'] == f"{first}!/statement.txt"
+            assert 'content' not in attachment
+            assert resent['attachments'][0]['file_hash'] == attachment['file_hash']
+            assert mock_extract.call_count == 1
+
+            processor.cache.remove(attachment['file_hash'])
+            assert processor.load_content(attachment) == "Closing balance 1,250.00"
+
+    @pytest.mark.slow
+    def test_scan_documents_quarantines_hung_file(self, processor, temp_dir):
+        """Test that a file exceeding its time budget is quarantined and skipped next scan"""
+        for name in ['a.txt', 'hang.txt', 'b.txt']:
+            (temp_dir / name).write_text(f"content of {name}")
+
+        original = DocumentProcessor.extract_text_from_txt
+
+        def extract(self, file_path, file_hash=None):
+            if file_path.name == 'hang.txt':
+                time.sleep(60)
+            return original(self, file_path, file_hash)
+
+        with patch('document_processor.BASE_DIR', temp_dir), \
+             patch('document_processor.EXTRACTION_TIMEOUT', 1), \
+             patch.object(DocumentProcessor, 'extract_text_from_txt', extract):
+            result = processor.scan_documents(temp_dir, workers=2)
+
+            assert [d['file_name'] for d in result] == ['a.txt', 'b.txt']
+            assert 'time budget' in processor.quarantine[str(temp_dir / 'hang.txt')]['reason']
+
+            with patch.object(processor, 'process_document') as mock_process:
+                mock_process.side_effect = lambda p: {'file_name': p.name}
+                processor.scan_documents(temp_dir)
+
+            assert [c.args[0].name for c in mock_process.call_args_list] == ['a.txt', 'b.txt']
+
 
 @pytest.mark.integration
 class TestDocumentProcessorIntegration:
@@ -322,9 +809,8 @@ class TestDocumentProcessorIntegration:
 
     def test_real_text_file_processing(self, temp_dir):
         """Test processing a real text file end-to-end"""
-        processor = DocumentProcessor()
-        processor.cache_dir = temp_dir / 'cache'
-        processor.cache_dir.mkdir()
+        with patch('document_processor.CACHE_DIR', temp_dir / 'cache'):
+            processor = DocumentProcessor()
 
         # Create a real text file
         text_file = temp_dir / 'sample.txt'
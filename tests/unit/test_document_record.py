@@ -0,0 +1,62 @@
+import pytest
+from unittest.mock import Mock
+
+from document_record import DocumentRecord
+
+
+class TestDocumentRecord:
+
+    @pytest.fixture
+    def document(self):
+        return {
+            'file_path': '/case/01_USAA_Statements/jan.pdf',
+            'relative_path': '01_USAA_Statements/jan.pdf',
+            'file_name': 'jan.pdf',
+            'file_type': '.pdf',
+            'file_size': 4096,
+            'file_hash': 'ab' * 16,
+            'modified_time': '2024-01-31T00:00:00',
+            'content': 'Statement text',
+            'content_length': 14,
+            'category': 'bank_statements',
+            'page_offsets': [{'page': 1, 'start': 0, 'end': 14}]
+        }
+
+    def test_content_is_loaded_on_demand(self, document):
+        """Test that the record does not keep content and asks the loader for it"""
+        loader = Mock(return_value='Statement text')
+        record = DocumentRecord.from_document(document, loader)
+
+        loader.assert_not_called()
+        assert record['content'] == 'Statement text'
+        assert record.get('content') == 'Statement text'
+        assert loader.call_count == 2
+        loader.assert_called_with(record)
+
+    def test_mapping_access_matches_dict(self, document):
+        """Test that metadata is readable like the original dict"""
+        record = DocumentRecord.from_document(document, Mock(return_value=document['content']))
+
+        assert record['file_name'] == 'jan.pdf'
+        assert record.get('category') == 'bank_statements'
+        assert record['page_offsets'] == document['page_offsets']
+        assert record.get('missing', 'default') == 'default'
+        assert dict(record) == document
+
+    def test_metadata_and_contains_skip_content(self, document):
+        """Test that metadata views and membership never load content"""
+        loader = Mock(return_value='Statement text')
+        record = DocumentRecord.from_document(document, loader)
+
+        metadata = record.metadata()
+
+        assert 'content' not in metadata
+        assert metadata['file_hash'] == 'ab' * 16
+        assert 'content' in record
+        loader.assert_not_called()
+
+    def test_slotted(self, document):
+        """Test that records carry no per-instance __dict__"""
+        record = DocumentRecord.from_document(document, Mock())
+
+        assert not hasattr(record, '__dict__')
@@ -0,0 +1,136 @@
+import pytest
+from unittest.mock import Mock
+
+from document_record import DocumentRecord
+from document_watcher import DocumentWatcher
+
+
+class TestDocumentWatcher:
+
+    @pytest.fixture
+    def processor(self):
+        processor = Mock()
+        processor.process_document.side_effect = lambda path: {
+            'file_path': str(path),
+            'file_name': path.name,
+            'file_hash': path.read_text()
+        }
+        return processor
+
+    @pytest.fixture
+    def analyzer(self):
+        return Mock()
+
+    @pytest.fixture
+    def watcher(self, processor, analyzer, temp_dir):
+        return DocumentWatcher(processor, analyzer, base_path=temp_dir, debounce=60)
+
+    def test_ignores_unsupported_and_hidden_paths(self, watcher, temp_dir):
+        """Test that only supported, visible files are queued"""
+        watcher.record(temp_dir / 'notes.docx')
+        watcher.record(temp_dir / '.git' / 'statement.pdf')
+        watcher.record(temp_dir / 'flow_analyzer' / 'statement.pdf')
+        watcher.record(temp_dir / 'statement.pdf')
+
+        assert list(watcher._pending) == [temp_dir / 'statement.pdf']
+
+    def test_flush_waits_for_debounce(self, watcher, temp_dir, processor):
+        """Test that events inside the debounce window are not processed yet"""
+        (temp_dir / 'statement.pdf').write_text("v1")
+        watcher.record(temp_dir / 'statement.pdf')
+
+        assert watcher.flush() == 0
+        processor.process_document.assert_not_called()
+
+    def test_burst_of_events_is_coalesced(self, watcher, temp_dir, processor, analyzer):
+        """Test that repeated events for one file cause a single extraction"""
+        path = temp_dir / '01_USAA_Statements' / 'statement.pdf'
+        path.parent.mkdir()
+        path.write_text("v1")
+        for _ in range(5):
+            watcher.record(path)
+
+        assert watcher.flush(force=True) == 1
+        processor.process_document.assert_called_once_with(path)
+        analyzer.remove_documents.assert_not_called()
+        analyzer.index_documents.assert_called_once()
+
+    def test_documents_hold_metadata_only(self, watcher, temp_dir, processor):
+        """Test that tracked documents are lean records reading content from the cache"""
+        path = temp_dir / 'statement.pdf'
+        path.write_text("v1")
+        processor.load_content.return_value = "Opening balance"
+        watcher.record(path)
+        watcher.flush(force=True)
+
+        doc = watcher.documents[str(path)]
+        assert isinstance(doc, DocumentRecord)
+        assert doc['file_hash'] == "v1"
+        assert doc['content'] == "Opening balance"
+        processor.load_content.assert_called_once_with(doc)
+
+    def test_unchanged_content_is_not_reindexed(self, watcher, temp_dir, analyzer):
+        """Test that a touch without a content change skips re-indexing"""
+        path = temp_dir / 'statement.pdf'
+        path.write_text("v1")
+        watcher.record(path)
+        watcher.flush(force=True)
+        analyzer.reset_mock()
+
+        watcher.record(path)
+
+        assert watcher.flush(force=True) == 0
+        analyzer.index_documents.assert_not_called()
+
+    def test_deleted_file_is_removed(self, watcher, temp_dir, analyzer, processor):
+        """Test that deleting a document removes it from the set and index"""
+        path = temp_dir / 'statement.pdf'
+        path.write_text("v1")
+        watcher.record(path)
+        watcher.flush(force=True)
+
+        path.unlink()
+        watcher.record(path)
+        watcher.flush(force=True)
+
+        assert str(path) not in watcher.documents
+        analyzer.remove_documents.assert_called_with([str(path)])
+        processor.manifest.forget.assert_called_once_with(path)
+
+    def test_file_indexed_before_start_is_removed(self, watcher, processor, analyzer, temp_dir):
+        """Test that deleting a file the watcher never loaded still removes its chunks and cache"""
+        path = temp_dir / 'statement.pdf'
+        processor.manifest.forget.return_value = "h1"
+        processor.manifest.references.return_value = False
+
+        watcher.record(path)
+
+        assert watcher.flush(force=True) == 1
+        analyzer.remove_documents.assert_called_once_with([str(path)])
+        processor.manifest.forget.assert_called_once_with(path)
+        processor.cache.remove.assert_called_once_with("h1")
+
+    def test_shared_content_stays_cached(self, watcher, processor, temp_dir):
+        """Test that a deleted file's extraction is kept while another file has the same content"""
+        processor.manifest.forget.return_value = "h1"
+        processor.manifest.references.return_value = True
+
+        watcher.record(temp_dir / 'copy.pdf')
+        watcher.flush(force=True)
+
+        processor.manifest.references.assert_called_once_with("h1")
+        processor.cache.remove.assert_not_called()
+
+    def test_on_update_callback(self, processor, temp_dir):
+        """Test that listeners receive changed documents and removed paths"""
+        on_update = Mock()
+        watcher = DocumentWatcher(processor, base_path=temp_dir, debounce=0, on_update=on_update)
+        path = temp_dir / 'ledger.csv'
+        path.write_text("v1")
+
+        watcher.record(path)
+        watcher.flush()
+
+        changed, removed = on_update.call_args[0]
+        assert [doc['file_name'] for doc in changed] == ['ledger.csv']
+        assert removed == []
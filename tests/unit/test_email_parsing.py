@@ -0,0 +1,49 @@
+import base64
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from unittest.mock import patch
+
+from email_parsing import iter_attachments, iter_decoded, message_body, message_metadata
+
+
+def _email_with_attachment(data, filename='statement.pdf'):
+    msg = EmailMessage()
+    msg['From'] = 'bank@example.com'
+    msg['To'] = 'nick@chitty.cc'
+    msg['Subject'] = 'Statement'
+    msg.set_content("Statement attached")
+    msg.add_attachment(data, maintype='application', subtype='pdf', filename=filename)
+    return BytesParser(policy=policy.default).parsebytes(msg.as_bytes())
+
+
+class TestEmailParsing:
+
+    def test_metadata_and_body_exclude_attachments(self):
+        """Test that headers are read and attachment parts stay out of the body"""
+        msg = _email_with_attachment(b'%PDF-1.4 statement')
+
+        assert message_metadata(msg)['subject'] == 'Statement'
+        assert message_body(msg).strip() == "Statement attached"
+        assert [a.filename for a in iter_attachments(msg)] == ['statement.pdf']
+
+    def test_iter_decoded_in_chunks(self):
+        """Test that base64 attachments decode identically in small slices"""
+        data = bytes(range(256)) * 40
+        msg = _email_with_attachment(data)
+        part = next(iter_attachments(msg)).part
+
+        with patch('email_parsing.DECODE_CHUNK_CHARS', 100):
+            chunks = list(iter_decoded(part))
+
+        assert len(chunks) > 1
+        assert b"".join(chunks) == data == part.get_payload(decode=True)
+
+    def test_iter_decoded_tolerates_missing_padding(self):
+        """Test that an unpadded base64 body still decodes"""
+        msg = EmailMessage()
+        msg['Content-Type'] = 'application/octet-stream'
+        msg['Content-Transfer-Encoding'] = 'base64'
+        msg.set_payload(base64.b64encode(b'wire').decode().rstrip('='))
+
+        assert b"".join(iter_decoded(msg)) == b'wire'
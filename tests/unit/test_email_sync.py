@@ -0,0 +1,170 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from email_sync import EmailSyncClient, EmailSyncError, SyncCursor
+
+
+class StubWorker:
+    """Local stand-in for the Cloudflare Worker's fetch_emails action"""
+
+    def __init__(self, emails, report_total=True, paging=True):
+        self.emails = emails
+        self.report_total = report_total
+        self.paging = paging
+        self.requests = []
+        self.failures = []
+
+    async def handle(self, request):
+        payload = await request.json()
+        self.requests.append(payload)
+        if self.failures:
+            return web.Response(status=self.failures.pop(0))
+
+        start = datetime.fromisoformat(payload["date_range"]["start"])
+        end = datetime.fromisoformat(payload["date_range"]["end"])
+        matching = [e for e in self.emails if start <= datetime.fromisoformat(e["date"]) <= end]
+        size = payload["page_size"]
+        page = matching[(payload["page"] - 1) * size:payload["page"] * size] if self.paging else matching
+
+        body = {"emails": page}
+        if self.report_total:
+            body["total"] = len(matching)
+        return web.json_response(body)
+
+
+@asynccontextmanager
+async def serve(worker):
+    app = web.Application()
+    app.router.add_post("/email", worker.handle)
+    async with TestServer(app) as server:
+        yield str(server.make_url("/email"))
+
+
+def _emails(count, start=0):
+    base = datetime.now(timezone.utc) - timedelta(days=1)
+    return [{
+        "id": f"m{i}",
+        "from": "bank@example.com",
+        "subject": f"Statement {i}",
+        "date": (base + timedelta(minutes=i)).isoformat(),
+        "body": f"Balance {i}"
+    } for i in range(start, start + count)]
+
+
+class TestEmailSync:
+
+    @pytest.mark.asyncio
+    async def test_sync_pages_and_resumes_from_cursor(self, temp_dir):
+        """Test that all pages are fetched and the next sync asks only for newer mail"""
+        worker = StubWorker(_emails(25))
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t", page_size=10)
+            first = await client.sync()
+            session = client._session
+
+            worker.emails.extend(_emails(2, start=25))
+            worker.requests.clear()
+            second = await client.sync()
+            await client.close()
+
+        assert [e["id"] for e in first] == [f"m{i}" for i in range(25)]
+        assert [e["id"] for e in second] == ["m25", "m26"]
+        assert worker.requests[0]["date_range"]["start"] == worker.emails[24]["date"]
+        assert client._session is None and session.closed
+
+    @pytest.mark.asyncio
+    async def test_boundary_message_not_returned_twice(self, temp_dir):
+        """Test that mail dated exactly at the cursor is dropped on the next sync"""
+        worker = StubWorker(_emails(3))
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t")
+            await client.sync()
+            again = await client.sync()
+            await client.close()
+
+        assert again == []
+        assert SyncCursor(temp_dir / "cursor.json").boundary_ids == ["m2"]
+
+    @pytest.mark.asyncio
+    async def test_pages_without_total_fetched_until_short_page(self, temp_dir):
+        """Test that pages are requested in waves when the worker reports no total"""
+        worker = StubWorker(_emails(23), report_total=False)
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t",
+                                     page_size=5, concurrency=2)
+            emails = await client.sync()
+            await client.close()
+
+        assert len(emails) == 23
+        assert sorted(r["page"] for r in worker.requests) == [1, 2, 3, 4, 5]
+
+    @pytest.mark.asyncio
+    async def test_worker_ignoring_paging_stops(self, temp_dir):
+        """Test that a worker returning the full list for every page ends the sync"""
+        worker = StubWorker(_emails(150), report_total=False, paging=False)
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t",
+                                     page_size=100, concurrency=4)
+            emails = await client.sync()
+            await client.close()
+
+        assert [e["id"] for e in emails] == [f"m{i}" for i in range(150)]
+        assert len(worker.requests) == 5
+
+    @pytest.mark.asyncio
+    async def test_page_cap_raises(self, temp_dir):
+        """Test that a sync needing more than max_pages fails without moving the cursor"""
+        worker = StubWorker(_emails(60), report_total=False)
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t",
+                                     page_size=5, concurrency=2, max_pages=4)
+            with pytest.raises(EmailSyncError, match="4 pages"):
+                await client.sync()
+            await client.close()
+
+        assert max(r["page"] for r in worker.requests) == 4
+        assert not (temp_dir / "cursor.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_reported_total_over_cap_raises(self, temp_dir):
+        """Test that a reported total needing more than max_pages is refused up front"""
+        worker = StubWorker(_emails(60))
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t",
+                                     page_size=5, max_pages=4)
+            with pytest.raises(EmailSyncError, match="60 emails"):
+                await client.sync()
+            await client.close()
+
+        assert len(worker.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_transient_failures_are_retried(self, temp_dir):
+        """Test that throttling and server errors are retried with backoff"""
+        worker = StubWorker(_emails(2))
+        worker.failures = [429, 503]
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t", backoff=0.01)
+            emails = await client.sync()
+            await client.close()
+
+        assert len(emails) == 2
+        assert len(worker.requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_sync_keeps_cursor(self, temp_dir):
+        """Test that a rejected request raises and leaves the cursor where it was"""
+        worker = StubWorker(_emails(2))
+        worker.failures = [401]
+        async with serve(worker) as url:
+            client = EmailSyncClient(url, temp_dir / "cursor.json", token="t")
+            with pytest.raises(EmailSyncError):
+                await client.sync()
+            await client.close()
+
+        assert not (temp_dir / "cursor.json").exists()
+        assert len(worker.requests) == 1
@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+
+from embedding_benchmark import known_item_queries, top_k, recall_at_k, overlap_at_k, benchmark
+
+
+class KeywordEmbeddings:
+    """Counts of a few keywords, so retrieval quality is predictable"""
+
+    KEYWORDS = ("wire", "escrow", "invoice", "lease")
+
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def _embed(self, text):
+        words = text.lower().split()
+        return [words.count(k) + self.noise for k in self.KEYWORDS]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+CHUNKS = [
+    " ".join(["wire"] * 30 + ["filler"] * 30),
+    " ".join(["escrow"] * 30 + ["filler"] * 30),
+    " ".join(["invoice"] * 30 + ["filler"] * 30),
+    "too short"
+]
+
+
+class TestMetrics:
+
+    def test_queries_come_from_their_chunk(self):
+        """Test that each known-item query is a passage of the chunk it targets"""
+        queries = known_item_queries(CHUNKS, count=10, words=8)
+
+        assert sorted(index for _, index in queries) == [0, 1, 2]
+        for query, index in queries:
+            assert query in CHUNKS[index]
+            assert len(query.split()) == 8
+
+    def test_queries_deterministic(self):
+        """Test that the same seed picks the same queries"""
+        assert known_item_queries(CHUNKS, 2, words=8) == known_item_queries(CHUNKS, 2, words=8)
+
+    def test_ranking_and_recall(self):
+        """Test top-k ranking by cosine and recall against the expected chunk"""
+        docs = [[1, 0], [0, 1], [1, 1]]
+        queries = [[1, 0.1], [0.1, 1]]
+
+        ranked = top_k(docs, queries, k=1)
+
+        assert ranked.tolist() == [[0], [1]]
+        assert recall_at_k(ranked, [0, 1]) == 1.0
+        assert recall_at_k(ranked, [0, 2]) == 0.5
+
+    def test_overlap(self):
+        """Test the shared share of two rankings"""
+        assert overlap_at_k(np.array([[0, 1], [2, 3]]), np.array([[1, 0], [2, 4]])) == 0.75
+
+
+class TestBenchmark:
+
+    def test_compares_against_reference(self):
+        """Test that the second backend is scored against the first's vectors and results"""
+        queries = known_item_queries(CHUNKS, count=3, words=8)
+
+        results = benchmark(CHUNKS[:3], {
+            "reference": KeywordEmbeddings(),
+            "candidate": KeywordEmbeddings(noise=0.01)
+        }, queries, k=1)
+
+        reference, candidate = results
+        assert reference["recall"] == 1.0
+        assert "cosine_to_reference" not in reference
+        assert candidate["cosine_to_reference"] == pytest.approx(1.0, abs=1e-3)
+        assert candidate["overlap_with_reference"] == 1.0
+        assert candidate["recall_on_reference_index"] == 1.0
+        assert candidate["chunks_per_s"] > 0 and candidate["speedup"] > 0
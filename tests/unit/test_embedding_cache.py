@@ -0,0 +1,121 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock
+
+from embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class FakeEmbeddings:
+    """Deterministic stand-in for the sentence-transformer model"""
+
+    model_name = "sentence-transformers/all-MiniLM-L6-v2"
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.embed_documents = Mock(side_effect=lambda texts: [self._vector(t) for t in texts])
+        self.embed_query = Mock(side_effect=self._vector)
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        vector = rng.standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+class TestCachedEmbeddings:
+
+    def test_repeated_text_encoded_once(self, temp_dir):
+        """Test that a chunk repeated across documents and runs reaches the model once"""
+        model = FakeEmbeddings()
+        embeddings = CachedEmbeddings(model, temp_dir)
+        disclaimer = "Deposits are FDIC insured up to applicable limits."
+
+        first = embeddings.embed_documents([disclaimer, "Statement 1", disclaimer])
+        second = embeddings.embed_documents([disclaimer] * 3000 + ["Statement 2"])
+
+        assert model.embed_documents.call_args_list[0].args[0] == [disclaimer, "Statement 1"]
+        assert model.embed_documents.call_args_list[1].args[0] == ["Statement 2"]
+        assert first[0] == first[2] == second[0]
+
+    def test_cache_persists_across_instances(self, temp_dir):
+        """Test that a new process-level wrapper serves vectors from disk"""
+        CachedEmbeddings(FakeEmbeddings(), temp_dir).embed_documents(["Wire sent", "Wire received"])
+        model = FakeEmbeddings()
+
+        vectors = CachedEmbeddings(model, temp_dir).embed_documents(["Wire received", "Wire sent"])
+
+        model.embed_documents.assert_not_called()
+        assert len(vectors) == 2 and len(vectors[0]) == 8
+
+    def test_misses_batched(self, temp_dir):
+        """Test that misses are encoded in calls of at most encode_batch texts"""
+        model = FakeEmbeddings()
+        embeddings = CachedEmbeddings(model, temp_dir, encode_batch=4)
+
+        embeddings.embed_documents([f"chunk {i}" for i in range(10)])
+
+        assert [len(c.args[0]) for c in model.embed_documents.call_args_list] == [4, 4, 2]
+
+    def test_query_cached(self, temp_dir):
+        """Test that repeated queries are answered without the model"""
+        model = FakeEmbeddings()
+        embeddings = CachedEmbeddings(model, temp_dir)
+
+        first = embeddings.embed_query("transfers to Colombia")
+        second = embeddings.embed_query("transfers to Colombia")
+
+        assert model.embed_query.call_count == 1
+        assert first == second
+
+    @pytest.mark.parametrize("dtype,tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+    def test_stored_precision(self, temp_dir, dtype, tolerance):
+        """Test that stored vectors stay close to the model output"""
+        model = FakeEmbeddings(dim=384)
+        text = "Closing balance 1,250.00"
+
+        cached = CachedEmbeddings(model, temp_dir, dtype=dtype).embed_documents([text])[0]
+
+        assert np.allclose(cached, model._vector(text), atol=tolerance)
+        assert (temp_dir / "sentence-transformers_all-MiniLM-L6-v2" / dtype / f"vectors.{dtype}").stat().st_size == \
+            384 * np.dtype(dtype).itemsize
+
+    def test_switching_dtype_uses_separate_store(self, temp_dir):
+        """Test that changing the cache precision neither breaks nor mixes existing stores"""
+        texts = [f"Statement {i}" for i in range(5)]
+        half = CachedEmbeddings(FakeEmbeddings(), temp_dir, dtype="float16").embed_documents(texts)
+
+        model = FakeEmbeddings()
+        quantized = CachedEmbeddings(model, temp_dir, dtype="int8").embed_documents(texts[:3] + ["New"])
+        model.embed_documents.assert_called_once()
+
+        reopened = FakeEmbeddings()
+        again = CachedEmbeddings(reopened, temp_dir, dtype="float16").embed_documents(texts)
+        reopened.embed_documents.assert_not_called()
+        assert again == half
+        assert np.allclose(quantized[:3], half[:3], atol=1e-2)
+
+
+class TestEmbeddingStore:
+
+    def test_dtype_mismatch_rejected(self, temp_dir):
+        """Test that a store written as one dtype refuses to open as another"""
+        EmbeddingStore(temp_dir, "int8").put([b"k"], np.ones((1, 4)))
+
+        with pytest.raises(ValueError, match="int8"):
+            EmbeddingStore(temp_dir, "float16").get([b"k"])
+
+    def test_dimension_mismatch_rejected(self, temp_dir):
+        """Test that vectors from a different model cannot be mixed in"""
+        store = EmbeddingStore(temp_dir)
+        store.put([b"a"], np.ones((1, 4)))
+
+        with pytest.raises(ValueError):
+            store.put([b"b"], np.ones((1, 8)))
+
+    def test_put_skips_stored_keys(self, temp_dir):
+        """Test that storing a known key again does not add a row"""
+        store = EmbeddingStore(temp_dir)
+        store.put([b"a", b"b"], np.ones((2, 4)))
+        store.put([b"b", b"c"], np.zeros((2, 4)))
+
+        assert len(store) == 3
+        assert np.array_equal(store.get([b"b"])[b"b"], np.ones(4))
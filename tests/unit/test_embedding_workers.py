@@ -0,0 +1,75 @@
+import pytest
+import os
+from unittest.mock import patch
+
+from embedding_workers import BulkEmbedder, estimate_tokens, plan_batches
+
+
+class LengthEmbeddings:
+    """Picklable stand-in model: vectors record the text length and worker pid"""
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), float(os.getpid())] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(os.getpid())]
+
+
+class TestBatching:
+
+    def test_estimate_tokens_capped(self):
+        """Test that token estimates count words and punctuation up to the cap"""
+        assert estimate_tokens("Wire sent: $1,250.00") == 11
+        assert estimate_tokens("word " * 1000, max_tokens=256) == 256
+
+    def test_batches_sorted_and_within_budget(self):
+        """Test that batches group similar lengths and respect the padded-token budget"""
+        lengths = [200, 10, 12, 180, 11, 190]
+
+        batches = plan_batches(lengths, token_budget=400, max_batch=8)
+
+        assert batches == [[1, 4, 2], [3, 5], [0]]
+        assert all(len(b) * max(lengths[i] for i in b) <= 400 for b in batches)
+
+    def test_batch_size_cap(self):
+        """Test that a batch never exceeds max_batch texts"""
+        assert [len(b) for b in plan_batches([5] * 10, token_budget=10 ** 6, max_batch=4)] == [4, 4, 2]
+
+    def test_budget_follows_available_memory(self):
+        """Test that less free memory means smaller batches"""
+        embedder = BulkEmbedder(LengthEmbeddings, "fake", workers=2)
+
+        with patch('embedding_workers.available_memory', return_value=64 * 1024 ** 3):
+            large = embedder.token_budget()
+        with patch('embedding_workers.available_memory', return_value=1024 ** 3):
+            small = embedder.token_budget()
+
+        assert large > small >= 256
+
+
+class TestBulkEmbedder:
+
+    def test_small_input_stays_in_process(self):
+        """Test that small inputs use the local model in input order"""
+        embedder = BulkEmbedder(LengthEmbeddings, "fake", workers=4, pool_min_texts=10)
+        texts = ["a much longer chunk of statement text", "short", "medium text"]
+
+        vectors = embedder.embed_documents(texts)
+
+        assert [v[0] for v in vectors] == [len(t) for t in texts]
+        assert {v[1] for v in vectors} == {os.getpid()}
+        assert embedder._pool is None
+        assert embedder.last_throughput > 0
+
+    @pytest.mark.slow
+    def test_pool_encodes_in_worker_processes(self):
+        """Test that large inputs are encoded by worker processes and reassembled in order"""
+        embedder = BulkEmbedder(LengthEmbeddings, "fake", workers=2, max_batch=8, pool_min_texts=1)
+        texts = [f"chunk {'x' * (i % 17)} {i}" for i in range(100)]
+        try:
+            vectors = embedder.embed_documents(texts)
+        finally:
+            embedder.close()
+
+        assert [v[0] for v in vectors] == [len(t) for t in texts]
+        assert os.getpid() not in {v[1] for v in vectors}
@@ -0,0 +1,111 @@
+import pytest
+import os
+import time
+
+from extraction_supervisor import ExtractionSupervisor
+
+
+def _task(item):
+    if item == "hang":
+        time.sleep(60)
+    if item == "crash":
+        os._exit(3)
+    if item == "raise":
+        raise ValueError("bad input")
+    if item == "hog":
+        hog = bytearray(200 * 1024 * 1024)
+        time.sleep(60)
+    return item.upper()
+
+
+class TestExtractionSupervisor:
+
+    def _run(self, items, **kwargs):
+        options = {"workers": 2, "timeout": 5, "memory_limit_mb": None}
+        options.update(kwargs)
+        supervisor = ExtractionSupervisor(_task, **options)
+        return {outcome.index: outcome for outcome in supervisor.run(items)}
+
+    def test_returns_results_for_every_item(self):
+        """Test that every item produces exactly one outcome"""
+        outcomes = self._run(["a", "b", "c", "d"])
+
+        assert [outcomes[i].result for i in range(4)] == ["A", "B", "C", "D"]
+        assert not any(o.quarantined for o in outcomes.values())
+
+    def test_task_exception_is_an_error_not_quarantine(self):
+        """Test that ordinary task failures are reported as errors"""
+        outcomes = self._run(["a", "raise"])
+
+        assert outcomes[1].error == "bad input"
+        assert not outcomes[1].quarantined
+        assert outcomes[0].result == "A"
+
+    @pytest.mark.slow
+    def test_timeout_kills_worker_and_continues(self):
+        """Test that a hung task is quarantined while the rest finish"""
+        started = time.monotonic()
+        outcomes = self._run(["hang", "a", "b", "c"], timeout=1)
+
+        assert outcomes[0].quarantined
+        assert "time budget" in outcomes[0].error
+        assert [outcomes[i].result for i in (1, 2, 3)] == ["A", "B", "C"]
+        assert time.monotonic() - started < 10
+
+    def test_crashed_worker_is_replaced(self):
+        """Test that a worker that dies is recycled and its item quarantined"""
+        outcomes = self._run(["crash", "a", "b"], workers=1)
+
+        assert outcomes[0].quarantined
+        assert "exited with code 3" in outcomes[0].error
+        assert outcomes[1].result == "A"
+        assert outcomes[2].result == "B"
+
+    @pytest.mark.slow
+    @pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="requires /proc")
+    def test_memory_budget(self):
+        """Test that a worker over its memory budget is killed"""
+        outcomes = self._run(["hog", "a"], memory_limit_mb=100, timeout=30)
+
+        assert outcomes[0].quarantined
+        assert "memory budget" in outcomes[0].error
+        assert outcomes[1].result == "A"
+
+
+def _shout(item):
+    return item + "!"
+
+
+class TestSupervisorService:
+
+    @pytest.fixture
+    def supervisor(self):
+        supervisor = ExtractionSupervisor(_task, workers=2, timeout=5)
+        supervisor.start()
+        yield supervisor
+        supervisor.close()
+
+    def test_submitted_items_resolve_to_outcomes(self, supervisor):
+        """Test that items submitted one at a time each resolve with their result"""
+        futures = [supervisor.submit(item) for item in ("a", "b", "raise")]
+
+        outcomes = [future.result(timeout=10) for future in futures]
+
+        assert [o.result for o in outcomes[:2]] == ["A", "B"]
+        assert outcomes[2].error == "bad input"
+
+    def test_submit_with_other_task(self, supervisor):
+        """Test that a submission can name its own task"""
+        assert supervisor.submit("a", _shout).result(timeout=10).result == "a!"
+
+    def test_crash_is_quarantined_and_service_continues(self, supervisor):
+        """Test that a crashed worker is replaced without failing later submissions"""
+        crashed = supervisor.submit("crash").result(timeout=10)
+
+        assert crashed.quarantined
+        assert supervisor.submit("a").result(timeout=10).result == "A"
+
+    def test_submit_requires_start(self):
+        """Test that submitting before start() is an error"""
+        with pytest.raises(RuntimeError):
+            ExtractionSupervisor(_task, workers=1, timeout=5).submit("a")
@@ -0,0 +1,96 @@
+import pytest
+import hashlib
+from unittest.mock import patch
+
+from evidence_authentication import DigitalEvidenceAuthenticator, AUTHENTICATION_ALGORITHMS
+from file_hashing import hash_file, HashRegistry, BUFFER_SIZE
+
+
+class TestHashFile:
+
+    def test_matches_hashlib(self, temp_dir):
+        """Test that streamed digests match one-shot hashlib digests"""
+        data = b"statement line\n" * (BUFFER_SIZE // 7)  # Spans several buffer fills
+        file_path = temp_dir / "large.bin"
+        file_path.write_bytes(data)
+
+        digests = hash_file(file_path, ("md5", "sha256", "sha512"))
+
+        assert digests["md5"] == hashlib.md5(data).hexdigest()
+        assert digests["sha256"] == hashlib.sha256(data).hexdigest()
+        assert digests["sha512"] == hashlib.sha512(data).hexdigest()
+
+    def test_empty_file(self, temp_dir):
+        """Test hashing an empty file"""
+        file_path = temp_dir / "empty.txt"
+        file_path.touch()
+
+        assert hash_file(file_path, ("md5",))["md5"] == hashlib.md5(b"").hexdigest()
+
+
+class TestHashRegistry:
+
+    @pytest.fixture
+    def sample_file(self, temp_dir):
+        file_path = temp_dir / "statement.txt"
+        file_path.write_text("Opening balance 1,500.00")
+        return file_path
+
+    def test_computes_only_requested_digests(self, sample_file):
+        """Test that a miss hashes only what was asked for and later requests add to it"""
+        registry = HashRegistry()
+
+        with patch('file_hashing.hash_file', wraps=hash_file) as mock_hash:
+            md5 = registry.get(sample_file, ("md5",))
+            full = registry.get(sample_file, ("md5", "sha256"))
+            again = registry.get(sample_file, ("sha256", "md5"))
+
+        assert [c.args[1] for c in mock_hash.call_args_list] == [("md5",), ("sha256",)]
+        assert full["md5"] == md5["md5"]
+        assert again == full
+        assert full == hash_file(sample_file, ("md5", "sha256"))
+
+    def test_prefetch_reads_file_once_for_all_consumers(self, sample_file):
+        """Test that with prefetch, later requests for other digests are served from the registry"""
+        registry = HashRegistry(prefetch=("sha1", "sha256", "sha512"))
+
+        with patch('file_hashing.hash_file', wraps=hash_file) as mock_hash:
+            md5 = registry.get(sample_file, ("md5",))
+            full = registry.get(sample_file, ("md5", "sha1", "sha256", "sha512"))
+
+        assert mock_hash.call_count == 1
+        assert full["md5"] == md5["md5"]
+        assert set(full) == {"md5", "sha1", "sha256", "sha512"}
+
+    def test_authenticator_digests_computed_during_scan(self, sample_file, temp_dir):
+        """Test that once an authenticator exists, scanning and authenticating read a file once"""
+        registry = HashRegistry()
+
+        with patch('evidence_authentication.get_hash_registry', return_value=registry):
+            authenticator = DigitalEvidenceAuthenticator(evidence_dir=temp_dir / "evidence")
+            with patch('file_hashing.hash_file', wraps=hash_file) as mock_hash:
+                registry.get(sample_file, ("md5",))
+                hashes = authenticator._calculate_file_hashes(sample_file)
+
+        assert mock_hash.call_count == 1
+        assert set(registry.prefetch) == set(AUTHENTICATION_ALGORITHMS)
+        assert hashes == hash_file(sample_file, AUTHENTICATION_ALGORITHMS)
+
+    def test_changed_file_is_rehashed(self, sample_file):
+        """Test that a metadata change produces a fresh digest"""
+        registry = HashRegistry()
+        before = registry.get(sample_file)["md5"]
+
+        sample_file.write_text("Opening balance 2,500.00 after correction")
+
+        assert registry.get(sample_file)["md5"] != before
+
+    def test_evicts_least_recently_used(self, temp_dir):
+        """Test that the registry stays within max_entries"""
+        registry = HashRegistry(max_entries=2)
+        for i in range(3):
+            file_path = temp_dir / f"file{i}.txt"
+            file_path.write_text(f"content {i}")
+            registry.get(file_path)
+
+        assert len(registry._entries) == 2
@@ -0,0 +1,93 @@
+import pytest
+from pathlib import Path
+
+from file_walker import VisitedDirs, walk_files
+
+
+class TestWalkFiles:
+
+    @pytest.fixture
+    def tree(self, temp_dir):
+        """Create a small document tree with hidden and excluded directories"""
+        (temp_dir / 'b_dir').mkdir()
+        (temp_dir / 'a_dir' / 'nested').mkdir(parents=True)
+        (temp_dir / '.git').mkdir()
+        (temp_dir / 'flow_analyzer').mkdir()
+
+        (temp_dir / 'root.pdf').write_text("pdf")
+        (temp_dir / 'notes.MD').write_text("markdown")
+        (temp_dir / 'image.bmp').write_text("unsupported")
+        (temp_dir / '.hidden.txt').write_text("hidden")
+        (temp_dir / 'a_dir' / 'statement.csv').write_text("csv")
+        (temp_dir / 'a_dir' / 'nested' / 'deep.txt').write_text("deep")
+        (temp_dir / 'b_dir' / 'ledger.xlsx').write_text("xlsx")
+        (temp_dir / '.git' / 'config.txt').write_text("git")
+        (temp_dir / 'flow_analyzer' / 'own.txt').write_text("own")
+        return temp_dir
+
+    def test_filters_by_suffix_case_insensitively(self, tree):
+        """Test that only files with requested suffixes are yielded"""
+        names = [p.name for p in walk_files(tree, suffixes={'.pdf', '.md', '.csv', '.txt', '.xlsx'})]
+
+        assert 'notes.MD' in names
+        assert 'image.bmp' not in names
+        assert '.hidden.txt' not in names
+
+    def test_prunes_hidden_and_skipped_directories(self, tree):
+        """Test that hidden and excluded directories are never entered"""
+        paths = list(walk_files(tree, suffixes={'.txt'}, skip_dirs={'flow_analyzer'}))
+
+        assert [p.name for p in paths] == ['deep.txt']
+
+    def test_deterministic_order(self, tree):
+        """Test that files are yielded in sorted, depth-first order"""
+        paths = [p.relative_to(tree) for p in walk_files(tree, skip_dirs={'flow_analyzer'})]
+
+        assert paths == [
+            Path('image.bmp'),
+            Path('notes.MD'),
+            Path('root.pdf'),
+            Path('a_dir/statement.csv'),
+            Path('a_dir/nested/deep.txt'),
+            Path('b_dir/ledger.xlsx'),
+        ]
+
+    def test_max_depth(self, tree):
+        """Test that directories below max_depth are not descended into"""
+        names = [p.name for p in walk_files(tree, suffixes={'.txt', '.csv'}, max_depth=1)]
+
+        assert 'statement.csv' in names
+        assert 'deep.txt' not in names
+
+    def test_seen_dirs_skips_repeat_visits(self, tree):
+        """Test that directories recorded in seen_dirs are not walked again"""
+        seen = VisitedDirs()
+        first = list(walk_files(tree, seen_dirs=seen))
+        second = list(walk_files(tree, seen_dirs=seen))
+
+        assert first
+        assert second == []
+
+    def test_symlink_cycle_is_walked_once(self, tree):
+        """Test that following a symlink back to an ancestor does not loop"""
+        (tree / 'a_dir' / 'nested' / 'loop').symlink_to(tree / 'a_dir')
+        (tree / 'alias').symlink_to(tree / 'b_dir')
+
+        paths = [p.relative_to(tree) for p in walk_files(tree, suffixes={'.csv', '.txt', '.xlsx'},
+                                                         follow_symlinks=True,
+                                                         skip_dirs={'flow_analyzer'})]
+
+        assert paths == [
+            Path('a_dir/statement.csv'),
+            Path('a_dir/nested/deep.txt'),
+            Path('alias/ledger.xlsx'),
+        ]
+
+    def test_visited_dirs_keyed_by_identity(self, tree):
+        """Test that the same directory under two paths counts once"""
+        (tree / 'alias').symlink_to(tree / 'b_dir')
+        seen = VisitedDirs()
+
+        assert seen.add((tree / 'b_dir').stat())
+        assert not seen.add((tree / 'alias').stat())
+        assert len(seen) == 1
@@ -0,0 +1,33 @@
+import pytest
+import json
+from unittest.mock import Mock, AsyncMock
+
+from interactive_timeline import InteractiveTimeline
+
+
+class TestExtractTimelineEvents:
+
+    @pytest.mark.asyncio
+    async def test_one_prompt_per_duplicate_cluster(self):
+        """Test that near-duplicate copies are not sent to the model and are cited as provenance"""
+        analyzer = Mock()
+        response = Mock(content=json.dumps([{"date": "2024-01-05", "type": "wire_transfer"}]))
+        analyzer.chat_model.ainvoke = AsyncMock(return_value=response)
+        documents = [
+            {"file_path": "/statements/jan.pdf", "file_name": "jan.pdf", "content": "Wire 50,000",
+             "duplicates": ["/scans/jan.png", "/mail/a.eml!/jan.pdf"]},
+            {"file_path": "/scans/jan.png", "file_name": "jan.png", "content": "Wire 50,000",
+             "duplicate_of": "/statements/jan.pdf"},
+            {"file_path": "/mail/a.eml!/jan.pdf", "file_name": "jan.pdf", "content": "Wire 50,000",
+             "duplicate_of": "/statements/jan.pdf"},
+            {"file_path": "/statements/feb.pdf", "file_name": "feb.pdf", "content": "Wire 20,000"},
+        ]
+
+        events = await InteractiveTimeline(analyzer).extract_timeline_events(documents)
+
+        prompts = [c.args[0][0]["content"] for c in analyzer.chat_model.ainvoke.call_args_list]
+        assert len(prompts) == 2
+        assert "jan.png" not in " ".join(prompts)
+        assert [e["document_path"] for e in events] == ["/statements/jan.pdf", "/statements/feb.pdf"]
+        assert events[0]["duplicate_documents"] == ["/scans/jan.png", "/mail/a.eml!/jan.pdf"]
+        assert events[1]["duplicate_documents"] == []
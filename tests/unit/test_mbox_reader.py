@@ -0,0 +1,105 @@
+import pytest
+import os
+import mmap
+
+from mbox_reader import MboxIndex, find_boundaries, parse_message, parse_ranges
+
+
+def _message(number, body="Wire sent"):
+    return (
+        f"From sender@example.com Mon Jan  1 00:00:00 2024\n"
+        f"From: sender@example.com\n"
+        f"To: nick@chitty.cc\n"
+        f"Subject: Message {number}\n"
+        f"Date: Mon, 01 Jan 2024 10:00:00 +0000\n"
+        f"\n"
+        f"{body} {number}\n"
+        f"\n"
+    ).encode()
+
+
+def _refresh(index, path):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index.refresh(mm, os.fstat(f.fileno()))
+
+
+class TestMboxIndex:
+
+    @pytest.fixture
+    def mbox(self, temp_dir):
+        path = temp_dir / "inbox.mbox"
+        path.write_bytes(b"".join(_message(i) for i in range(3)))
+        return path
+
+    def test_find_boundaries(self, mbox):
+        """Test that envelope lines mark message starts, including offset 0"""
+        data = mbox.read_bytes()
+        with open(mbox, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            boundaries = find_boundaries(mm)
+
+        assert len(boundaries) == 3
+        assert boundaries[0] == 0
+        assert all(data[b:b + 5] == b"From " for b in boundaries)
+
+    def test_index_persists(self, mbox, temp_dir):
+        """Test that a saved index is reloaded with its offsets and keys"""
+        index = MboxIndex(temp_dir / "index" / "inbox.mpk")
+        _refresh(index, mbox)
+        index.keys[0] = "a" * 32
+        index.save()
+
+        reloaded = MboxIndex(temp_dir / "index" / "inbox.mpk")
+
+        assert reloaded.starts == index.starts
+        assert reloaded.keys[0] == "a" * 32
+
+    def test_append_only_indexes_new_messages(self, mbox, temp_dir):
+        """Test that appended messages are added without resetting known keys"""
+        index = MboxIndex(temp_dir / "inbox.mpk")
+        _refresh(index, mbox)
+        index.keys = ["k0", "k1", "k2"]
+
+        with open(mbox, 'ab') as f:
+            f.write(_message(3) + _message(4))
+        _refresh(index, mbox)
+
+        assert len(index.starts) == 5
+        assert index.keys == ["k0", "k1", "k2", None, None]
+        assert index.ranges()[-1][1] == mbox.stat().st_size
+
+    def test_rewritten_mailbox_is_reindexed(self, mbox, temp_dir):
+        """Test that a mailbox changed before the indexed end is indexed from scratch"""
+        index = MboxIndex(temp_dir / "inbox.mpk")
+        _refresh(index, mbox)
+        index.keys = ["k0", "k1", "k2"]
+
+        with open(mbox, 'r+b') as f:
+            f.write(b"From other@example.com Tue")
+        _refresh(index, mbox)
+
+        assert index.keys == [None, None, None]
+
+
+class TestParsing:
+
+    def test_parse_message(self):
+        """Test metadata and plain-text body extraction from an mbox message"""
+        message = parse_message(_message(7))
+
+        assert message['email_metadata']['subject'] == "Message 7"
+        assert message['email_metadata']['to'] == "nick@chitty.cc"
+        assert message['body'].strip() == "Wire sent 7"
+        assert message['sent'] == "2024-01-01T10:00:00+00:00"
+
+    def test_parse_ranges_in_parallel_keeps_order(self, temp_dir):
+        """Test that batches parsed by worker processes come back in range order"""
+        path = temp_dir / "inbox.mbox"
+        path.write_bytes(b"".join(_message(i) for i in range(7)))
+        index = MboxIndex(temp_dir / "inbox.mpk")
+        _refresh(index, path)
+
+        results = list(parse_ranges(path, index.ranges(), workers=2, batch_size=2))
+
+        assert [start for start, _, _ in results] == index.starts
+        assert [m['email_metadata']['subject'] for _, _, m in results] == [f"Message {i}" for i in range(7)]
+        assert len({key for _, key, _ in results}) == 7
@@ -0,0 +1,92 @@
+import random
+from unittest.mock import Mock
+
+from document_cache import DocumentCache
+from document_record import DocumentRecord
+from near_duplicates import cluster_signatures, mark_near_duplicates, minhash_signature, similarity
+
+
+def _statement(seed, words=300):
+    rng = random.Random(seed)
+    vocabulary = ['wire', 'deposit', 'balance', 'account', 'fee', 'transfer', 'payment', 'interest']
+    return " ".join(f"{rng.choice(vocabulary)} {rng.randint(0, 9999)}" for _ in range(words // 2))
+
+
+def _ocr_noise(text, every=30):
+    words = text.split()
+    return " ".join(w + "l" if i % every == 0 else w for i, w in enumerate(words))
+
+
+class TestNearDuplicates:
+
+    def test_signature_similarity(self):
+        """Test that a noisy copy scores high and an unrelated text scores low"""
+        original = _statement(1)
+
+        copy = similarity(minhash_signature(original), minhash_signature(_ocr_noise(original)))
+        other = similarity(minhash_signature(original), minhash_signature(_statement(2)))
+
+        assert copy >= 0.8
+        assert other < 0.2
+
+    def test_short_text_has_no_signature(self):
+        """Test that texts below the word minimum are never clustered"""
+        assert minhash_signature("See attached") is None
+
+    def test_cluster_signatures(self):
+        """Test that only near-duplicates are grouped, in roughly linear time"""
+        texts = [_statement(i) for i in range(50)]
+        texts.append(_ocr_noise(texts[3]))
+        texts.append(texts[7])
+
+        clusters = cluster_signatures([minhash_signature(t) for t in texts] + [None])
+
+        assert sorted(clusters) == [[3, 50], [7, 51]]
+
+    def test_mark_near_duplicates_keeps_provenance(self, temp_dir):
+        """Test that copies link to the canonical original and it lists every copy"""
+        text = _statement(1)
+        documents = [
+            {"file_path": "/mail/a.eml!/statement.pdf", "file_hash": "h1", "content": text,
+             "content_length": len(text)},
+            {"file_path": "/statements/statement.pdf", "file_hash": "h2", "content": text,
+             "content_length": len(text)},
+            {"file_path": "/scans/statement.png", "file_hash": "h3", "content": _ocr_noise(text),
+             "content_length": len(text) + 10},
+            {"file_path": "/statements/other.pdf", "file_hash": "h4", "content": _statement(2),
+             "content_length": len(text)},
+        ]
+
+        marked = mark_near_duplicates(documents, DocumentCache(temp_dir / "cache", max_bytes=0))
+
+        assert marked[1]["duplicates"] == ["/mail/a.eml!/statement.pdf", "/scans/statement.png"]
+        assert marked[0]["duplicate_of"] == "/statements/statement.pdf"
+        assert marked[2]["duplicate_of"] == "/statements/statement.pdf"
+        assert marked[0]["similarity"] == 1.0
+        assert "duplicate_of" not in marked[3] and "duplicates" not in marked[3]
+
+    def test_signatures_are_cached_for_records(self, temp_dir):
+        """Test that a rescan reuses cached signatures instead of loading content"""
+        cache = DocumentCache(temp_dir / "cache", max_bytes=0)
+        text = _statement(1)
+        loader = Mock(return_value=text)
+        records = [
+            DocumentRecord(loader, file_path=f"/docs/{name}", file_hash=name, content_length=len(text))
+            for name in ["a.pdf", "b.pdf"]
+        ]
+
+        first = mark_near_duplicates(records, cache)
+        loads = loader.call_count
+        second = mark_near_duplicates(records, cache)
+
+        assert isinstance(first[1], DocumentRecord)
+        assert first[1]["duplicate_of"] == "/docs/a.pdf"
+        assert second[1]["duplicate_of"] == "/docs/a.pdf"
+        assert loader.call_count == loads == 2
+
+    def test_threshold_zero_disables(self):
+        """Test that a zero threshold leaves documents untouched"""
+        text = _statement(1)
+        documents = [{"file_path": p, "content": text} for p in ["/a", "/b"]]
+
+        assert mark_near_duplicates(documents, threshold=0) == documents
@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import Mock, patch
+from PIL import Image, ImageDraw
+
+import ocr
+from ocr import estimate_skew, preprocess, ocr_images, ocr_job
+
+
+def _lined_page(width=600, height=400, angle=0.0):
+    """A white page with dark horizontal text-like bars, optionally rotated"""
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for y in range(40, height - 40, 30):
+        draw.rectangle([40, y, width - 40, y + 8], fill=0)
+    if angle:
+        image = image.rotate(angle, fillcolor=255)
+    return image
+
+
+class TestPreprocess:
+
+    def test_estimate_skew_level_page(self):
+        """Test that a level page needs no rotation"""
+        assert estimate_skew(_lined_page()) == 0.0
+
+    def test_estimate_skew_recovers_rotation(self):
+        """Test that the estimated correction undoes a small rotation"""
+        assert estimate_skew(_lined_page(angle=3.0)) == pytest.approx(-3.0, abs=0.5)
+
+    def test_preprocess_downscales_to_target_dpi(self):
+        """Test that high resolution scans are reduced to the target DPI"""
+        image = _lined_page(1200, 800).convert("RGB")
+
+        result = preprocess(image, source_dpi=600, target_dpi=300)
+
+        assert result.mode == "L"
+        assert result.size == (600, 400)
+
+    def test_preprocess_keeps_low_resolution(self):
+        """Test that images below the target DPI are not upscaled"""
+        result = preprocess(_lined_page(), source_dpi=150, target_dpi=300)
+
+        assert result.size == (600, 400)
+
+
+class TestOcrImages:
+
+    def test_ocr_job_reads_image_file(self, temp_dir):
+        """Test OCR of an image file, using its embedded DPI"""
+        path = temp_dir / "receipt.png"
+        _lined_page(1200, 800).save(path, dpi=(600, 600))
+
+        with patch('pytesseract.image_to_string', return_value=" Total $42.00 \n") as mock_ocr:
+            assert ocr_job((path, None)) == "Total $42.00"
+
+        assert mock_ocr.call_args.args[0].size == (600, 400)
+
+    def test_ocr_images_preserves_order_in_batches(self):
+        """Test that results come back in input order across batches"""
+        pages = [(_lined_page(100 + i, 100), 300) for i in range(5)]
+
+        with patch('ocr.ocr_job', side_effect=lambda job: f"page {job[0].width - 100}"):
+            results = list(ocr_images(iter(pages), workers=1, batch_size=2))
+
+        assert results == [f"page {i}" for i in range(5)]
+
+    def test_ocr_images_uses_process_pool(self):
+        """Test that multi-image batches are spread over a process pool"""
+        pages = [(_lined_page(), 300) for _ in range(3)]
+        ocr.shutdown_pool()
+
+        try:
+            with patch('pytesseract.image_to_string', return_value="text"):
+                results = list(ocr_images(pages, workers=2, batch_size=3))
+        finally:
+            ocr.shutdown_pool()
+
+        assert results == ["text"] * 3
+
+    def test_ocr_images_share_one_pool(self):
+        """Test that separate documents reuse one bounded pool instead of starting their own"""
+        pool = Mock()
+        pool.map.side_effect = lambda func, batch: [f"page {job[1]}" for job in batch]
+        ocr.shutdown_pool()
+
+        with patch('ocr.ProcessPoolExecutor', return_value=pool) as factory, \
+             patch('ocr.OCR_WORKERS', 4):
+            first = list(ocr_images([(None, 1), (None, 2)], workers=8))
+            second = list(ocr_images([(None, 3), (None, 4)], workers=8))
+            ocr.shutdown_pool()
+
+        factory.assert_called_once_with(max_workers=4)
+        assert first + second == ["page 1", "page 2", "page 3", "page 4"]
@@ -0,0 +1,128 @@
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from onnx_embeddings import OnnxEmbeddings, mean_pool
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "wire": 2, "transfer": 3, "to": 4, "escrow": 5}
+
+
+class FakeSession:
+    """Stand-in for onnxruntime.InferenceSession: token i's hidden state is
+    a one-hot vector at its id, so pooling is easy to predict"""
+
+    def __init__(self, inputs=("input_ids", "attention_mask", "token_type_ids")):
+        self.inputs = inputs
+        self.feeds = []
+
+    def get_inputs(self):
+        inputs = []
+        for name in self.inputs:
+            node = MagicMock()
+            node.name = name
+            inputs.append(node)
+        return inputs
+
+    def run(self, outputs, feeds):
+        self.feeds.append(feeds)
+        return [np.eye(len(VOCAB), dtype=np.float32)[feeds["input_ids"]]]
+
+
+@pytest.fixture
+def model_dir(temp_dir):
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(temp_dir / "tokenizer.json"))
+    return temp_dir
+
+
+def make_embeddings(model_dir, session, **kwargs):
+    with patch("onnx_embeddings.ort.InferenceSession", return_value=session) as factory:
+        embeddings = OnnxEmbeddings("test-model", onnx_file="model.onnx", model_dir=model_dir, **kwargs)
+    return embeddings, factory
+
+
+class TestMeanPool:
+
+    def test_ignores_padding_and_normalizes(self):
+        """Test that padded positions don't count and rows have unit length"""
+        hidden = np.array([[[3.0, 0.0], [0.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0]])
+
+        pooled = mean_pool(hidden, mask)
+
+        np.testing.assert_allclose(pooled, [[0.6, 0.8]], rtol=1e-6)
+
+
+class TestOnnxEmbeddings:
+
+    def test_loads_model_from_directory(self, model_dir):
+        """Test that the session is created from the given ONNX file on CPU"""
+        embeddings, factory = make_embeddings(model_dir, FakeSession(), threads=2)
+
+        path, options = factory.call_args.args
+        assert path == str(model_dir / "model.onnx")
+        assert options.intra_op_num_threads == 2
+        assert factory.call_args.kwargs["providers"] == ["CPUExecutionProvider"]
+        assert embeddings.model_name == "test-model"
+
+    def test_downloads_from_model_repository(self, model_dir):
+        """Test that without model_dir the files come from the model's Hugging Face repo"""
+        def download(repo, filename):
+            return str(model_dir / filename)
+
+        with patch("onnx_embeddings.hf_hub_download", side_effect=download) as hub, \
+                patch("onnx_embeddings.ort.InferenceSession", return_value=FakeSession()):
+            OnnxEmbeddings("org/model", onnx_file="onnx/model_quint8_avx2.onnx")
+
+        assert [c.args for c in hub.call_args_list] == [
+            ("org/model", "onnx/model_quint8_avx2.onnx"),
+            ("org/model", "tokenizer.json")
+        ]
+
+    def test_pads_batch_and_pools_tokens(self, model_dir):
+        """Test that a batch is padded to its longest text and pooled over real tokens only"""
+        session = FakeSession()
+        embeddings, _ = make_embeddings(model_dir, session)
+
+        vectors = embeddings.embed_documents(["wire transfer", "wire transfer to escrow"])
+
+        feeds = session.feeds[0]
+        assert feeds["input_ids"].tolist() == [[2, 3, 0, 0], [2, 3, 4, 5]]
+        assert feeds["attention_mask"].tolist() == [[1, 1, 0, 0], [1, 1, 1, 1]]
+        assert feeds["input_ids"].dtype == np.int64
+        np.testing.assert_allclose(vectors[0], [0, 0, 2 ** -0.5, 2 ** -0.5, 0, 0], atol=1e-6)
+        np.testing.assert_allclose(vectors[1], [0, 0, 0.5, 0.5, 0.5, 0.5], atol=1e-6)
+
+    def test_truncates_to_max_tokens(self, model_dir):
+        """Test that long texts are cut at the model's truncation length"""
+        session = FakeSession()
+        embeddings, _ = make_embeddings(model_dir, session, max_tokens=3)
+
+        embeddings.embed_query("wire transfer to escrow")
+
+        assert session.feeds[0]["input_ids"].tolist() == [[2, 3, 4]]
+
+    def test_feeds_only_model_inputs(self, model_dir):
+        """Test that token_type_ids is sent only to models that declare it"""
+        session = FakeSession(inputs=("input_ids", "attention_mask"))
+        embeddings, _ = make_embeddings(model_dir, session)
+
+        embeddings.embed_query("escrow")
+
+        assert set(session.feeds[0]) == {"input_ids", "attention_mask"}
+
+    def test_batches_large_inputs(self, model_dir):
+        """Test that embed_documents runs the model once per batch_size texts"""
+        session = FakeSession()
+        embeddings, _ = make_embeddings(model_dir, session, batch_size=2)
+
+        vectors = embeddings.embed_documents(["wire", "transfer", "to", "escrow", "wire"])
+
+        assert len(session.feeds) == 3
+        assert len(vectors) == 5
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
@@ -0,0 +1,183 @@
+import pytest
+import os
+import asyncio
+import threading
+from unittest.mock import patch
+
+import recursive_scanner
+from document_processor import DocumentProcessor
+from recursive_scanner import RecursiveScanner
+
+
+class TestRecursiveScanner:
+
+    @pytest.fixture
+    def scanner(self, temp_dir):
+        """Create a RecursiveScanner with its cache and base path in a temp directory"""
+        with patch('document_processor.CACHE_DIR', temp_dir / 'cache'), \
+             patch('document_processor.BASE_DIR', temp_dir), \
+             patch('recursive_scanner.BASE_DIR', temp_dir):
+            scanner = RecursiveScanner(cloudflare_worker_url='')
+            yield scanner
+
+    @pytest.fixture
+    def tree(self, temp_dir):
+        docs = temp_dir / 'docs'
+        (docs / 'nested').mkdir(parents=True)
+        for i in range(6):
+            (docs / f'statement_{i}.txt').write_text(f"statement {i}")
+        (docs / 'nested' / 'letter.eml').write_bytes(
+            b"From: a@example.com\r\nTo: b@example.com\r\nSubject: Wire\r\n\r\nWire sent\r\n"
+        )
+        return docs
+
+    @pytest.mark.asyncio
+    async def test_scan_returns_documents_in_walk_order(self, scanner, tree):
+        """Test that concurrent processing keeps the walk order"""
+        documents = await scanner.scan_recursive(tree)
+
+        assert [d['file_name'] for d in documents] == [
+            *(f'statement_{i}.txt' for i in range(6)), 'letter.eml'
+        ]
+        assert documents[0]['content'] == "statement 0"
+        assert documents[-1]['email_metadata']['subject'] == "Wire"
+
+    @pytest.mark.asyncio
+    async def test_processing_runs_off_the_event_loop(self, scanner, tree):
+        """Test that extraction runs in worker threads, not on the loop thread"""
+        loop_thread = threading.get_ident()
+        threads = set()
+        original = scanner.processor.process_document
+
+        def process(file_path):
+            threads.add(threading.get_ident())
+            return original(file_path)
+
+        with patch.object(scanner.processor, 'process_document', side_effect=process):
+            await scanner.scan_recursive(tree)
+
+        assert threads and loop_thread not in threads
+
+    @pytest.mark.asyncio
+    async def test_walk_is_bounded_by_queue(self, scanner, tree):
+        """Test that the walk never runs more than the queue size ahead of processing"""
+        walked = []
+        processed = []
+        ahead = []
+        original_walk = recursive_scanner.walk_files
+
+        def walk(*args, **kwargs):
+            for item in original_walk(*args, **kwargs):
+                walked.append(item)
+                yield item
+
+        async def process(item):
+            ahead.append(len(walked) - len(processed))
+            await asyncio.sleep(0.01)
+            processed.append(item)
+            return []
+
+        with patch('recursive_scanner.walk_files', walk), \
+             patch('recursive_scanner.SCAN_QUEUE_SIZE', 2), \
+             patch('recursive_scanner.SCAN_CONCURRENCY', 1), \
+             patch.object(scanner, '_process_item', side_effect=process):
+            await scanner.scan_recursive(tree)
+
+        assert len(processed) == 7
+        # Queue capacity, the item being processed and the one waiting to be put
+        assert max(ahead) <= 4
+
+    @pytest.mark.asyncio
+    async def test_extraction_uses_process_pool(self, scanner, tree):
+        """Test that supported documents are extracted in worker processes when configured"""
+        with patch('recursive_scanner.SCAN_WORKERS', 2):
+            documents = await scanner.scan_recursive(tree)
+
+        assert [d['file_name'] for d in documents][:6] == [f'statement_{i}.txt' for i in range(6)]
+        assert documents[3]['content'] == "statement 3"
+
+    @pytest.mark.asyncio
+    async def test_crashing_file_is_quarantined(self, scanner, tree):
+        """Test that a file that kills its worker is quarantined and the scan finishes"""
+        original = DocumentProcessor.process_document
+
+        def process(self, file_path):
+            if file_path.name == 'statement_2.txt':
+                os._exit(3)
+            return original(self, file_path)
+
+        with patch('recursive_scanner.SCAN_WORKERS', 2), \
+             patch.object(DocumentProcessor, 'process_document', process):
+            documents = await scanner.scan_recursive(tree)
+
+        names = [d['file_name'] for d in documents]
+        assert 'statement_2.txt' not in names
+        assert len(names) == 6
+        assert scanner.processor.is_quarantined(tree / 'statement_2.txt')
+
+    @pytest.mark.asyncio
+    async def test_scan_expands_archives(self, scanner, temp_dir):
+        """Test that zip members are returned after the archive's catalog entry"""
+        import zipfile
+        docs = temp_dir / 'docs'
+        docs.mkdir()
+        with zipfile.ZipFile(docs / 'production.zip', 'w') as archive:
+            archive.writestr('statements/jan.txt', "January statement")
+
+        documents = await scanner.scan_recursive(docs)
+
+        assert [d['file_name'] for d in documents] == ['production.zip', 'jan.txt']
+        assert documents[0]['content'] == "Archive file containing 1 documents"
+        assert documents[1]['content'] == "January statement"
+
+    @pytest.mark.asyncio
+    async def test_scan_expands_tgz(self, scanner, temp_dir):
+        """Test that gzipped tarballs are expanded like other archives"""
+        import io
+        import tarfile
+        docs = temp_dir / 'docs'
+        docs.mkdir()
+        data = b"February statement"
+        with tarfile.open(docs / 'production.tgz', 'w:gz') as archive:
+            info = tarfile.TarInfo('statements/feb.txt')
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+        documents = await scanner.scan_recursive(docs)
+
+        assert [d['file_name'] for d in documents] == ['production.tgz', 'feb.txt']
+        assert documents[1]['content'] == "February statement"
+
+    @pytest.mark.asyncio
+    async def test_scan_returns_email_attachments_once(self, scanner, temp_dir):
+        """Test that attachments follow their email and repeats across emails are dropped"""
+        from email.message import EmailMessage
+        docs = temp_dir / 'docs'
+        docs.mkdir()
+        for name in ['a.eml', 'b.eml']:
+            msg = EmailMessage()
+            msg['From'] = 'bank@example.com'
+            msg['To'] = 'nick@chitty.cc'
+            msg['Subject'] = name
+            msg.set_content("Statement attached")
+            msg.add_attachment(b"Closing balance", maintype='text', subtype='plain',
+                               filename='statement.txt')
+            (docs / name).write_bytes(msg.as_bytes())
+
+        documents = await scanner.scan_recursive(docs)
+
+        assert [d['file_name'] for d in documents] == ['a.eml', 'statement.txt', 'b.eml']
+        assert documents[0]['category'] == 'communications'
+        assert documents[0]['attachments'][0]['file_hash'] == documents[1]['file_hash']
+        assert documents[1]['content'] == "Closing balance"
+
+    @pytest.mark.asyncio
+    async def test_visited_state_is_per_scan(self, scanner, tree):
+        """Test that a second scan walks the tree again and symlink loops are cut"""
+        (tree / 'nested' / 'loop').symlink_to(tree)
+
+        first = await scanner.scan_recursive(tree, follow_symlinks=True)
+        second = await scanner.scan_recursive(tree, follow_symlinks=True)
+
+        assert len(first) == 7
+        assert [d['file_path'] for d in second] == [d['file_path'] for d in first]
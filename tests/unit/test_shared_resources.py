@@ -0,0 +1,126 @@
+import pytest
+import threading
+import time
+from unittest.mock import Mock
+
+from shared_resources import ResourceRegistry, SharedResource
+
+
+class Owner:
+    model = SharedResource("model")
+    client = SharedResource("client", keyed_by="key")
+
+    def __init__(self, resources, key="k1"):
+        self.resources = resources
+        self.key = key
+
+
+@pytest.fixture
+def registry():
+    registry = ResourceRegistry()
+    registry.register("model", Mock(side_effect=lambda: object()))
+    registry.register("client", Mock(side_effect=lambda key: {"key": key}), preload=False)
+    return registry
+
+
+class TestResourceRegistry:
+
+    def test_built_once_on_first_use(self, registry):
+        """Test that a resource is built lazily and then shared"""
+        factory = registry._factories["model"]
+        factory.assert_not_called()
+
+        first = registry.get("model")
+
+        assert registry.get("model") is first
+        factory.assert_called_once()
+        assert registry.loaded("model")
+        assert "model" in registry.load_seconds
+
+    def test_instance_per_argument(self, registry):
+        """Test that keyed factories build one instance per distinct argument"""
+        assert registry.get("client", "a") is registry.get("client", "a")
+        assert registry.get("client", "a") is not registry.get("client", "b")
+
+    def test_concurrent_first_use_builds_once(self):
+        """Test that threads racing for a resource wait for a single build"""
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        registry = ResourceRegistry()
+        registry.register("model", slow)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("model"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+
+    def test_warm_up_skips_keyed_and_reports_time(self, registry):
+        """Test that warm-up builds preload resources and records its duration"""
+        registry.warm_up()
+
+        status = registry.status()
+        assert status["loaded"] == ["model"]
+        assert status["warmup_seconds"] is not None
+        assert status["warming_up"] is False
+
+    def test_background_warm_up(self, registry):
+        """Test that background warm-up returns a thread that builds resources"""
+        thread = registry.warm_up(background=True)
+        thread.join(timeout=5)
+
+        assert registry.loaded("model")
+        assert not registry.warming_up
+
+    def test_warm_up_failure_surfaces_on_use(self):
+        """Test that a failing factory doesn't stop warm-up and raises on first use"""
+        registry = ResourceRegistry()
+        registry.register("broken", Mock(side_effect=RuntimeError("no model")))
+        registry.register("model", object)
+
+        registry.warm_up()
+
+        assert registry.loaded("model")
+        with pytest.raises(RuntimeError, match="no model"):
+            registry.get("broken")
+
+    def test_close_releases_resources(self):
+        """Test that close() calls close on built resources and forgets them"""
+        resource = Mock()
+        registry = ResourceRegistry()
+        registry.register("pool", lambda: resource)
+        registry.get("pool")
+
+        registry.close()
+
+        resource.close.assert_called_once()
+        assert not registry.loaded("pool")
+
+
+class TestSharedResource:
+
+    def test_resolves_through_registry(self, registry):
+        """Test that owners sharing a registry share its resources"""
+        a, b = Owner(registry), Owner(registry, key="k2")
+
+        assert a.model is b.model
+        assert a.client == {"key": "k1"}
+        assert b.client == {"key": "k2"}
+
+    def test_assignment_overrides_one_instance(self, registry):
+        """Test that assigning the attribute affects only that owner"""
+        a, b = Owner(registry), Owner(registry)
+        replacement = object()
+
+        a.model = replacement
+
+        assert a.model is replacement
+        assert b.model is registry.get("model")
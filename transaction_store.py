@@ -0,0 +1,122 @@
+"""
+Columnar store for rows ingested from CSV and Excel documents
+Each sheet is streamed into its own Parquet file so later analysis can query
+transactions directly instead of parsing rendered text
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Sequence
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class TableWriter:
+    """Appends DataFrame chunks of one sheet to a Parquet file
+
+    Values are stored as strings; statement exports mix formats within a
+    column, and typing is left to the query that reads the rows.
+    """
+
+    def __init__(self, path: Path, sheet_name: str):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.rows = 0
+        self.columns: List[str] = []
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._schema: Optional[pa.Schema] = None
+
+    def write(self, chunk: pd.DataFrame):
+        if self._writer is None:
+            self.columns = [str(c) for c in chunk.columns]
+            self._schema = pa.schema([(name, pa.string()) for name in self.columns])
+            self._writer = pq.ParquetWriter(str(self.path), self._schema, compression="zstd")
+
+        chunk = chunk.astype("string")
+        chunk.columns = self.columns
+        self._writer.write_table(pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class TransactionStore:
+    """Parquet files of tabular rows, keyed by document hash
+
+    Layout: ``<root>/ab/<hash>/<sheet_index>.parquet``. A document's tables are
+    written to a staging directory and moved into place once complete.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(exist_ok=True, parents=True)
+
+    def table_dir(self, file_hash: str) -> Path:
+        return self.root / file_hash[:2] / file_hash
+
+    def begin(self, file_hash: str) -> "TableBatch":
+        """Start writing the tables of one document"""
+        return TableBatch(self, file_hash)
+
+    def tables(self, file_hash: str) -> List[Path]:
+        """Parquet files stored for a document, in sheet order"""
+        return sorted(self.table_dir(file_hash).glob("*.parquet"), key=lambda p: int(p.stem))
+
+    def read(self, file_hash: str, sheet_index: int = 0,
+             columns: Optional[Sequence[str]] = None) -> pa.Table:
+        """Read one sheet's rows, optionally projecting columns"""
+        path = self.table_dir(file_hash) / f"{sheet_index}.parquet"
+        return pq.read_table(str(path), columns=list(columns) if columns else None)
+
+    def remove(self, file_hash: str):
+        shutil.rmtree(self.table_dir(file_hash), ignore_errors=True)
+
+
+class TableBatch:
+    """Staging area for one document's tables; commit() publishes them"""
+
+    def __init__(self, store: TransactionStore, file_hash: str):
+        self.store = store
+        self.file_hash = file_hash
+        self.staging = Path(tempfile.mkdtemp(prefix=f".{file_hash}.", dir=store.root))
+        self.writers: List[TableWriter] = []
+
+    def table(self, sheet_name: str) -> TableWriter:
+        writer = TableWriter(self.staging / f"{len(self.writers)}.parquet", sheet_name)
+        self.writers.append(writer)
+        return writer
+
+    def commit(self):
+        for writer in self.writers:
+            writer.close()
+        target = self.store.table_dir(self.file_hash)
+        target.parent.mkdir(exist_ok=True, parents=True)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(self.staging, target)
+
+    def abort(self):
+        for writer in self.writers:
+            try:
+                writer.close()
+            except Exception:
+                pass
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def __enter__(self) -> "TableBatch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()